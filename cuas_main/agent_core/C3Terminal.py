@@ -36,6 +36,15 @@ class Name_Your_C3_Node(C3Node):
         self.agent_distance = self.triggerMgr.C3NodeDictVar(
             self.triggerMgr, "distance")
 
+        # Evaluated each time the distances update
+        self.distance_trigger = self.triggerMgr.DictTrigger(
+            self.triggerMgr,
+            c3nodeVarName='distance',
+            operator='<',
+            threshold=100,
+            repeat=True
+        )
+
         pass
 
     # ##############################################################
@@ -44,25 +53,17 @@ class Name_Your_C3_Node(C3Node):
 
         # estimated_pos = self.triggerMgr.vars['agentPos'].estimated_position()
 
-        self.agent_distance.update(C3NodeUtils.list_of_distances(
+        self.agent_distance.update_array(*C3NodeUtils.distance_array(
             self.triggerMgr.vars['agentPos'].msg_dict
         ))
 
         # print(f"distances: {self.agent_distance.dict}", flush=True)
 
-        distance_trigger = self.triggerMgr.DictTrigger(
-            self.triggerMgr,
-            c3nodeVarName='distance',
-            operator='<',
-            threshold=100,
-            repeat=True
-        )
-
         # print(f"dist: {self.agent_distance.dict}", flush=True)
-        if distance_trigger:
+        if self.distance_trigger:
 
-            # print(f"dist_trig: {distance_trigger}")
-            for key_agent_pair, value in distance_trigger.dict.items():
+            # print(f"dist_trig: {self.distance_trigger}")
+            for key_agent_pair, value in self.distance_trigger.dict.items():
                 agent1 = key_agent_pair.split('__')[0]
                 agent2 = key_agent_pair.split('__')[1]
 
@@ -1,6 +1,9 @@
 from datetime import datetime
 from abc import ABC
+import keyword
 import math
+import threading
+import time
 
 import os
 from pymavlink import mavutil
@@ -27,52 +30,336 @@ ARM_STATE_DICT = {
 }
 
 
+TIMESTAMP_FORMAT = "%m/%d/%Y, %H:%M:%S.%f"
+
+# Names the status records use for their own bookkeeping.  A message field
+# with one of these names is not stored in the record
+RESERVED_FIELD_NAMES = {'timestamp', 'message_class', 'is_new'}
+
+# (whole second, its formatted date and time) of the last timestamp
+_timestamp_second = (None, '')
+
+
+def format_timestamp(epoch_time: float) -> str:
+    '''
+    datetime.fromtimestamp(epoch_time).strftime(TIMESTAMP_FORMAT) with the
+    date and time of the last whole second kept, so most calls only
+    format the microseconds
+    '''
+    global _timestamp_second
+    second = math.floor(epoch_time)
+    # Rounded half to even the way datetime.fromtimestamp rounds
+    microsecond = round((epoch_time - second) * 1e6)
+    if microsecond >= 1000000:
+        second += 1
+        microsecond -= 1000000
+    cached_second, prefix = _timestamp_second
+    if cached_second != second:
+        prefix = datetime.fromtimestamp(second).strftime(
+            "%m/%d/%Y, %H:%M:%S")
+        _timestamp_second = (second, prefix)
+    return f"{prefix}.{microsecond:06d}"
+
+
+def _field_source(obj, name):
+    # Source for reading field name of obj.  Fields named like a Python
+    # keyword ('from') can only be reached with getattr
+    if keyword.iskeyword(name):
+        return f"getattr({obj}, {name!r})"
+    return f"{obj}.{name}"
+
+
+def _compile_to_dict(fields):
+    '''
+    Builds the to_dict() of a record schema as one dict display over the
+    schema's fields, in place of a loop over the field names
+    '''
+    items = ''.join(f"{name!r}: {_field_source('self', name)}, "
+                    for name in fields)
+    source = (
+        "def to_dict(self):\n"
+        "    return {'timestamp': format_timestamp(self._time), "
+        f"{items}'message_class': self.message_class}}\n")
+    namespace = {'format_timestamp': format_timestamp}
+    exec(source, namespace)
+    return namespace['to_dict']
+
+
+def _compile_updates(fields):
+    '''
+    Builds update_values() and update_from_message() of a record schema
+    as straight-line code, one compare (and write) per field
+    '''
+    def compare_and_set(i, name):
+        if keyword.iskeyword(name):
+            write = f"setattr(self, {name!r}, v{i})"
+        else:
+            write = f"self.{name} = v{i}"
+        return (f"    if {_field_source('self', name)} != v{i}:\n"
+                f"        {write}\n"
+                f"        changed |= {1 << i}\n")
+
+    finish = ("    self._time = time()\n"
+              "    if changed:\n"
+              "        self._changed |= changed\n"
+              "        self._version += 1\n"
+              "        if self._subscribers:\n"
+              "            self._notify(changed)\n")
+
+    unpack = ''
+    if fields:
+        names = ', '.join(f"v{i}" for i in range(len(fields)))
+        unpack = f"    {names}, = values\n"
+    values_source = (
+        "def update_values(self, values):\n" + unpack +
+        "    changed = 0\n" +
+        ''.join(compare_and_set(i, name) for i, name in enumerate(fields)) +
+        finish)
+
+    message_source = (
+        "def update_from_message(self, msg):\n"
+        "    changed = 0\n" +
+        ''.join(
+            f"    v{i} = {_field_source('msg', name)}\n"
+            f"    if v{i}.__class__ is bytes:\n"
+            f"        v{i} = v{i}.decode("
+            f"errors='backslashreplace').rstrip('\\x00')\n" +
+            compare_and_set(i, name)
+            for i, name in enumerate(fields)) +
+        finish)
+
+    namespace = {'time': time.time}
+    exec(values_source, namespace)
+    exec(message_source, namespace)
+    return namespace['update_values'], namespace['update_from_message']
+
+
 class DynamicStatusClass(ABC):
+    '''
+    Base class for the AgentStatus records.  Each message schema gets its
+    own subclass (see status_record_class) whose fields are __slots__, so
+    an update is a handful of in-place attribute writes.
+
+    Every field has a change bit.  Updating a field to a different value
+    sets its bit and reading `is_new` returns whether any bit is set and
+    clears them.  The update time is kept as a float and only formatted
+    into the `timestamp` string when it is read.
+
+    `is_new` has one reader.  For more than one reader, each reader can
+    subscribe(callback) to be called on every change or keep its own
+    StatusCursor (AgentStatus.cursor(key)).  Both follow the record's
+    version, which counts the updates that changed a field, so readers
+    never clear each other's changes.
+    '''
+
+    __slots__ = ('_changed', '_time', 'message_class',
+                 '_version', '_subscribers')
+
+    # The ordered field names and their change bits.  Filled in for every
+    # subclass by __init_subclass__, along with to_dict(), update_values()
+    # and update_from_message() compiled for the subclass' fields
+    _fields = ()
+    _bits = {}
+    _field_bits = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._bits = {name: 1 << i for i, name in enumerate(cls._fields)}
+        cls._field_bits = tuple(cls._bits.items())
+        if 'to_dict' not in cls.__dict__:
+            cls.to_dict = _compile_to_dict(cls._fields)
+        update_values, update_from_message = _compile_updates(cls._fields)
+        if 'update_values' not in cls.__dict__:
+            cls.update_values = update_values
+        if 'update_from_message' not in cls.__dict__:
+            cls.update_from_message = update_from_message
 
     def __init__(self, **kwargs):
-        self._is_new = True  # Flag to track if the data is new
-        self.timestamp = datetime.now().strftime("%m/%d/%Y, %H:%M:%S.%f")
-        self.update_attributes(kwargs)
         self.message_class = kwargs.get('_message_class', None)
+        for name in self._fields:
+            setattr(self, name, kwargs.get(name, None))
+        self._time = time.time()
+        # Everything is new until it is read the first time
+        self._changed = (1 << len(self._fields)) - 1
+        self._version = 0
+        self._subscribers = ()
 
     def update_attributes(self, new_data):
-
-        # Check to see if there are changes in the data
-        # (with the timestamp there should always be changes)
-        obj_data_dict = self.to_dict().copy()
-        new_data_dict = new_data.copy()
-        if obj_data_dict != new_data_dict:
-            for key, value in new_data.items():
+        '''
+        Writes the values of new_data into the fields with the same name.
+        Keys that are not fields of this record are ignored.
+        '''
+        bits = self._bits
+        changed = 0
+        for key, value in new_data.items():
+            bit = bits.get(key)
+            if bit is not None and getattr(self, key) != value:
                 setattr(self, key, value)
-            setattr(self, 'timestamp',
-                    datetime.now().strftime("%m/%d/%Y, %H:%M:%S.%f"))
-
-        # Check to see if there are changes in any of the data other than
-        # the timestamp.  This will trigger the is_new parameter
-        if 'timestamp' in obj_data_dict:
-            del obj_data_dict['timestamp']
-        if 'timestamp' in new_data_dict:
-            del new_data_dict['timestamp']
-        if obj_data_dict != new_data_dict:
-            self._is_new = True
+                changed |= bit
+        self._time = time.time()
+        if changed:
+            self._changed |= changed
+            self._version += 1
+            if self._subscribers:
+                self._notify(changed)
+
+    def update_from_message(self, msg):
+        '''
+        Copies the fields of a pymavlink message straight into the record
+        without building the message's to_dict()
+        '''
+        changed = 0
+        for name, bit in self._field_bits:
+            value = getattr(msg, name)
+            if value.__class__ is bytes:
+                value = value.decode(errors="backslashreplace").rstrip("\x00")
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed |= bit
+        self._time = time.time()
+        if changed:
+            self._changed |= changed
+            self._version += 1
+            if self._subscribers:
+                self._notify(changed)
+
+    def update_values(self, values):
+        '''
+        update_attributes() from the value of every field in _fields
+        order, without building a dict.  Used by the derived records that
+        change on every packet
+        '''
+        changed = 0
+        for (name, bit), value in zip(self._field_bits, values):
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed |= bit
+        self._time = time.time()
+        if changed:
+            self._changed |= changed
+            self._version += 1
+            if self._subscribers:
+                self._notify(changed)
+
+    # ################# Change subscriptions ##################
+
+    @property
+    def version(self):
+        ''' The number of updates that changed a field '''
+        return self._version
+
+    def subscribe(self, callback):
+        '''
+        Calls callback(record, changed_fields) after every update that
+        changes a field.  It runs in the thread that made the update
+        (usually the MavlinkManager's message thread) so it must not block.
+        '''
+        if callback not in self._subscribers:
+            self._subscribers = self._subscribers + (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = tuple(c for c in self._subscribers
+                                  if c != callback)
+
+    def _notify(self, changed):
+        changed_fields = [name for name, bit in self._field_bits
+                          if changed & bit]
+        for callback in self._subscribers:
+            try:
+                callback(self, changed_fields)
+            except Exception as e:
+                print(f"{self.message_class} subscriber {callback} "
+                      f"failed: {e}")
+
+    @property
+    def timestamp(self):
+        return format_timestamp(self._time)
 
     def to_dict(self):
-        excluded_vars = {
-                '_is_new',
-                '_message_class',
-                # 'timestamp'
-            }
-        return {
-            key: value for key, value in vars(self).items()
-            if key not in excluded_vars}
+        # Replaced in every subclass by _compile_to_dict
+        result = {'timestamp': self.timestamp}
+        for name in self._fields:
+            result[name] = getattr(self, name)
+        result['message_class'] = self.message_class
+        return result
+
+    @property
+    def changed_fields(self):
+        ''' The fields changed since is_new was last read '''
+        return [name for name, bit in self._field_bits
+                if self._changed & bit]
 
     @property
     def is_new(self):
-        result = self._is_new
-        self._is_new = False  # Auto reset when accessed
+        result = self._changed != 0
+        self._changed = 0  # Auto reset when accessed
         return result
 
 
+_status_record_classes = {}
+
+
+def status_record_class(name: str, fields):
+    '''
+    Returns the slotted DynamicStatusClass subclass for a message schema.
+    Classes are cached so every record of the same schema shares one.
+    '''
+    fields = tuple(f for f in fields
+                   if f not in RESERVED_FIELD_NAMES and not f.startswith('_'))
+    key = (name, fields)
+    record_class = _status_record_classes.get(key)
+    if record_class is None:
+        record_class = type(
+            name,
+            (DynamicStatusClass,),
+            {'__slots__': fields, '_fields': fields}
+        )
+        _status_record_classes[key] = record_class
+    return record_class
+
+
+class StatusCursor:
+    '''
+    One reader's position in a status record's updates.  Each reader
+    keeps its own cursor so reading it does not clear the change for
+    anyone else.  The record is looked up by name on every read, so a
+    cursor can be made before the first message builds the record.
+
+    Example:
+        position_cursor = agent_status.cursor('agent_position')
+        ...
+        if position_cursor.is_new:
+            lat = position_cursor.record.lat
+    '''
+
+    __slots__ = ('_owner', '_key', '_seen')
+
+    def __init__(self, owner, key: str):
+        self._owner = owner
+        self._key = key
+        # Everything is new until it is read the first time
+        self._seen = -1
+
+    @property
+    def record(self):
+        return getattr(self._owner, self._key, None)
+
+    def has_new(self) -> bool:
+        ''' True if the record changed since this cursor last looked '''
+        record = getattr(self._owner, self._key, None)
+        return record is not None and record._version != self._seen
+
+    @property
+    def is_new(self) -> bool:
+        ''' has_new() and move the cursor up to the current version '''
+        record = getattr(self._owner, self._key, None)
+        if record is None or record._version == self._seen:
+            return False
+        self._seen = record._version
+        return True
+
+
 class AgentPosition(DynamicStatusClass):
     '''
     The current data from GLOBAL_POSITION_INT converted to decimal
@@ -89,6 +376,10 @@ class AgentPosition(DynamicStatusClass):
         `hdg_rad (float)`: vehicle heading (yaw angle) (rad)
     '''
 
+    _fields = ('lat', 'lon', 'alt', 'relative_alt',
+               'vx', 'vy', 'vz', 'hdg', 'hdg_rad')
+    __slots__ = _fields
+
     def __init__(self, lat=0.0, lon=0.0, alt=0.0, relative_alt=0.0,
                  vx=0.0, vy=0.0, vz=0.0, hdg=0.0, hdg_rad=0.0):
         super().__init__(lat=lat/1e7, lon=lon/1e7,
@@ -100,22 +391,101 @@ class AgentPosition(DynamicStatusClass):
     def __call__(self):
         return self.to_dict()
 
-    def __getattr__(self, name):
-        if name in self.__dict__:
-            return self.__dict__[name]
-        raise AttributeError(f"'{self.__class__.__name__}' "
-                             f"object has no attribute '{name}'")
-
     def __getitem__(self, key):
         return self.to_dict()[key]
 
     def __setitem__(self, key, value):
-        self.to_dict()[key] = value
+        self.update_attributes({key: value})
 
     def __str__(self):
         return str(self.to_dict())
 
 
+# ################# Derived status ##################
+
+PREARM_CHECK = mavutil.mavlink.MAV_SYS_STATUS_PREARM_CHECK
+SAFETY_ARMED = mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED
+
+# MAVLink message type -> [(status key, derive(msg, agent_status)), ...]
+# derive returns the values of the key record's fields in _fields order,
+# or None to leave the record as it is.  They run in the order declared
+DERIVED_FIELDS = {}
+
+
+def derived_field(msg_type: str, key: str):
+    '''
+    Declares derive(msg, agent_status) as a derived status of every
+    AgentStatus: each msg_type packet updates the key record with the
+    values derive returns.
+    '''
+    def register(derive):
+        DERIVED_FIELDS.setdefault(msg_type, []).append((key, derive))
+        return derive
+    return register
+
+
+_mode_strings = {}
+
+
+def mode_string(msg) -> str:
+    '''
+    mavutil.mode_string_v10(msg), worked out once for each
+    (autopilot, type, base_mode, custom_mode) seen
+    '''
+    key = (msg.autopilot, msg.type, msg.base_mode, msg.custom_mode)
+    mode = _mode_strings.get(key)
+    if mode is None:
+        mode = _mode_strings[key] = mavutil.mode_string_v10(msg)
+    return mode
+
+
+@derived_field('GLOBAL_POSITION_INT', 'agent_position')
+def _agent_position(msg, agent_status):
+    hdg = msg.hdg / 1e2
+    return (msg.lat / 1e7, msg.lon / 1e7,
+            msg.alt / 1e3, msg.relative_alt / 1e3,
+            msg.vx, msg.vy, msg.vz,
+            hdg, hdg * math.pi / 180)
+
+
+@derived_field('HEARTBEAT', 'flight_mode')
+def _flight_mode(msg, agent_status):
+    return (mode_string(msg),)
+
+
+@derived_field('HEARTBEAT', 'sys_status')
+def _mav_state(msg, agent_status):
+    # General ArduPilot readiness such as booting up, calibration, etc.
+    # It will not trigger for things like out of the Fence.
+    return (MAV_STATE_DICT[msg.system_status],)
+
+
+derived_field('SYS_STATUS', 'battery_health')(
+    lambda msg, agent_status: (msg.battery_remaining,))
+
+
+@derived_field('SYS_STATUS', 'prearm_status')
+def _prearm_status(msg, agent_status):
+    # Whether (T/F) you can arm the drone
+    return (bool(msg.onboard_control_sensors_health & PREARM_CHECK),)
+
+
+@derived_field('SYS_STATUS', 'arm_state')
+def _arm_state(msg, agent_status):
+    heartbeat = getattr(agent_status, 'HEARTBEAT', None)
+    if heartbeat is None:
+        return None
+    if heartbeat.system_status == mavutil.mavlink.MAV_STATE_ACTIVE:
+        state = 4
+    elif not msg.onboard_control_sensors_health & PREARM_CHECK:
+        state = 0
+    elif heartbeat.base_mode & SAFETY_ARMED:
+        state = 3
+    else:
+        state = 2
+    return (ARM_STATE_DICT[state],)
+
+
 class AgentStatus:
     '''
     This retains important current states for the agent. There are default
@@ -148,16 +518,36 @@ class AgentStatus:
     Methods:
         - `has_new (key: str)`: You can call this at any time to see if the
          parameter defined by key has a new value
+        - `subscribe (key: str, callback)`: callback(record, changed_fields)
+         is called every time the parameter defined by key changes
+        - `cursor (key: str)`: returns a StatusCursor so that more than one
+         reader can check the same parameter for new values
+        - `subscribe_all (callback)`: like subscribe() for every parameter
         - `build_message_object (msg_type: str, input_dict: dict)`: Add a new
          parameter to the AgentStatus object.
+        - `add_derived_field (msg_type, key, fields, derive)`: Add a
+         parameter computed from every msg_type packet
     '''
 
     def __init__(self, config: dict):
 
-        # The timestamp of the last time this AgentStatus object was changed
-        self.timestamp = datetime.now().strftime("%m/%d/%Y, %H:%M:%S.%f")
+        # The time of the last time this AgentStatus object was changed
+        self._time = time.time()
         self._config = config
 
+        # key -> callbacks.  Kept here so records that are built later
+        # (the MAVLink messages) get their subscribers when they are built
+        self._subscriptions = {}
+        self._all_subscribers = []
+        # Held while records are built and subscribed, since the MAVLink
+        # thread builds records while other threads subscribe
+        self._lock = threading.Lock()
+
+        # This agent's derived status: the declared DERIVED_FIELDS plus
+        # any added with add_derived_field()
+        self._derived = {msg_type: list(derivations)
+                         for msg_type, derivations in DERIVED_FIELDS.items()}
+
         # The agent ID set in the agent_configuration YAML file
         self.agent_id = self._config["AGENT_ID"]
 
@@ -172,6 +562,10 @@ class AgentStatus:
         self.build_message_class("arm_state", {"state": None})
         self.build_message_class("battery_health", {"state": 0})
 
+    @property
+    def timestamp(self):
+        return format_timestamp(self._time)
+
     def has_new(self, key):
         # This function looks to see if the parameter you are asking for
         # has a new value.  The 'key' is a string of the parameter name
@@ -192,122 +586,89 @@ class AgentStatus:
         If it's a custom parameter, it will be as it's defined in msg_type
         ex: self.build_message_class("flight_mode", {"mode": None})
         '''
-        self.timestamp = datetime.now().strftime("%m/%d/%Y, %H:%M:%S.%f")
-        original_msg_dict = input_dict
-        if 'mavpackettype' in original_msg_dict.keys():
-            del original_msg_dict['mavpackettype']
-        msg_dict = {msg_type: original_msg_dict}
-        # Add a timestamp to the dictionary data
-        for key, value in msg_dict.items():
-            value['_message_class'] = key
-            dynamic_class = type(
-                    key,
-                    (DynamicStatusClass,),
-                    {}
-                )
-            # Instantiate an object of the dynamically created class
-            instance = dynamic_class(**value)
-            setattr(self, key, instance)
+        self._time = time.time()
+        msg_dict = dict(input_dict)
+        msg_dict.pop('mavpackettype', None)
+        msg_dict['_message_class'] = msg_type
+        record_class = status_record_class(msg_type, msg_dict.keys())
+        # Instantiate an object of the slotted record class
+        record = record_class(**msg_dict)
+        with self._lock:
+            for callback in self._subscriptions.get(msg_type, ()):
+                record.subscribe(callback)
+            for callback in self._all_subscribers:
+                record.subscribe(callback)
+            setattr(self, msg_type, record)
+
+    def subscribe(self, key: str, callback):
+        '''
+        Calls callback(record, changed_fields) every time the parameter
+        defined by key ('flight_mode', 'agent_position', 'HEARTBEAT', ...)
+        changes.  The parameter does not have to exist yet.
+        '''
+        with self._lock:
+            callbacks = self._subscriptions.setdefault(key, [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+            record = getattr(self, key, None)
+            if isinstance(record, DynamicStatusClass):
+                record.subscribe(callback)
+        return callback
+
+    def unsubscribe(self, key: str, callback):
+        with self._lock:
+            callbacks = self._subscriptions.get(key, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            record = getattr(self, key, None)
+            if isinstance(record, DynamicStatusClass):
+                record.unsubscribe(callback)
+
+    def subscribe_all(self, callback):
+        '''
+        Calls callback(record, changed_fields) when any parameter changes,
+        including the ones built later
+        '''
+        with self._lock:
+            if callback not in self._all_subscribers:
+                self._all_subscribers.append(callback)
+            # Records built after this get callback in build_message_class
+            for record in list(vars(self).values()):
+                if isinstance(record, DynamicStatusClass):
+                    record.subscribe(callback)
+        return callback
+
+    def cursor(self, key: str) -> StatusCursor:
+        ''' A new reader's StatusCursor for the parameter defined by key '''
+        return StatusCursor(self, key)
+
+    def add_derived_field(self, msg_type: str, key: str, fields, derive):
+        '''
+        Adds the parameter key, computed from every msg_type packet.
+        derive(msg, agent_status) returns the values of fields in order
+        (or None to skip the packet).
+        ex: self.agent_status.add_derived_field(
+                'VFR_HUD', 'climbing', ('state',),
+                lambda msg, status: (msg.climb > 0.5,))
+        '''
+        if not hasattr(self, key):
+            self.build_message_class(key, dict.fromkeys(fields))
+        self._derived.setdefault(msg_type, []).append((key, derive))
 
     def update_message_object(self, msg_from_ardupilot):
-        # Update the timestamp for the AgentStatus object anytime a parameter
+        # Update the time for the AgentStatus object anytime a parameter
         # gets updated
-        self.timestamp = datetime.now().strftime("%m/%d/%Y, %H:%M:%S.%f")
+        self._time = time.time()
 
         # This updates the already generated parameter objects of the
-        # AgentStatus object with new data.  This will also trigger the
-        # is_new attribute of the object so that the has_new() method
-        # will return True
+        # AgentStatus object with new data in place.  Any field that
+        # changes sets the is_new attribute of the object so that the
+        # has_new() method will return True
         msg_type = msg_from_ardupilot.get_type()
-        msg_dict = msg_from_ardupilot.to_dict()
-        del msg_dict['mavpackettype']
-        obj = getattr(self, msg_type)
-        obj.update_attributes(msg_dict)
-
-        # ### Higher fidelity class parameters from the default messages ###
-        if msg_type == 'GLOBAL_POSITION_INT':
-            # Update the AgentPosition object within the AgentStatus
-            msg_dict["lat"] = msg_dict['lat']/1e7
-            msg_dict["lon"] = msg_dict['lon']/1e7
-            msg_dict["alt"] = msg_dict['alt']/1e3
-            msg_dict["relative_alt"] = msg_dict['relative_alt']/1e3
-            msg_dict["hdg"] = msg_dict['hdg']/1e2
-            msg_dict["hdg_rad"] = msg_dict['hdg']*math.pi/180
-            self._update_custom_class_object(self.agent_position, msg_dict)
-
-        if msg_type == 'HEARTBEAT':
-            # Update the flight_mode
-            mode = mavutil.mode_string_v10(msg_from_ardupilot)
-            self._update_custom_class_object(
-                self.flight_mode, {"mode": mode})
-            # Update the mav_state.  This is general ArduPilot
-            # readiness such as booting up, calibration, etc.
-            # It will not trigger for things like out of the Fence.
-            mav_state = MAV_STATE_DICT[msg_dict['system_status']]
-            self._update_custom_class_object(
-                self.sys_status, {"mav_state": mav_state})
-
-        if msg_type == 'SYS_STATUS':
-            # Update the battery remaining
-            self._update_custom_class_object(
-                self.battery_health, {"state": msg_dict['battery_remaining']}
-            )
-
-            # Get the prearm status - Whether (T/F) you can arm the drone
-            bitmask_health = int(
-                msg_from_ardupilot.to_dict()['onboard_control_sensors_health'])
-            status_bits = format(bitmask_health, "032b")
-            status_to_check = [mavutil.mavlink.MAV_SYS_STATUS_PREARM_CHECK]
-            prearm_status = self._check_MAV_SYS_STATUS_SENSOR_prearm_status(
-                status_bits, status_to_check)[268435456]
-
-            self._update_custom_class_object(
-                self.prearm_status, {"status": prearm_status})
-
-            # Get the current arm state of the drone
-            if (prearm_status) is False:
-                final_prearm_status = 0
-            else:
-                if (self.HEARTBEAT.base_mode == 89 or
-                        self.HEARTBEAT.base_mode == 81):
-                    final_prearm_status = 2
-                elif (self.HEARTBEAT.base_mode == 209 or
-                        self.HEARTBEAT.base_mode == 217):
-                    final_prearm_status = 3
-            if self.HEARTBEAT.system_status == 4:
-                final_prearm_status = 4
-
-            self._update_custom_class_object(
-                self.arm_state, {"state": ARM_STATE_DICT[final_prearm_status]})
-
-    def _update_custom_class_object(self, obj, msg_input_dict):
-        # This is a helper function that iterates through the keys of the
-        # passed dictionary (for example the MAVLink message data) and
-        # populates the associated AgentStatus parameter that represents
-        # that MAVLink message
-        obj_vars = list(obj.to_dict().keys())
-        # print(obj_vars)
-
-        # Ensure 'name' is present in msg_input_dict
-        msg_input_dict['message_class'] = getattr(obj, 'message_class', None)
-
-        msg_input_dict['timestamp'] = \
-            datetime.now().strftime("%m/%d/%Y, %H:%M:%S.%f")
-        # print(msg_input_dict)
-        obj_var_dict = {}
-        for obj_var in obj_vars:
-            obj_var_dict[obj_var] = msg_input_dict.get(obj_var, None)
-        obj.update_attributes(obj_var_dict)
-
-    def _check_MAV_SYS_STATUS_SENSOR_prearm_status(
-            self, status_bits, check_status_ids):
-        # Helper function to determine whether the agent is ready to arm or not
-        running_status = dict()
-        for status_id in check_status_ids:
-            pos = int(math.log(status_id, 2)) + 1
-            if str(status_bits)[32-int(pos)] == '1':
-                running_status[status_id] = True
-            else:
-                running_status[status_id] = False
-
-        return running_status
+        getattr(self, msg_type).update_from_message(msg_from_ardupilot)
+
+        # ### Higher fidelity class parameters (see DERIVED_FIELDS) ###
+        for key, derive in self._derived.get(msg_type, ()):
+            values = derive(msg_from_ardupilot, self)
+            if values is not None:
+                getattr(self, key).update_values(values)
@@ -0,0 +1,136 @@
+'''
+Measures the CPU used by the AgentCore main loop with the old back to back
+loop (AGENT_LOOP: EVENT_DRIVEN False) and the event-driven loop, for an
+idle agent (nothing changes) and an active agent (GLOBAL_POSITION_INT at
+--rate Hz and a C3 message every second).
+
+The loop runs against a real AgentStatus and stand-in C3 nodes, without
+MAVLink or ZeroMQ, so only the loop itself is measured.  CPU is the
+process CPU time over the run divided by the wall time (1.0 = one core).
+
+Run from the agent_core directory:
+    python benchmarks/agent_loop_cpu.py --seconds 5 --rate 50
+'''
+import os
+import sys
+import time
+import argparse
+import threading
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from agent_status_class import AgentStatus  # noqa: E402
+from classes.agent_core import AgentCore  # noqa: E402
+from classes.agentutils import AgentUtils  # noqa: E402
+
+
+class BenchMessage:
+    sender = 'c3'
+
+
+class BenchNode:
+    ''' Stands in for an AgentC3Node '''
+
+    def __init__(self):
+        self.message = BenchMessage()
+        self.message_event = None
+        self._is_new = False
+
+    @property
+    def is_new(self):
+        result = self._is_new
+        self._is_new = False
+        return result
+
+    def receive(self):
+        self._is_new = True
+        if self.message_event is not None:
+            self.message_event.set()
+
+
+class BenchHub:
+    pass
+
+
+class BenchC3NodeManager:
+    def __init__(self):
+        self.c3Nodes = [BenchNode(), BenchNode()]
+
+
+class BenchAgent(AgentCore):
+    '''
+    AgentCore without the AgentHub.  The loop stops itself at the end of
+    the run and counts the passes
+    '''
+
+    def __init__(self, config, seconds):
+        self.config = config
+        self.agent_status = AgentStatus(config)
+        self.agent_hub = BenchHub()
+        self.agent_hub.agent_status_obj = self.agent_status
+        self.c3nm = BenchC3NodeManager()
+        self._setup_loop_wakeup()
+        self.passes = 0
+        self.positions_seen = 0
+        self._end = time.monotonic() + seconds
+
+    def agent_core_main_loop(self):
+        self.passes += 1
+        if self.agent_status.agent_position.is_new:
+            self.positions_seen += 1
+        return time.monotonic() < self._end
+
+    def process_c3_input(self, c3_message):
+        pass
+
+
+def run(config, seconds, rate, active):
+    agent = BenchAgent(config, seconds)
+    stop = threading.Event()
+
+    def feed():
+        lat = 39.0
+        next_c3 = time.monotonic() + 1.0
+        while not stop.wait(1.0 / rate):
+            lat += 1e-6
+            agent.agent_status.agent_position.update_attributes({'lat': lat})
+            if time.monotonic() > next_c3:
+                agent.c3nm.c3Nodes[0].receive()
+                next_c3 += 1.0
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    if active:
+        feeder.start()
+
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    agent._agent_core_loop(threading.Event(), 0)
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+    stop.set()
+    return cpu / wall, agent.passes / wall, agent.positions_seen
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rate', type=float, default=50,
+                        help='position updates per second when active')
+    parser.add_argument('--config', default='ag_config_1.yaml')
+    args = parser.parse_args()
+
+    config = AgentUtils.get_config_dict(args.config)
+    min_rate = config.get('AGENT_LOOP', {}).get('MIN_RATE', 20)
+
+    print(f"{'loop':14s} {'agent':7s} {'cpu':>6s} {'passes/s':>10s} "
+          f"{'positions':>10s}")
+    for label, event_driven in (('back to back', False),
+                                (f"event ({min_rate} Hz)", True)):
+        config['AGENT_LOOP'] = {'EVENT_DRIVEN': event_driven,
+                                'MIN_RATE': min_rate}
+        for active in (False, True):
+            cpu, passes, positions = run(config, args.seconds, args.rate,
+                                         active)
+            print(f"{label:14s} {'active' if active else 'idle':7s} "
+                  f"{cpu:6.2f} {passes:10.0f} {positions:10d}")
@@ -0,0 +1,85 @@
+'''
+Times a pairwise proximity DictTrigger the way C3Terminal uses it, with
+the distances given as a dict (list_of_distances and C3NodeDictVar.update)
+and as an array (distance_array and C3NodeDictVar.update_array), and
+checks that both find the same pairs.  Each update moves every agent a
+little, then recomputes the distances and evaluates the trigger.
+
+Run from the agent_core directory:
+    python benchmarks/dict_trigger.py --agents 10 50 100 200 --updates 20
+'''
+import os
+import sys
+import time
+import random
+import argparse
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from classes.trigger import TriggerManager  # noqa: E402
+from classes.c3_node_utils import C3NodeUtils  # noqa: E402
+
+
+class BenchNode:
+    connected_clients = {}
+
+
+def build_fleet(count):
+    return {'agents': {
+        str(80001 + n): {'lat': 39.0 + random.uniform(0, 0.01),
+                         'lon': -104.9 + random.uniform(0, 0.01),
+                         'alt': random.uniform(0, 50)}
+        for n in range(count)}, 'timestamp': None}
+
+
+def declare(operator, threshold):
+    manager = TriggerManager(BenchNode())
+    var = manager.C3NodeDictVar(manager, 'distance')
+    trigger = manager.DictTrigger(manager, 'distance', operator, threshold,
+                                  repeat=True)
+    return var, trigger
+
+
+def run(count, operator, threshold, updates):
+    fleet = build_fleet(count)
+    dict_var, dict_trigger = declare(operator, threshold)
+    array_var, array_trigger = declare(operator, threshold)
+    dict_time = array_time = 0.0
+
+    for _ in range(updates):
+        for agent in fleet['agents'].values():
+            agent['lat'] += random.uniform(-0.0005, 0.0005)
+
+        start = time.perf_counter()
+        dict_var.update(C3NodeUtils.list_of_distances(fleet))
+        dict_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        array_var.update_array(*C3NodeUtils.distance_array(fleet))
+        array_time += time.perf_counter() - start
+
+        assert dict_trigger.dict.keys() == array_trigger.dict.keys()
+
+    return (dict_time / updates * 1e3, array_time / updates * 1e3,
+            len(array_trigger.dict))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--agents', type=int, nargs='+',
+                        default=[10, 50, 100, 200])
+    parser.add_argument('--updates', type=int, default=20)
+    parser.add_argument('--threshold', type=float, default=300)
+    args = parser.parse_args()
+
+    random.seed(1)
+    print(f"{'agents':>6s} {'pairs':>6s} {'operator':>8s} "
+          f"{'dict ms':>8s} {'array ms':>8s} {'matched':>8s}")
+    for count in args.agents:
+        for operator in ('<', 'l->h', 'h->l'):
+            dict_ms, array_ms, matched = run(count, operator,
+                                             args.threshold, args.updates)
+            print(f"{count:6d} {count * (count - 1) // 2:6d} "
+                  f"{operator:>8s} {dict_ms:8.2f} {array_ms:8.2f} "
+                  f"{matched:8d}")
@@ -0,0 +1,164 @@
+'''
+Compares the packet latency from the ArduPilot to the MavlinkManager's
+connection for:
+
+    - router: the in-process MavlinkRouter (master -> in-memory queue)
+    - mavproxy: MAVProxy with a udpin output that the MavlinkManager
+        connects to over UDP, the way AgentHub.start_mavproxy sets it up.
+        If mavproxy.py is not installed, a relay process that forwards the
+        UDP packets stands in for the extra process hop and UDP copy.
+
+A fake vehicle sends SYSTEM_TIME messages stamped with the time they were
+sent, and the receiver records the time each one arrives.
+
+Run from the agent_core directory:
+    python benchmarks/router_latency.py --count 2000 --rate 200
+'''
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import subprocess
+import statistics
+from multiprocessing import Process, Event
+
+from pymavlink import mavutil
+os.environ['MAVLINK20'] = '1'
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from classes.mavlink_router import MavlinkRouter  # noqa: E402
+
+MASTER_PORT = 16550
+HOP_PORT = 16551
+CLIENT_PORT = 16552
+
+
+def fake_vehicle(port, count, rate, ready):
+    vehicle = mavutil.mavlink_connection(f"udpout:127.0.0.1:{port}",
+                                         source_system=1)
+    ready.wait()
+    period = 1.0 / rate
+    for _ in range(count):
+        vehicle.mav.system_time_send(time.time_ns() // 1000, 0)
+        time.sleep(period)
+    vehicle.close()
+
+
+def udp_relay(listen_port, out_port, stop):
+    # One UDP copy through another process, like MAVProxy's udpin output
+    inbound = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    inbound.bind(('127.0.0.1', listen_port))
+    inbound.settimeout(0.2)
+    outbound = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    outbound.bind(('127.0.0.1', out_port))
+    outbound.setblocking(False)
+    client = None
+    while not stop.is_set():
+        try:
+            _, client = outbound.recvfrom(65535)
+        except BlockingIOError:
+            pass
+        try:
+            data, _ = inbound.recvfrom(65535)
+        except socket.timeout:
+            continue
+        if client is not None:
+            outbound.sendto(data, client)
+
+
+def collect(connection, count, timeout=2.0):
+    latencies = []
+    while len(latencies) < count:
+        msg = connection.recv_match(type='SYSTEM_TIME', blocking=True,
+                                    timeout=timeout)
+        if msg is None:
+            break
+        latencies.append(time.time_ns() / 1000 - msg.time_unix_usec)
+    return latencies
+
+
+def run_router(count, rate):
+    config = {'AGENT_ID': 'bench', 'MAVPROXY_OUTPUTS': []}
+    router = MavlinkRouter(config, master=f"udpin:127.0.0.1:{MASTER_PORT}")
+    router.start()
+    ready = Event()
+    vehicle = Process(target=fake_vehicle,
+                      args=(MASTER_PORT, count, rate, ready))
+    vehicle.start()
+    ready.set()
+    latencies = collect(router.connection(), count)
+    vehicle.join()
+    router.stop()
+    return latencies
+
+
+def run_hop(count, rate):
+    stop = Event()
+    mavproxy = shutil.which('mavproxy.py')
+    if mavproxy is not None:
+        label = 'mavproxy'
+        hop = subprocess.Popen(
+            [mavproxy, f"--master=udpin:127.0.0.1:{MASTER_PORT}",
+             f"--out=udpin:127.0.0.1:{CLIENT_PORT}",
+             "--daemon", "--non-interactive", "--streamrate=-1"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(3)
+        vehicle_port = MASTER_PORT
+    else:
+        label = 'udp relay (mavproxy.py not found)'
+        hop = Process(target=udp_relay, args=(HOP_PORT, CLIENT_PORT, stop))
+        hop.start()
+        time.sleep(0.5)
+        vehicle_port = HOP_PORT
+
+    # Connect the same way the MavlinkManager does
+    client = mavutil.mavlink_connection(f"udpout:127.0.0.1:{CLIENT_PORT}")
+    client.mav.heartbeat_send(1, 1, 1, 1, 1, 1)
+
+    ready = Event()
+    vehicle = Process(target=fake_vehicle,
+                      args=(vehicle_port, count, rate, ready))
+    vehicle.start()
+    ready.set()
+    latencies = collect(client, count)
+    vehicle.join()
+
+    if mavproxy is not None:
+        hop.terminate()
+        hop.wait()
+    else:
+        stop.set()
+        hop.join()
+    client.close()
+    return label, latencies
+
+
+def report(label, latencies, count):
+    if not latencies:
+        print(f"{label:36s} no packets received")
+        return
+    latencies = sorted(latencies)
+    n = len(latencies)
+
+    def pct(p):
+        return latencies[min(int(p * n), n - 1)] / 1000
+
+    print(f"{label:36s} {n:5d}/{count:<5d} "
+          f"mean {statistics.mean(latencies) / 1000:7.3f}  "
+          f"p50 {pct(0.50):7.3f}  p95 {pct(0.95):7.3f}  "
+          f"p99 {pct(0.99):7.3f}  max {latencies[-1] / 1000:7.3f}  (ms)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=200)
+    args = parser.parse_args()
+
+    report('router', run_router(args.count, args.rate), args.count)
+    label, latencies = run_hop(args.count, args.rate)
+    report(label, latencies, args.count)
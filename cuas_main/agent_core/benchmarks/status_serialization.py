@@ -0,0 +1,118 @@
+'''
+Times the serialization of the AgentStatus records:
+
+    - vars walk: the original to_dict(), a comprehension over vars(self)
+        excluding the bookkeeping names, on a plain (unslotted) record
+    - field loop: a loop over the record's _fields with the timestamp
+        formatted by strftime
+    - return_json: the original AgentUtils.return_json, which walks dir()
+        and test-runs json.dumps on every attribute
+    - compiled: the to_dict() compiled for the record's schema
+    - compiled json: json.dumps of the compiled to_dict(), which is what
+        an agent sends to its C3 nodes
+
+Run from the agent_core directory:
+    python benchmarks/status_serialization.py --number 200000
+'''
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+from datetime import datetime
+
+from pymavlink import mavutil
+os.environ['MAVLINK20'] = '1'
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from agent_status_class import AgentStatus, TIMESTAMP_FORMAT  # noqa: E402
+
+mavlink = mavutil.mavlink
+
+
+class VarsRecord:
+    ''' A record the way the original DynamicStatusClass stored it '''
+
+    def __init__(self, record):
+        self._is_new = True
+        self.timestamp = record.timestamp
+        for name in record._fields:
+            setattr(self, name, getattr(record, name))
+        self.message_class = record.message_class
+
+    def to_dict(self):
+        excluded_vars = {
+                '_is_new',
+                '_message_class',
+            }
+        return {
+            key: value for key, value in vars(self).items()
+            if key not in excluded_vars}
+
+
+def field_loop_to_dict(record):
+    result = {'timestamp': datetime.fromtimestamp(
+        record._time).strftime(TIMESTAMP_FORMAT)}
+    for name in record._fields:
+        result[name] = getattr(record, name)
+    result['message_class'] = record.message_class
+    return result
+
+
+def dir_return_json(obj):
+    final_attribute_list = [a for a in dir(obj) if not a.startswith('__')
+                            and not callable(getattr(obj, a))]
+    final_attribute_dict = dict()
+    for attribute in final_attribute_list:
+        try:
+            json.dumps(getattr(obj, attribute))
+            attribute_value = getattr(obj, attribute)
+        except Exception:
+            attribute_value = getattr(obj, attribute).__str__()
+        final_attribute_dict.update({attribute: attribute_value})
+    return json.dumps(final_attribute_dict)
+
+
+def build_status():
+    status = AgentStatus({'AGENT_ID': 'bench'})
+    heartbeat = mavlink.MAVLink_heartbeat_message(
+        mavlink.MAV_TYPE_QUADROTOR, mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+        89, 4, mavlink.MAV_STATE_STANDBY, 3)
+    status.build_message_class('HEARTBEAT', heartbeat.to_dict())
+    status.agent_position.update_attributes({
+        'lat': 39.0173, 'lon': -104.8931, 'alt': 2192.4,
+        'relative_alt': 10.2, 'vx': 120, 'vy': -35, 'vz': 2,
+        'hdg': 271.5, 'hdg_rad': 4.7385})
+    return status
+
+
+def time_call(function, number):
+    return timeit.timeit(function, number=number) / number * 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    status = build_status()
+    print(f"{'record':16s} {'path':14s} {'usec/call':>10s}")
+    for key in ('HEARTBEAT', 'agent_position'):
+        record = getattr(status, key)
+        # Keep the record's time moving the way live updates do
+        record._time = time.time()
+        assert record.to_dict() == field_loop_to_dict(record)
+        vars_record = VarsRecord(record)
+        paths = (
+            ('vars walk', vars_record.to_dict),
+            ('field loop', lambda: field_loop_to_dict(record)),
+            ('return_json', lambda: dir_return_json(vars_record)),
+            ('compiled', record.to_dict),
+            ('compiled json', lambda: json.dumps(record.to_dict())),
+        )
+        for label, function in paths:
+            print(f"{key:16s} {label:14s} "
+                  f"{time_call(function, args.number):10.3f}")
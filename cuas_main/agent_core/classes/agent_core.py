@@ -95,6 +95,9 @@ class AgentCore:
         # and process_c3_input
         self.establish_logic_objects()
 
+        # Wake the main loop on status changes and C3 messages
+        self._setup_loop_wakeup()
+
         # Thread to run primary control logic loop functions
         self.stopFlag = threading.Event()
         thread = threading.Thread(target=self._run_agent_core_loop_thread,
@@ -405,19 +408,74 @@ class AgentCore:
 
     # ###############################################################
 
+    def _wait_for_ready(self):
+        '''
+        Waits (up to STARTUP: STATUS_TIMEOUT sec) for the message intervals
+        to be acknowledged and the AgentStatus to have every default
+        message, then prints the startup timing report
+        '''
+        mavlink_manager = self.agent_hub.mavlink_manager
+        timeout = float(self.config.get('STARTUP', {}).get(
+            'STATUS_TIMEOUT', 5))
+        deadline = time.monotonic() + timeout
+
+        if mavlink_manager.mavlink_ready:
+            for ready_event in (mavlink_manager.intervals_acknowledged,
+                                mavlink_manager.status_ready):
+                ready_event.wait(max(deadline - time.monotonic(), 0))
+            if not mavlink_manager.status_ready.is_set():
+                print(f"{self.config['AGENT_ID']}: starting before the "
+                      f"agent status has every message "
+                      f"{sorted(mavlink_manager.status_types_waiting)}")
+
+        self.agent_hub.startup_timer.mark('loop started')
+        print(self.agent_hub.startup_timer.report())
+
+    def _setup_loop_wakeup(self):
+        '''
+        With AGENT_LOOP: EVENT_DRIVEN (the default) the main loop sleeps
+        until the AgentStatus changes, a C3 node receives a message or
+        1 / MIN_RATE seconds pass, whichever comes first.  Set
+        EVENT_DRIVEN to False to run the loop back to back as before.
+        '''
+        loop_config = self.config.get('AGENT_LOOP', {})
+        self._event_driven = loop_config.get('EVENT_DRIVEN', True)
+        min_rate = float(loop_config.get('MIN_RATE', 20))
+        self._max_loop_wait = 1.0 / min_rate if min_rate > 0 else None
+        self._wake_event = threading.Event()
+
+        if self._event_driven:
+            self.agent_status.subscribe_all(
+                lambda record, changed_fields: self._wake_event.set())
+            for c3Node in self.c3nm.c3Nodes:
+                c3Node.message_event = self._wake_event
+
     # Main agent loop
     def _run_agent_core_loop_thread(self, event, loop_delay):
-        # Let the agent_status_obj and agent_hub get settled
-        # with a 3 sec sleep before starting the command loop
-        time.sleep(3)
+        # Let the agent_status_obj and agent_hub get settled before
+        # starting the command loop
+        self._wait_for_ready()
+        self._agent_core_loop(event, loop_delay)
+
+    def _agent_core_loop(self, event, loop_delay):
         # This defines the main_loop.  It does 2 things:
         # 1) manages the keyboard inputs
         # 2) calls the agent_core_loop_functions which is overriden
         #    in the my_agent code.
 
+        wake_event = self._wake_event
+        max_loop_wait = self._max_loop_wait
+
         while True:
             # self._manage_keyboard_inputs()
 
+            # Sleep until there is something new to look at.  Anything
+            # that changes while the loop functions run sets the event
+            # again so the next pass starts right away
+            if self._event_driven:
+                wake_event.wait(max_loop_wait)
+                wake_event.clear()
+
             # Add a loop delay if needed
             # (unlikely though and the defaultis no delay)
             if not event.wait(loop_delay):
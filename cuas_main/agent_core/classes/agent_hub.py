@@ -1,15 +1,19 @@
 import subprocess
 import threading
-import serial.tools.list_ports
 import time
 import platform
 import sys
 
 from agent_status_class import AgentStatus
 from classes.mavlink_manager import MavlinkManager
+from classes.mavlink_router import MavlinkRouter, find_flight_controller_port
 from classes.agent_command_manager import AgentCommandManager
+from classes.setpoint_stream import SetpointStream
+from classes.param_cache import ParamCache
+from classes.telemetry_history import TelemetryHistory
+from classes.fleet_status_table import FleetStatusPublisher
 from classes.c3_node import AgentC3NodeManager
-from classes.agentutils import TimeKeeper
+from classes.agentutils import TimeKeeper, StartupTimer
 
 
 class AgentHub():
@@ -17,31 +21,47 @@ class AgentHub():
     def __init__(self, config: dict, verbose=False):
 
         self.config = config
+        # Times each startup phase (see startup_timer.report())
+        self.startup_timer = StartupTimer(self.config['AGENT_ID'])
         self.agent_status_obj = AgentStatus(self.config)
+        # Fixed size history of the status records in TELEMETRY_HISTORY
+        self.telemetry_history = TelemetryHistory(self.config,
+                                                  self.agent_status_obj)
+        # This agent's row of the host's shared memory fleet table
+        self.fleet_status_publisher = None
+        if self.config.get('FLEET_TABLE', {}).get('ENABLED', False):
+            self.fleet_status_publisher = FleetStatusPublisher(
+                self.config, self.agent_status_obj)
         self._verbose = verbose
         self.mavproxy_process = None
         self.shutdown_event = threading.Event()
         self.check_os()
 
-        # Start MAVProxy in a separate thread
-        # self.kill_process_by_name('mavproxy.py')
-        mavproxy_thread = threading.Thread(target=self.start_mavproxy,
-                                           daemon=True)
-        mavproxy_thread.start()
-
-        port = 14551
-        while self.is_udp_port_active(port):
-            print("Waiting for mavproxy to become active...")
-            time.sleep(1)
+        # Either route the MAVLink traffic in this process or
+        # start MAVProxy in a separate thread
+        self.mavlink_router = None
+        mav_connection = None
+        if self.config.get('MAVLINK_ROUTER', {}).get('ENABLED', False):
+            self.mavlink_router = MavlinkRouter(self.config,
+                                                verbose=self._verbose)
+            self.mavlink_router.start()
+            mav_connection = self.mavlink_router.connection()
+            self.startup_timer.mark('router started')
+        else:
+            # self.kill_process_by_name('mavproxy.py')
+            mavproxy_thread = threading.Thread(target=self.start_mavproxy,
+                                               daemon=True)
+            mavproxy_thread.start()
 
-        time.sleep(1)
+            self.wait_for_udp_port(14551)
 
         # Create the agent's MAVLink Manager that is
         # used to manage the messages between the instance
         # of ArduPilot (like a CUBE) and AgentCore
         self.mavlink_lost_comm = False
         self.mavlink_manager = MavlinkManager(
-            self.config, self, verbose=self._verbose)
+            self.config, self, verbose=self._verbose,
+            mav_connection=mav_connection)
         self.mavlink_manager.run()
 
         # Create the agent's Command Manager that is
@@ -53,12 +73,39 @@ class AgentHub():
             verbose=verbose
         )
 
+        # Create the agent's GUIDED setpoint stream.  It shares the
+        # command manager's lock so that streamed setpoints and
+        # commands are not interleaved on the mav_connection
+        self.setpoint_stream = SetpointStream(
+            self.config,
+            self,
+            self.mavlink_manager.mav_connection,
+            send_lock=self.agent_command_manager._lock,
+            verbose=verbose
+        )
+
+        # Create the agent's parameter cache.  It is kept current from
+        # the PARAM_VALUE messages and is filled at connect time
+        self.param_cache = ParamCache(
+            self.config,
+            self,
+            self.mavlink_manager.mav_connection,
+            send_lock=self.agent_command_manager._lock,
+            verbose=verbose
+        )
+        self.mavlink_manager.add_message_handler(
+            'PARAM_VALUE', self.param_cache.param_value)
+        if (self.param_cache.fetch_on_connect and
+                self.mavlink_manager.mavlink_ready):
+            self.param_cache.fetch_all()
+
         # Create the agent's C3 Node Manager.  The manager
         # creates, stores and manages all active C3 nodes
         # as defined by the YAML file
         self.c3_node_manager = AgentC3NodeManager(self.config)
 
         self.send_status_updates_to_c3node()
+        self.startup_timer.mark('agent hub ready')
 
     def start_mavproxy(self):
         """
@@ -87,11 +134,9 @@ class AgentHub():
             time.sleep(1)
             sys.exit("Exiting the program")
 
-        # Read all the ports on the device and look for any that would
-        # Indicate a hardware instance of ArduPilot is connected
+        # Look for a port that would indicate a hardware instance
+        # of ArduPilot is connected
         port_found = False
-        ports = list(serial.tools.list_ports.comports())
-        self._vprint(ports)
 
         # outs = f"--out=udpin:127.0.0.1:{14550 + self.config['SYS_ID']} "
         outs = "--out=udpin:127.0.0.1:14551 "
@@ -99,25 +144,17 @@ class AgentHub():
             outs = f"{outs} --out=udpin:0.0.0.0:{out} "
         # print(f"Outs: {outs}")
 
-        for p in ports:
-            self._vprint(p)
-            if any(flt_ctlr in p.description for flt_ctlr in [
-                "CubeBlack",
-                "Cube",
-                "CUBE",
-                "USB Serial Device",
-                "ArduPilot"
-            ]):
-                print(f"#### {self.config['AGENT_ID']} "
-                      f"Establishing Connection to Cube ####")
-                port_found = True
-                mavproxy_command = (
-                    f"{mp} "  # Use 'mavproxy.exe' on Windows
-                    f"{outs}"
-                    "--daemon "
-                    "--non-interactive "
-                    "--streamrate=-1 "
-                )
+        if find_flight_controller_port(self._verbose) is not None:
+            print(f"#### {self.config['AGENT_ID']} "
+                  f"Establishing Connection to Cube ####")
+            port_found = True
+            mavproxy_command = (
+                f"{mp} "  # Use 'mavproxy.exe' on Windows
+                f"{outs}"
+                "--daemon "
+                "--non-interactive "
+                "--streamrate=-1 "
+            )
 
         # If no ArduPilot instance was found on a hardware port then
         # connect MAVProxy to the IP:port combo defined by SITL_ADDRESS
@@ -188,6 +225,42 @@ class AgentHub():
             time.sleep(1)
             sys.exit("Exiting the program")
 
+    def wait_for_udp_port(self, port, poll=0.05):
+        '''
+        Waits until MAVProxy has bound its udpin output on port, checking
+        every poll seconds for up to STARTUP: SOCKET_TIMEOUT seconds
+        '''
+        timeout = float(self.config.get('STARTUP', {}).get(
+            'SOCKET_TIMEOUT', 30))
+        deadline = time.monotonic() + timeout
+        announced = False
+        while not self.udp_port_bound(port):
+            if time.monotonic() > deadline:
+                print(f"MAVProxy did not open port {port} "
+                      f"in {timeout} sec")
+                return False
+            if not announced:
+                print("Waiting for mavproxy to become active...")
+                announced = True
+            time.sleep(poll)
+        self.startup_timer.mark('socket bound')
+        return True
+
+    def udp_port_bound(self, port):
+        ''' True if another process has bound 127.0.0.1:port '''
+        if self.config["OS"] != "LINUX":
+            return not self.is_udp_port_active(port)
+        # Read the kernel's socket table rather than binding the port to
+        # test it, which could take the port from MAVProxy for a moment.
+        # Addresses are hex: 0100007F:3903 is 127.0.0.1:14595
+        local = {f"0100007F:{port:04X}", f"00000000:{port:04X}"}
+        try:
+            with open('/proc/net/udp') as table:
+                next(table)
+                return any(line.split()[1] in local for line in table)
+        except (OSError, StopIteration, IndexError):
+            return not self.is_udp_port_active(port)
+
     def is_udp_port_active(self, port):
         result = subprocess.run(['netstat', '-an'],
                                 capture_output=True, text=True)
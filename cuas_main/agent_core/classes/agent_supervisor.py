@@ -0,0 +1,401 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+from datetime import datetime
+from threading import Thread, Event, Lock
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from classes.agentutils import AgentUtils
+
+
+'''
+Contains the following Classes:
+
+    - AgentProcessTable: The shared memory table with one row per
+        supervised agent
+    - AgentSupervisor: Runs each agent configuration in its own process,
+        restarts the ones that crash or hang and merges their output
+
+Run as a module, this file is the agent process the supervisor starts:
+    python -u -m classes.agent_supervisor --config ag_config_1.yaml
+        --agent-class my_agent:Agent1 --table cuas_agents --row 0
+'''
+
+
+class AgentProcessTable:
+    '''
+    A fixed size table of agent process status in shared memory, so the
+    supervisor, the agents and anything else on the host can read every
+    agent's status without a socket.  The rows are a numpy structured
+    array over a multiprocessing SharedMemory block.
+
+    Each field has one writer.  The supervisor writes pid, state,
+    restarts, start_time and agent_id.  The agent process writes
+    loop_time, loop_count and mavlink_lost.
+
+    Args:
+        `name (str)`: shared memory name
+        `rows (int)`: number of agents (only used with create)
+        `create (bool)`: True creates the block (the supervisor), False
+            attaches to an existing one (the agents and readers)
+    '''
+
+    DTYPE = np.dtype([
+        ('pid', '<i8'),
+        ('state', '<i4'),
+        ('restarts', '<i4'),
+        ('start_time', '<f8'),     # epoch time of the last start
+        ('loop_time', '<f8'),      # epoch time of the last main loop pass
+        ('loop_count', '<u8'),
+        ('mavlink_lost', 'u1'),
+        ('agent_id', 'S16'),
+    ])
+
+    STATES = ('STOPPED', 'STARTING', 'RUNNING', 'RESTARTING', 'FAILED')
+
+    def __init__(self, name: str, rows: int = 0, create: bool = False):
+
+        self.name = name
+        self._owner = create
+        if create:
+            try:
+                # A block left behind by a supervisor that was killed
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = shared_memory.SharedMemory(
+                name=name, create=True,
+                size=max(rows, 1) * self.DTYPE.itemsize)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Python < 3.13 tracks attached blocks too and would unlink
+            # the supervisor's block when this process exits
+            try:
+                resource_tracker.unregister(self._shm._name, 'shared_memory')
+            except Exception:
+                pass
+
+        self.rows = np.ndarray((self._shm.size // self.DTYPE.itemsize,),
+                               dtype=self.DTYPE, buffer=self._shm.buf)
+        if create:
+            self.rows[:] = np.zeros(len(self.rows), dtype=self.DTYPE)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def state(self, row: int) -> str:
+        return self.STATES[int(self.rows['state'][row])]
+
+    def set_state(self, row: int, state: str):
+        self.rows['state'][row] = self.STATES.index(state)
+
+    def to_dicts(self) -> list:
+        ''' A copy of every row as a dict '''
+        rows = self.rows.copy()
+        return [{
+            'agent_id': row['agent_id'].decode('utf-8', errors='ignore'),
+            'pid': int(row['pid']),
+            'state': self.STATES[int(row['state'])],
+            'restarts': int(row['restarts']),
+            'start_time': float(row['start_time']),
+            'loop_time': float(row['loop_time']),
+            'loop_count': int(row['loop_count']),
+            'mavlink_lost': bool(row['mavlink_lost']),
+        } for row in rows]
+
+    def close(self):
+        # The numpy view holds the buffer and must go first
+        self.rows = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class AgentSupervisor:
+    '''
+    Runs each agent configuration file in its own Python process so a
+    host running several agents (a SITL swarm on a ground station
+    laptop) uses every core instead of sharing one GIL.
+
+        - Restart: an agent process that exits, or whose main loop has not
+            run for HANG_TIMEOUT seconds, is started again after
+            RESTART_DELAY seconds.  The delay doubles on each restart (up to
+            60 sec) and an agent that restarts more than MAX_RESTARTS times
+            without running STABLE_TIME seconds is marked FAILED.
+        - Logs: the output of every agent is printed with its AGENT_ID in
+            front and, with LOG_FILE, written to one file with timestamps.
+        - Status: every agent's process status is in an AgentProcessTable
+            named TABLE_NAME in shared memory.
+
+    Configured by the SUPERVISOR dictionary of startup.yaml:
+        SUPERVISOR:
+          AGENT_CLASS: 'my_agent:Agent1'
+          TABLE_NAME: 'cuas_agents'
+          RESTART: True
+          RESTART_DELAY: 2.0   # (sec)
+          MAX_RESTARTS: 5
+          STABLE_TIME: 60      # (sec)
+          HANG_TIMEOUT: 10     # (sec)
+          STOP_TIMEOUT: 5      # (sec)
+          LOG_FILE: 'agents.log'
+
+    Example:
+        supervisor = AgentSupervisor(['ag_config_1.yaml',
+                                      'ag_config_2.yaml'], config)
+        supervisor.start()
+        supervisor.wait()
+
+    Args:
+        `config_files (list[str])`: agent configuration files, relative to
+            the agent_core directory
+        `config (dict)`: the SUPERVISOR dictionary
+        `verbose (bool)`: show expanded info
+    '''
+
+    MAX_RESTART_DELAY = 60.0
+
+    def __init__(self, config_files: list, config: dict = None,
+                 verbose=False):
+
+        config = config or {}
+        self.config = config
+        self._verbose = verbose
+        self.agent_core_dir = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..'))
+
+        self.agent_class = config.get('AGENT_CLASS', 'my_agent:Agent1')
+        self.restart = config.get('RESTART', True)
+        self.restart_delay = float(config.get('RESTART_DELAY', 2.0))
+        self.max_restarts = int(config.get('MAX_RESTARTS', 5))
+        self.stable_time = float(config.get('STABLE_TIME', 60))
+        self.hang_timeout = float(config.get('HANG_TIMEOUT', 10))
+        self.stop_timeout = float(config.get('STOP_TIMEOUT', 5))
+        log_file = config.get('LOG_FILE')
+
+        self.agents = []
+        for row, config_file in enumerate(config_files):
+            agent_config = AgentUtils.get_config_dict(
+                os.path.join(self.agent_core_dir, config_file))
+            self.agents.append({
+                'row': row,
+                'config_file': config_file,
+                'agent_id': str(agent_config.get('AGENT_ID', config_file)),
+                'process': None,
+                'restarts': 0,
+                'started': 0.0,
+                'next_start': 0.0,
+            })
+
+        self.table = AgentProcessTable(
+            config.get('TABLE_NAME', 'cuas_agents'), len(self.agents),
+            create=True)
+        for agent in self.agents:
+            self.table.rows['agent_id'][agent['row']] = \
+                agent['agent_id'].encode('utf-8')[:16]
+
+        self._log_lock = Lock()
+        self._log = open(os.path.join(self.agent_core_dir, log_file), 'a') \
+            if log_file else None
+
+        self._stop_event = Event()
+        self._monitor = Thread(target=self._monitor_agents, daemon=True)
+
+    def _vprint(self, print_string):
+        if self._verbose:
+            print(print_string)
+
+    def start(self):
+        for agent in self.agents:
+            self._start_agent(agent)
+        self._monitor.start()
+
+    def wait(self):
+        ''' Blocks until stop() or Ctrl-C, then stops the agents '''
+        try:
+            while not self._stop_event.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stop(self):
+        ''' Stops every agent process and releases the shared memory '''
+        if self.table is None:
+            return
+        self._stop_event.set()
+        if self._monitor.is_alive():
+            self._monitor.join()
+        for agent in self.agents:
+            self._stop_agent(agent)
+            self.table.set_state(agent['row'], 'STOPPED')
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self.table.close()
+        self.table = None
+
+    def status(self) -> list:
+        ''' The AgentProcessTable rows as dicts '''
+        return self.table.to_dicts()
+
+    # ################# Agent processes ##################
+
+    def _start_agent(self, agent):
+        row = agent['row']
+        command = [sys.executable, '-u', '-m', 'classes.agent_supervisor',
+                   '--config', agent['config_file'],
+                   '--agent-class', self.agent_class,
+                   '--table', self.table.name,
+                   '--row', str(row)]
+        self._vprint(' '.join(command))
+
+        rows = self.table.rows
+        rows['loop_time'][row] = 0.0
+        rows['loop_count'][row] = 0
+        rows['mavlink_lost'][row] = 0
+        self.table.set_state(row, 'STARTING')
+
+        process = subprocess.Popen(
+            command, cwd=self.agent_core_dir, stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            bufsize=1)
+        agent['process'] = process
+        agent['started'] = time.time()
+        rows['pid'][row] = process.pid
+        rows['start_time'][row] = agent['started']
+
+        Thread(target=self._read_output, args=(agent, process),
+               daemon=True).start()
+
+    def _stop_agent(self, agent):
+        process = agent['process']
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(self.stop_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _read_output(self, agent, process):
+        prefix = f"[{agent['agent_id']}] "
+        for line in process.stdout:
+            self._write_log(prefix + line)
+        process.stdout.close()
+
+    def _write_log(self, line):
+        with self._log_lock:
+            print(line, end='', flush=True)
+            if self._log is not None:
+                self._log.write(
+                    f"{datetime.now().isoformat(timespec='milliseconds')} "
+                    f"{line}")
+                self._log.flush()
+
+    # ################# Monitor ##################
+
+    def _monitor_agents(self):
+        while not self._stop_event.wait(0.5):
+            now = time.time()
+            for agent in self.agents:
+                self._check_agent(agent, now)
+
+    def _check_agent(self, agent, now):
+        row = agent['row']
+        state = self.table.state(row)
+        process = agent['process']
+
+        if state == 'RESTARTING':
+            if now >= agent['next_start']:
+                self._start_agent(agent)
+            return
+        if state in ('FAILED', 'STOPPED') or process is None:
+            return
+
+        loop_time = float(self.table.rows['loop_time'][row])
+        if process.poll() is not None:
+            reason = f"exited with code {process.returncode}"
+        elif loop_time > 0 and now - loop_time > self.hang_timeout:
+            reason = f"main loop has not run for {now - loop_time:.1f} sec"
+            self._stop_agent(agent)
+        else:
+            if loop_time > 0 and state == 'STARTING':
+                self.table.set_state(row, 'RUNNING')
+            return
+
+        self._write_log(f"[supervisor] {agent['agent_id']} {reason}\n")
+        self._schedule_restart(agent, now)
+
+    def _schedule_restart(self, agent, now):
+        row = agent['row']
+        if not self.restart:
+            self.table.set_state(row, 'STOPPED')
+            return
+
+        if now - agent['started'] >= self.stable_time:
+            agent['restarts'] = 0
+        if agent['restarts'] >= self.max_restarts:
+            self._write_log(
+                f"[supervisor] {agent['agent_id']} restarted "
+                f"{agent['restarts']} times - giving up\n")
+            self.table.set_state(row, 'FAILED')
+            return
+
+        delay = min(self.restart_delay * 2 ** agent['restarts'],
+                    self.MAX_RESTART_DELAY)
+        agent['restarts'] += 1
+        agent['next_start'] = now + delay
+        self.table.rows['restarts'][row] += 1
+        self.table.set_state(row, 'RESTARTING')
+        self._write_log(f"[supervisor] restarting {agent['agent_id']} "
+                        f"in {delay:.1f} sec\n")
+
+
+# ################# Agent process ##################
+
+def run_agent_process(agent_class: str, config_file: str, table_name: str,
+                      row: int):
+    '''
+    Builds the agent in this process.  The agent's main loop stamps its
+    row of the AgentProcessTable on every pass so the supervisor can tell
+    a hung agent from a busy one.
+    '''
+    module_name, class_name = agent_class.split(':')
+    base_class = getattr(importlib.import_module(module_name), class_name)
+    table = AgentProcessTable(table_name)
+    rows = table.rows
+
+    class SupervisedAgent(base_class):
+
+        # Holds the shared memory open for as long as the agent runs
+        process_table = table
+
+        def agent_core_main_loop(self):
+            rows['loop_time'][row] = time.time()
+            rows['loop_count'][row] += 1
+            rows['mavlink_lost'][row] = self.agent_hub.mavlink_lost_comm
+            return super().agent_core_main_loop()
+
+    # AgentCore reads --config from the command line
+    sys.argv = [sys.argv[0], '--config', config_file]
+    return SupervisedAgent(loop_delay=0, verbose=False,
+                           configuration_file=config_file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', type=str, required=True)
+    parser.add_argument('--agent-class', type=str, default='my_agent:Agent1')
+    parser.add_argument('--table', type=str, required=True)
+    parser.add_argument('--row', type=int, required=True)
+    args = parser.parse_args()
+
+    run_agent_process(args.agent_class, args.config, args.table, args.row)
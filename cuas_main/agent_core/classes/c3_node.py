@@ -14,6 +14,7 @@ import platform
 
 from classes.c3_node_message import C3NodeMessage
 from classes.trigger import TriggerManager
+from classes.fleet_status_table import FleetStatusTable
 # from classes.c3_node_utils import C3NodeUtils  # noqa: F401
 
 
@@ -170,6 +171,18 @@ class C3Node():
         self.c3node_var_dict = {}
         self.triggerMgr = TriggerManager(self)
 
+        # Status of the agents on this host from the shared memory
+        # FLEET_TABLE.  Their agent_position, flight_mode and arm_state
+        # come from the table and the same ZeroMQ status is skipped
+        fleet_config = self._config.get('FLEET_TABLE', {}) or {}
+        self._fleet_enabled = fleet_config.get('ENABLED', False)
+        self._fleet_name = fleet_config.get('NAME', 'cuas_fleet')
+        self._fleet_max_age = float(fleet_config.get('MAX_AGE', 2))
+        self.fleet_table = None
+        self._fleet_attach_time = 0.0
+        self._fleet_seen = {}
+        self._fleet_local_agents = set()
+
         # Lock for thread-safe operations on connected_clients
         self.lock = threading.Lock()
 
@@ -223,6 +236,9 @@ class C3Node():
         # Continuous loop to handle incoming messages
         while True:
 
+            # Update the vars of the agents on this host
+            self._read_fleet_table()
+
             # Run the main logic loop
             self._main_loop_thread()
 
@@ -326,25 +342,90 @@ class C3Node():
 
             time.sleep(0.01)  # allows the thread loop to complete
 
-    def _update_group_var(self, c3Message):
+    def _update_group_var(self, c3Message, from_fleet_table=False):
 
         # print(f"msg: {c3Message.message}", flush=True)
 
+        if (not from_fleet_table and
+                c3Message.sender in self._fleet_local_agents and
+                isinstance(c3Message.message, dict)):
+            # The fleet table already has this agent's status
+            message = {key: value for key, value in c3Message.message.items()
+                       if key not in FleetStatusTable.SECTIONS}
+            if not message:
+                return
+            c3Message = C3NodeMessage(
+                node_name=c3Message.node_name,
+                message=message,
+                message_type=c3Message.message_type,
+                sender=c3Message.sender,
+                message_group=c3Message.message_group)
+
+        if not isinstance(c3Message.message, dict):
+            return
+
+        # Only the vars that take each message from this sender are updated
+        sender = c3Message.sender
+        routes = self.triggerMgr.routes
         try:
-            for c3node_var_key in self.triggerMgr.vars.keys():
-                c3node_var: TriggerManager.C3NodeMessageVar =\
-                    self.triggerMgr.vars[c3node_var_key]
-                # print(f"C3NodeMessage: "
-                #       f"{self.triggerMgr.vars[c3node_var_key].msg_dict}")
-                if (isinstance(c3node_var, TriggerManager.C3NodeMessageVar) and
-                        True):
-                    # print(f"C3Message: {c3Message.to_dict()}")
-                    c3node_var.update_c3node_var_by_c3m(
-                        c3node_var_key, c3Message)
-
-        except AttributeError:
+            for message_name, value in c3Message.message.items():
+                for c3node_var in routes(message_name, sender):
+                    c3node_var.update_entry(sender, value)
+
+        except (AttributeError, TypeError):
             pass
 
+    def fleet_status(self) -> dict:
+        '''
+        The status of every agent on this host that updated the
+        FLEET_TABLE in the last MAX_AGE seconds, as agent_id ->
+        {'agent_position': {...}, 'flight_mode': {...}, 'arm_state': {...}}.
+        Empty if there is no fleet table.
+        '''
+        if self.fleet_table is None:
+            return {}
+        return self.fleet_table.to_dicts(self._fleet_max_age)
+
+    def _read_fleet_table(self):
+
+        if not self._fleet_enabled:
+            return
+        if self.fleet_table is None:
+            # The table appears when the first agent on this host starts
+            now = time.monotonic()
+            if now - self._fleet_attach_time < 1.0:
+                return
+            self._fleet_attach_time = now
+            self.fleet_table = FleetStatusTable.attach(self._fleet_name)
+            if self.fleet_table is None:
+                return
+
+        fleet = self.fleet_status()
+        self._fleet_local_agents = set(fleet)
+        for agent_id, status in fleet.items():
+            seen = self._fleet_seen.setdefault(agent_id, {})
+            if seen.get('seq') == status['seq']:
+                continue
+            seen['seq'] = status['seq']
+
+            # Only pass on the sections that changed, the way the agent
+            # sends them
+            message = {}
+            for section in FleetStatusTable.SECTIONS:
+                value = status[section]
+                fields = {key: field for key, field in value.items()
+                          if key != 'timestamp'}
+                if seen.get(section) != fields:
+                    seen[section] = fields
+                    message[section] = value
+            if message:
+                self._update_group_var(
+                    C3NodeMessage(node_name=self.identity,
+                                  message=message,
+                                  message_type='DIRECT',
+                                  sender=agent_id),
+                    from_fleet_table=True)
+
     # ##################################################################################
     def _process_message(self,
                          c3Message: C3NodeMessage,
@@ -526,8 +607,18 @@ class C3Node():
         to manage send messages to individual agents or
         groups based on the DIRECT_GROUPS and BROADCAST_GROUPS
         in the C3Node YAML file
+
+        'triggers' prints the trigger profile (TRIGGER_PROFILE in the
+        YAML) and 'triggers reset' clears it
         '''
 
+        words = terminal_input.split()
+        if words[:1] == ['triggers']:
+            if words[1:2] == ['reset']:
+                self.triggerMgr.reset_profile()
+            print(self.triggerMgr.profile_report(), flush=True)
+            return
+
         self.send_node_config_command(terminal_input)
 
     def send_node_config_command(self, command_message: str):
@@ -902,7 +993,8 @@ class DynamicNodeClass(ABC):
                 'context',
                 'socket',
                 'sub_socket',
-                'poller'
+                'poller',
+                'message_event'
                 # 'timestamp'
             }
         return {
@@ -984,6 +1076,9 @@ class AgentC3Node(DynamicNodeClass):
 
         self._is_new = False
         self.message = None
+        # Optional threading.Event set whenever a message arrives.  The
+        # AgentCore loop uses it to wake up for C3 traffic
+        self.message_event = None
 
     def start(self):
         # Start the run loop in a separate thread
@@ -1107,6 +1202,8 @@ class AgentC3Node(DynamicNodeClass):
                         message_type="DIRECT"
                     )
                     self._is_new = True
+                    if self.message_event is not None:
+                        self.message_event.set()
 
             if "SUBSCRIBE" in self._socket_dict:
                 # Check if there is an incoming published message
@@ -1122,3 +1219,5 @@ class AgentC3Node(DynamicNodeClass):
                         message_type="BROADCAST"
                     )
                     self._is_new = True
+                    if self.message_event is not None:
+                        self.message_event.set()
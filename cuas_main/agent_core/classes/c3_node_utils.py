@@ -72,6 +72,61 @@ class C3NodeUtils():
         except (AttributeError, TypeError):
             pass
 
+    # The pair labels and agent indices of the last fleet seen by
+    # distance_array(), reused while the fleet stays the same
+    _pairs = (None, [],
+              np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+
+    @classmethod
+    def distance_array(cls,
+                       lat_lon_alt_cnv: TriggerManager.C3NodePositionVar):
+        '''
+        The same one-to-one distances as list_of_distances(), computed for
+        every pair at once, as (pair labels, numpy array of distances) for
+        C3NodeDictVar.update_array().  The pairs are in agent order, not
+        sorted by distance, and the labels list is the same object while
+        the fleet does not change.
+        '''
+
+        if hasattr(lat_lon_alt_cnv, 'msg_dict'):
+            main_dict = lat_lon_alt_cnv.msg_dict
+        else:
+            main_dict = lat_lon_alt_cnv
+
+        agents = dict(main_dict['agents'])
+        agent_list = tuple(str(agent) for agent in agents)
+
+        if agent_list != cls._pairs[0]:
+            first, second = np.triu_indices(len(agent_list), 1)
+            labels = [f"{agent_list[i]}__{agent_list[j]}"
+                      for i, j in zip(first.tolist(), second.tolist())]
+            cls._pairs = (agent_list, labels, first, second)
+        _, labels, first, second = cls._pairs
+
+        try:
+            positions = np.array(
+                [(value['lat'], value['lon'],
+                  np.nan if value['alt'] is None else value['alt'])
+                 for value in agents.values()], dtype=float).reshape(-1, 3)
+        except (KeyError, TypeError, ValueError):
+            # An agent's position is not complete yet
+            return [], np.empty(0)
+
+        # Equirectangular approximation, as lat_lon_distance_light()
+        lat = np.radians(positions[:, 0])
+        lon = np.radians(positions[:, 1])
+        x = (lon[second] - lon[first]) * np.cos(0.5 * (lat[second] +
+                                                       lat[first]))
+        y = lat[second] - lat[first]
+        distances = np.sqrt(x * x + y * y) * 6371000
+
+        alt = positions[:, 2]
+        dz = alt[first] - alt[second]
+        distances = np.where(np.isnan(dz), distances,
+                             np.sqrt(distances**2 + dz**2))
+
+        return labels, distances
+
     # @classmethod
     # def calculate_time_to_intersection(cls,
     #                                    agent_pos,
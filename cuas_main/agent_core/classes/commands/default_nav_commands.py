@@ -76,6 +76,12 @@ class DefaultNavCommands(DefaultCommands):
         - `cmd_nav_guided_ned_velocity()`: set North/East/Down velocity
         - `cmd_nav_guided_track_velocity()`: set track velocity
         - `cmd_nav_guided_xyz_velocity()`: set body-xyz velocity
+    ##### Streamed Methods (resent at a fixed rate by the SetpointStream)
+        - `cmd_nav_guided_stream_start()`: start streaming setpoints
+        - `cmd_nav_guided_stream_stop()`: stop streaming setpoints
+        - `cmd_nav_guided_stream_pos_hat()`: stream pos & height above takeoff
+        - `cmd_nav_guided_stream_ned_velocity()`: stream N/E/D velocity
+        - `cmd_nav_guided_stream_yaw()`: stream heading or yaw rate
     '''
 
     def __init__(self,
@@ -711,3 +717,107 @@ class DefaultNavCommands(DefaultCommands):
                 yaw = yaw_angle
 
             self.set_position_target(velxyz=(vx_ned, vy_ned, vz_ned), yaw=yaw)
+
+    # ### Streamed GUIDED setpoints ###
+    def cmd_nav_guided_stream_start(self,
+                                    rate: float = None,
+                                    timeout: float = None
+                                    ) -> bool:
+        '''
+        Starts the fixed-rate setpoint stream.  The latest target written
+        by the cmd_nav_guided_stream_... commands is resent every tick
+        until the flight mode changes or the target goes stale.
+
+        #### Params:
+            `rate (float)`: stream rate (Hz) 10 - 50. Defaults to the
+                SETPOINT_STREAM RATE in the YAML file
+            `timeout (float)`: stop the stream if the target is not
+                refreshed within this time (sec)
+
+        #### Return:
+            `bool`: True if the stream is running
+        '''
+
+        stream = self._agent_hub.setpoint_stream
+        if self.cmd_sys_mode_change('GUIDED', verify=True) and \
+                stream.wait_for_mode('GUIDED'):
+            return stream.start(rate, timeout)
+        return False
+
+    def cmd_nav_guided_stream_stop(self):
+        '''
+        Stops the setpoint stream.  The ArduPilot holds the last setpoint.
+        '''
+
+        self._agent_hub.setpoint_stream.stop()
+
+    def cmd_nav_guided_stream_pos_hat(self,
+                                      lat: float,
+                                      lon: float,
+                                      alt: float = None,
+                                      hdg: float = None,
+                                      yawRate: float = None
+                                      ):
+        '''
+        Writes the streamed target position.  Does not block.
+
+        #### Params:
+            `lat (float)`: The target latitude
+            `lon (float)`: The target longitude
+            `alt (float, optional)`: Height above takeoff (m).
+                Defaults to the current altitude.
+            `hdg (float, optional)`: absolute heading (deg)
+            `yawRate (float, optional)`: yaw rate (deg/sec)
+
+        #### Return:
+            None
+        '''
+
+        if alt is None:
+            alt = self._agent_hub.agent_status_obj\
+                .agent_position.relative_alt
+
+        self._agent_hub.setpoint_stream.update_position(
+            lat, lon, alt, hdg, yawRate)
+
+    def cmd_nav_guided_stream_ned_velocity(self,
+                                           nVel: float,
+                                           eVel: float,
+                                           dVel: float,
+                                           yaw: float = None,
+                                           yawRate: float = None
+                                           ):
+        '''
+        Writes the streamed North/East/Down velocity.  Does not block.
+
+        #### Params:
+            `nVel (float)`: speed North (m/s)
+            `eVel (float)`: speed East (m/s)
+            `dVel (float)`: speed Down (m/s)
+            `yaw (float)`: absolute heading (deg)
+            `yawRate (float)`: yaw rate (deg/sec)
+
+        #### Return:
+            None
+        '''
+
+        self._agent_hub.setpoint_stream.update_velocity(
+            nVel, eVel, dVel, yaw, yawRate)
+
+    def cmd_nav_guided_stream_yaw(self,
+                                  yaw: float = None,
+                                  yawRate: float = None
+                                  ):
+        '''
+        Writes the streamed yaw without changing the streamed position or
+        velocity.  Does not block.
+
+        #### Params:
+            `yaw (float)`: absolute heading (deg)
+            `yawRate (float)`: yaw rate (deg/sec)
+
+        #### Return:
+            None
+        '''
+
+        self._agent_hub.setpoint_stream.update_yaw(yaw, yawRate)
@@ -22,6 +22,7 @@ class DefaultSysCommands(DefaultCommands):
     Methods:
         - `cmd_sys_mode_change()`: change flight mode
         - `cmd_sys_arm_disarm()`: arm or disarm agent
+        - `cmd_sys_rate_profile()`: switch the MAVLink message rate profile
     '''
 
     def __init__(self,
@@ -105,11 +106,15 @@ class DefaultSysCommands(DefaultCommands):
             override_code = 21196
         else:
             override_code = 0
-        self._mav_connection.mav.param_set_send(
-            self._mav_connection.target_system,
-            self._mav_connection.target_component,
-            b'DISARM_DELAY', float(delay),
-            mavutil.mavlink.MAV_PARAM_TYPE_REAL32)
+        # Only sent if DISARM_DELAY is not already delay, and confirmed
+        # by the readback before the arm command goes out.  A disarm is
+        # never held back by the delay
+        if not self._agent_hub.param_cache.set('DISARM_DELAY', delay):
+            if arm_disarm_cmd == 1:
+                print(f"DISARM_DELAY could not be set to {delay} - "
+                      f"canceling arm command")
+                return False
+            print(f"DISARM_DELAY could not be set to {delay}")
 
         return self.send_long_command(
             mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM,
@@ -118,3 +123,14 @@ class DefaultSysCommands(DefaultCommands):
             override_code,
             0, 0, 0, 0, 0, verify
         )
+
+    def cmd_sys_rate_profile(self, profile: str) -> bool:
+        '''
+        Switches the MAVLink message intervals to one of the RATE_PROFILES
+        in the agent's YAML file (idle, transit, intercept, ...).  The
+        previous profile is restored if the ArduPilot does not accept it.
+
+        Args:
+            `profile (str)`: name of the rate profile or 'default'
+        '''
+        return self._agent_hub.mavlink_manager.set_rate_profile(profile)
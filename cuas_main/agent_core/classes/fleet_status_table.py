@@ -0,0 +1,234 @@
+import time
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from agent_status_class import AgentPosition, format_timestamp
+
+
+'''
+Contains the following Classes:
+
+    - FleetStatusTable: The agent_position, flight_mode and arm_state of
+        every agent on this host in one shared memory table
+    - FleetStatusPublisher: Writes this agent's row of the table each time
+        one of those status records changes
+'''
+
+
+def _untrack(shm):
+    # Python < 3.13 would unlink the block when this process exits,
+    # taking the table away from the other agents and readers
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+class FleetStatusTable:
+    '''
+    A fixed layout table in shared memory with one row per agent on this
+    host, so co-located C3 nodes (and a GUI) can read the whole fleet in
+    one pass instead of decoding each agent's JSON status messages.
+
+    The rows are a numpy structured array over a SharedMemory block.
+    Each row has one writer (its agent) and a sequence number used as a
+    seqlock: the writer makes seq odd, writes the row and makes seq even
+    again.  A reader keeps a row only if seq was even and did not change
+    while the row was copied, and reads it again otherwise.
+
+    The first agent to start creates the block and it stays after the
+    agents exit.  Rows whose time is old belong to agents that stopped.
+
+    Args:
+        `name (str)`: shared memory name
+        `capacity (int)`: rows to create if the table does not exist yet
+    '''
+
+    POSITION_FIELDS = AgentPosition._fields
+
+    DTYPE = np.dtype(
+        [('seq', '<u8'), ('agent_id', 'S16'), ('time', '<f8')] +
+        [(name, '<f8') for name in POSITION_FIELDS] +
+        [('flight_mode', 'S24'), ('arm_state', 'S24')])
+
+    # The status messages the table replaces
+    SECTIONS = ('agent_position', 'flight_mode', 'arm_state')
+
+    def __init__(self, name: str = 'cuas_fleet', capacity: int = 32):
+
+        self.name = name
+        try:
+            self._shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            try:
+                self._shm = shared_memory.SharedMemory(
+                    name=name, create=True,
+                    size=capacity * self.DTYPE.itemsize)
+            except FileExistsError:
+                # Another agent created it first
+                self._shm = shared_memory.SharedMemory(name=name)
+        _untrack(self._shm)
+
+        self.rows = np.ndarray((self._shm.size // self.DTYPE.itemsize,),
+                               dtype=self.DTYPE, buffer=self._shm.buf)
+
+    @classmethod
+    def attach(cls, name: str = 'cuas_fleet'):
+        ''' The existing table, or None if no agent has created it '''
+        try:
+            probe = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return None
+        _untrack(probe)
+        probe.close()
+        return cls(name)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def close(self):
+        self.rows = None
+        self._shm.close()
+
+    # ################# Writer ##################
+
+    def write(self, row: int, values: tuple):
+        '''
+        Writes a row.  values are the fields after seq, in DTYPE order.
+        Only the row's own agent may call this
+        '''
+        rows = self.rows
+        seq = int(rows['seq'][row])
+        rows['seq'][row] = seq + 1
+        rows[row] = (seq + 1,) + values
+        rows['seq'][row] = seq + 2
+
+    # ################# Readers ##################
+
+    def read_row(self, row: int, retries: int = 1000):
+        ''' A consistent copy of one row, or None if the writer is stuck '''
+        rows = self.rows
+        for _ in range(retries):
+            seq = rows['seq'][row]
+            copy = rows[row].copy()
+            if seq % 2 == 0 and seq == rows['seq'][row]:
+                return copy
+        return None
+
+    def snapshot(self):
+        '''
+        A consistent copy of every row with an agent in it, in one pass.
+        Rows written during the copy are read again on their own.
+        '''
+        rows = self.rows
+        before = rows['seq'].copy()
+        copy = rows.copy()
+        torn = (before != rows['seq']) | (before % 2 == 1)
+        for row in np.flatnonzero(torn):
+            row_copy = self.read_row(row)
+            if row_copy is not None:
+                copy[row] = row_copy
+            else:
+                copy['agent_id'][row] = b''
+        return copy[copy['agent_id'] != b'']
+
+    def to_dicts(self, max_age: float = None) -> dict:
+        '''
+        The fleet as agent_id -> {'time', 'seq', 'agent_position',
+        'flight_mode', 'arm_state'} with the status dicts in the same form
+        the agents send to the C3 nodes.
+
+        Args:
+            `max_age (float)`: leave out agents not updated for this many
+                seconds
+        '''
+        fleet = {}
+        now = time.time()
+        for row in self.snapshot():
+            if max_age is not None and now - row['time'] > max_age:
+                continue
+            timestamp = format_timestamp(float(row['time']))
+            position = {'timestamp': timestamp}
+            for name in self.POSITION_FIELDS:
+                position[name] = float(row[name])
+            position['message_class'] = 'agent_position'
+            fleet[row['agent_id'].decode('utf-8', errors='ignore')] = {
+                'time': float(row['time']),
+                'seq': int(row['seq']),
+                'agent_position': position,
+                'flight_mode': {
+                    'timestamp': timestamp,
+                    'mode': row['flight_mode'].decode(
+                        'utf-8', errors='ignore'),
+                    'message_class': 'flight_mode'},
+                'arm_state': {
+                    'timestamp': timestamp,
+                    'state': row['arm_state'].decode(
+                        'utf-8', errors='ignore'),
+                    'message_class': 'arm_state'},
+            }
+        return fleet
+
+
+class FleetStatusPublisher:
+    '''
+    Publishes this agent's agent_position, flight_mode and arm_state to
+    the host's FleetStatusTable through AgentStatus subscriptions, so the
+    row changes only when the status does.
+
+    Configured by the optional FLEET_TABLE dictionary in the agent's YAML:
+        FLEET_TABLE:
+          ENABLED: True
+          NAME: 'cuas_fleet'
+          CAPACITY: 32
+          ROW: 0        # defaults to SYS_ID - 1
+
+    Args:
+        `config (dict)`: agent_configuration.yaml
+        `agent_status (AgentStatus)`: the agent's status object
+    '''
+
+    def __init__(self, config: dict, agent_status):
+
+        table_config = config.get('FLEET_TABLE', {}) or {}
+        self.table = FleetStatusTable(table_config.get('NAME', 'cuas_fleet'),
+                                      int(table_config.get('CAPACITY', 32)))
+        self.row = int(table_config.get('ROW', int(config['SYS_ID']) - 1))
+        if not 0 <= self.row < len(self.table):
+            raise ValueError(f"FLEET_TABLE row {self.row} is outside the "
+                             f"{len(self.table)} row table "
+                             f"'{self.table.name}'")
+
+        self._agent_id = str(config['AGENT_ID']).encode('utf-8')[:16]
+        self._position = (0.0,) * len(FleetStatusTable.POSITION_FIELDS)
+        self._flight_mode = b''
+        self._arm_state = b''
+        # The records are updated from more than one thread and the row
+        # must only have one writer at a time
+        self._lock = threading.Lock()
+
+        agent_status.subscribe('agent_position', self._position_update)
+        agent_status.subscribe('flight_mode', self._flight_mode_update)
+        agent_status.subscribe('arm_state', self._arm_state_update)
+
+    def _position_update(self, record, changed_fields):
+        self._position = tuple(
+            float(getattr(record, name) or 0.0)
+            for name in FleetStatusTable.POSITION_FIELDS)
+        self._publish(record._time)
+
+    def _flight_mode_update(self, record, changed_fields):
+        self._flight_mode = str(record.mode).encode('utf-8')[:24]
+        self._publish(record._time)
+
+    def _arm_state_update(self, record, changed_fields):
+        self._arm_state = str(record.state).encode('utf-8')[:24]
+        self._publish(record._time)
+
+    def _publish(self, timestamp):
+        with self._lock:
+            self.table.write(self.row, (self._agent_id, timestamp) +
+                             self._position +
+                             (self._flight_mode, self._arm_state))
@@ -0,0 +1,281 @@
+import os
+import time
+import struct
+import bisect
+from collections import deque
+from datetime import datetime
+from threading import Thread, Event
+
+from pymavlink import mavutil
+os.environ['MAVLINK20'] = '1'
+
+
+'''
+Contains the following Classes:
+
+    - FlightLogWriter: Buffers raw MAVLink packets and writes them from a
+        background thread in batches to a .tlog file (the same format
+        MAVProxy and MissionPlanner write: an 8 byte big-endian timestamp
+        in microseconds followed by the raw packet).  Next to each .tlog
+        it keeps a small .tlog.idx file of (timestamp, byte offset) pairs.
+    - FlightLogReader: Reads a .tlog back, using the .idx file to seek
+        straight to a time range instead of scanning the whole file
+'''
+
+# One index entry: (timestamp in microseconds, byte offset in the .tlog)
+INDEX_ENTRY = struct.Struct('>QQ')
+TLOG_TIMESTAMP = struct.Struct('>Q')
+
+MAVLINK_V1_STX = 0xFE
+MAVLINK_V2_STX = 0xFD
+MAVLINK_IFLAG_SIGNED = 0x01
+
+
+def default_log_directory():
+    script_directory = os.path.dirname(os.path.realpath(__file__))
+    parent_parent_directory = os.path.abspath(
+        os.path.join(script_directory, os.pardir, os.pardir))
+    return os.path.join(parent_parent_directory, 'logs', 'ac_flight_logs')
+
+
+class FlightLogWriter:
+    '''
+    Asynchronous tlog writer used by the MavlinkManager.
+
+    The MavlinkManager thread calls write(msg) which only appends the raw
+    packet to a bounded buffer.  The writer thread flushes the buffer every
+    FLUSH_INTERVAL seconds (or sooner once FLUSH_PACKETS are waiting) with
+    one write() on a file that stays open, and rotates to a new file when
+    it is larger than MAX_MB or older than MAX_MINUTES.
+
+    Configured by the optional FLIGHT_LOG dictionary in the agent's YAML:
+        FLIGHT_LOG:
+          MAX_MB: 64
+          MAX_MINUTES: 30
+          FLUSH_INTERVAL: 1.0
+          FLUSH_PACKETS: 500
+          BUFFER_PACKETS: 20000
+          INDEX_INTERVAL: 1.0
+
+    Events:
+        `enabled (threading.Event)`: set to log, clear to stop logging.
+            Nothing is buffered while it is clear.
+        `rotate (threading.Event)`: set to start a new log file
+    '''
+
+    def __init__(self, config: dict, log_directory: str = None):
+
+        log_config = config.get('FLIGHT_LOG', {})
+        self._agent_id = config.get('AGENT_ID', '')
+        self._log_directory = log_directory or default_log_directory()
+        self._max_bytes = int(float(log_config.get('MAX_MB', 64)) * 1e6)
+        self._max_seconds = float(log_config.get('MAX_MINUTES', 30)) * 60
+        self._flush_interval = float(log_config.get('FLUSH_INTERVAL', 1.0))
+        self._flush_packets = int(log_config.get('FLUSH_PACKETS', 500))
+        self._index_interval_us = int(
+            float(log_config.get('INDEX_INTERVAL', 1.0)) * 1e6)
+
+        # The buffer drops its oldest packets if the writer falls behind,
+        # so memory stays bounded no matter what
+        self._buffer = deque(
+            maxlen=int(log_config.get('BUFFER_PACKETS', 20000)))
+        self.dropped_packets = 0
+
+        self.enabled = Event()
+        self.rotate = Event()
+        self._wake = Event()
+        self._stop = Event()
+
+        self.filename = None
+        self._log_file = None
+        self._index_file = None
+        self._file_size = 0
+        self._file_opened = 0.0
+        self._last_index_us = None
+
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, msg):
+        ''' Queues a received pymavlink message.  Never blocks. '''
+        if not self.enabled.is_set():
+            return
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped_packets += 1
+        buffer.append((int(time.time() * 1e6), msg.get_msgbuf()))
+        if len(buffer) >= self._flush_packets:
+            self._wake.set()
+
+    def stop(self):
+        ''' Flushes what is buffered and closes the log files '''
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            self._flush()
+        self._flush()
+        self._close()
+
+    def _flush(self):
+
+        if not self.enabled.is_set():
+            self._buffer.clear()
+            return
+
+        if self.rotate.is_set():
+            self.rotate.clear()
+            self._close()
+
+        buffer = self._buffer
+        count = len(buffer)
+        if count == 0:
+            return
+
+        if self._log_file is None or self._needs_rotation():
+            self._close()
+            self._open()
+
+        offset = self._file_size
+        chunks = []
+        index_entries = []
+        for _ in range(count):
+            timestamp_us, packet = buffer.popleft()
+            if (self._last_index_us is None or
+                    timestamp_us - self._last_index_us >=
+                    self._index_interval_us):
+                index_entries.append(INDEX_ENTRY.pack(timestamp_us, offset))
+                self._last_index_us = timestamp_us
+            chunks.append(TLOG_TIMESTAMP.pack(timestamp_us))
+            chunks.append(packet)
+            offset += TLOG_TIMESTAMP.size + len(packet)
+
+        try:
+            self._log_file.write(b''.join(chunks))
+            self._log_file.flush()
+            if index_entries:
+                self._index_file.write(b''.join(index_entries))
+                self._index_file.flush()
+        except IOError as e:
+            print(e)
+            return
+        self._file_size = offset
+
+    def _needs_rotation(self):
+        return (self._file_size >= self._max_bytes or
+                time.monotonic() - self._file_opened >= self._max_seconds)
+
+    def _open(self):
+        os.makedirs(self._log_directory, exist_ok=True)
+        name = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if self._agent_id != '':
+            name = f"{self._agent_id}_{name}"
+        self.filename = os.path.join(self._log_directory, f"{name}.tlog")
+        # Rotating more than once a second needs a unique name
+        count = 1
+        while os.path.exists(self.filename):
+            self.filename = os.path.join(self._log_directory,
+                                         f"{name}_{count}.tlog")
+            count += 1
+        self._log_file = open(self.filename, 'ab')
+        self._index_file = open(self.filename + '.idx', 'ab')
+        self._file_size = self._log_file.tell()
+        self._file_opened = time.monotonic()
+        self._last_index_us = None
+
+    def _close(self):
+        if self._log_file is not None:
+            self._log_file.close()
+            self._index_file.close()
+        self._log_file = None
+        self._index_file = None
+
+
+class FlightLogReader:
+    '''
+    Reads a .tlog written by the FlightLogWriter (or any other tlog).
+
+    If the .tlog.idx file exists, read() seeks to the last index entry at
+    or before `start` so only the requested part of the file is parsed.
+
+    Example:
+        reader = FlightLogReader('80001_20250410_101500.tlog')
+        for timestamp, msg in reader.read(start=t0, end=t1,
+                                          types={'GLOBAL_POSITION_INT'}):
+            ...
+
+    Timestamps are UNIX times in seconds.
+    '''
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._index_times = []
+        self._index_offsets = []
+        self._load_index()
+        self._mav = mavutil.mavlink.MAVLink(None)
+        self._mav.robust_parsing = True
+
+    def _load_index(self):
+        index_filename = self.filename + '.idx'
+        if not os.path.exists(index_filename):
+            return
+        with open(index_filename, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for timestamp_us, offset in INDEX_ENTRY.iter_unpack(data[:usable]):
+            self._index_times.append(timestamp_us)
+            self._index_offsets.append(offset)
+
+    def seek_offset(self, start: float = None) -> int:
+        ''' The byte offset to start reading from to reach `start` '''
+        if start is None or not self._index_times:
+            return 0
+        position = bisect.bisect_right(self._index_times, int(start * 1e6))
+        if position == 0:
+            return 0
+        return self._index_offsets[position - 1]
+
+    def read(self, start: float = None, end: float = None, types=None):
+        '''
+        Yields (timestamp, pymavlink message) for the packets between
+        start and end (inclusive).  `types` limits the message types.
+        '''
+        start_us = None if start is None else int(start * 1e6)
+        end_us = None if end is None else int(end * 1e6)
+
+        with open(self.filename, 'rb') as f:
+            f.seek(self.seek_offset(start))
+            while True:
+                header = f.read(TLOG_TIMESTAMP.size + 3)
+                if len(header) < TLOG_TIMESTAMP.size + 3:
+                    return
+                timestamp_us, = TLOG_TIMESTAMP.unpack_from(header)
+                stx = header[8]
+                payload_length = header[9]
+                if stx == MAVLINK_V2_STX:
+                    packet_length = payload_length + 12
+                    if header[10] & MAVLINK_IFLAG_SIGNED:
+                        packet_length += 13
+                elif stx == MAVLINK_V1_STX:
+                    packet_length = payload_length + 8
+                else:
+                    print(f"{self.filename}: corrupt record at "
+                          f"{f.tell() - len(header)}")
+                    return
+                packet = header[8:] + f.read(packet_length - 3)
+
+                if end_us is not None and timestamp_us > end_us:
+                    return
+                if start_us is not None and timestamp_us < start_us:
+                    continue
+                try:
+                    msg = self._mav.decode(bytearray(packet))
+                except mavutil.mavlink.MAVError:
+                    continue
+                if types is not None and msg.get_type() not in types:
+                    continue
+                yield timestamp_us / 1e6, msg
@@ -0,0 +1,145 @@
+import time
+from datetime import datetime
+from threading import Thread, Event
+
+from agent_status_class import ARM_STATE_DICT, TIMESTAMP_FORMAT
+
+
+class HeartbeatWatchdog:
+    '''
+    Watches the ArduPilot HEARTBEAT from this agent's SYS_ID and runs the
+    lost-link state machine:
+
+        WAITING --heartbeat--> CONNECTED --no heartbeat for limit--> LOST
+        LOST --heartbeat--> CONNECTED
+
+    The MavlinkManager runs heartbeat() for each HEARTBEAT only, and that
+    handler just stores time.monotonic().  The other packets cost nothing.
+    The watchdog's own thread checks the time every limit / 4 seconds.
+
+    On LOST:
+        - flight_mode.mode is set to "NO MAVLINK"
+        - arm_state.state is set to "MAVLINK Lost"
+        - AgentHub.mavlink_lost_comm is set to True
+        - an alert is sent to every attached C3 node
+    The next heartbeat wakes the thread, which clears mavlink_lost_comm and
+    sends a recovery alert.  The AgentStatus fills the flight_mode back in
+    from that heartbeat.
+
+    Alerts sent to the C3 nodes (as direct messages):
+        {"mavlink_link": {"agent_id": ..., "state": "LOST" | "CONNECTED",
+                          "seconds_since_heartbeat": ...,
+                          "timestamp": ...}}
+
+    Args:
+        `config (dict)`: agent_configuration.yaml.  Uses
+            MAVLINK_LOST_COMM_LIMIT (sec)
+        `agent_hub (AgentHub)`: parent agent_hub
+        `verbose (bool)`: show expanded info
+    '''
+
+    WAITING = 'WAITING'
+    CONNECTED = 'CONNECTED'
+    LOST = 'LOST'
+
+    def __init__(self, config: dict, agent_hub, verbose=False):
+
+        self.config = config
+        self._agent_hub = agent_hub
+        self._verbose = verbose
+
+        self.limit = float(config.get('MAVLINK_LOST_COMM_LIMIT', 1.5))
+        self.state = self.WAITING
+        self.last_heartbeat = None
+        self.lost_count = 0
+
+        self._wake = Event()
+        self._stop_event = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def _vprint(self, print_string):
+        if self._verbose:
+            print(print_string)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(self.limit)
+
+    def heartbeat(self, msg=None):
+        ''' HEARTBEAT handler run in the MavlinkManager's message thread '''
+        self.last_heartbeat = time.monotonic()
+        if self.state != self.CONNECTED:
+            self._wake.set()
+
+    @property
+    def seconds_since_heartbeat(self):
+        if self.last_heartbeat is None:
+            return None
+        return time.monotonic() - self.last_heartbeat
+
+    def _run(self):
+
+        check_period = self.limit / 4
+
+        while not self._stop_event.is_set():
+            self._wake.wait(check_period)
+            self._wake.clear()
+
+            last_heartbeat = self.last_heartbeat
+            if last_heartbeat is None:
+                continue
+
+            since = time.monotonic() - last_heartbeat
+            if since > self.limit:
+                if self.state != self.LOST:
+                    self._link_lost(since)
+            elif self.state != self.CONNECTED:
+                self._link_restored(since)
+
+    def _link_lost(self, since):
+        self.state = self.LOST
+        self.lost_count += 1
+        self._agent_hub.mavlink_lost_comm = True
+
+        agent_status = self._agent_hub.agent_status_obj
+        agent_status.flight_mode.update_attributes({'mode': 'NO MAVLINK'})
+        agent_status.arm_state.update_attributes({'state': ARM_STATE_DICT[1]})
+
+        print(f"{self.config['AGENT_ID']}: lost MAVLink - no heartbeat "
+              f"for {since:.1f} sec")
+        self._send_alert(since)
+
+    def _link_restored(self, since):
+        was_lost = self.state == self.LOST
+        self.state = self.CONNECTED
+        self._agent_hub.mavlink_lost_comm = False
+        if was_lost:
+            print(f"{self.config['AGENT_ID']}: MAVLink heartbeat restored")
+            self._send_alert(since)
+        else:
+            self._vprint(f"{self.config['AGENT_ID']}: heartbeat watchdog "
+                         f"connected")
+
+    def _send_alert(self, since):
+        # The C3 node manager is created after the MavlinkManager
+        c3_node_manager = getattr(self._agent_hub, 'c3_node_manager', None)
+        if c3_node_manager is None:
+            return
+
+        alert = {'mavlink_link': {
+            'agent_id': self.config['AGENT_ID'],
+            'state': self.state,
+            'seconds_since_heartbeat': round(since, 3),
+            'timestamp': datetime.now().strftime(TIMESTAMP_FORMAT)}}
+
+        for c3node in c3_node_manager.c3Nodes:
+            try:
+                c3node.send_direct_message(alert)
+            except Exception as e:
+                print(f"Heartbeat watchdog could not alert "
+                      f"{c3node.node_name}: {e}")
@@ -1,9 +1,11 @@
 import os
 import time
 from threading import Thread, Event, Lock
-from datetime import datetime, timedelta
 
 from agent_status_class import AgentStatus
+from classes.agentutils import StartupTimer
+from classes.flight_log import FlightLogWriter
+from classes.heartbeat_watchdog import HeartbeatWatchdog
 
 from pymavlink import mavutil
 os.environ['MAVLINK20'] = '1'
@@ -15,7 +17,19 @@ class MavlinkManager:
         (SITL or ArduPilot Hardware)
     '''
 
-    def __init__(self, config, agent_hub, verbose=False):
+    # (sec) how long recv_match() blocks before checking for a stop
+    RECV_TIMEOUT = 0.5
+
+    # Message types kept in current_mavlink_message_dict for the
+    # command verification code to read
+    LATEST_MESSAGE_TYPES = ('COMMAND_ACK',)
+
+    # (sec) how often the heartbeat is re-sent while waiting for the first
+    # ArduPilot heartbeat, so a late MAVProxy still hears from us
+    HEARTBEAT_RESEND = 0.5
+
+    def __init__(self, config, agent_hub, verbose=False,
+                 mav_connection=None):
 
         # class settings and parametes
         self.config = config
@@ -24,7 +38,10 @@ class MavlinkManager:
         self._verbose = verbose
 
         # # aurdupilot connectivity status parameters
-        self.mav_connection = None
+        # mav_connection is passed in when the in-process MavlinkRouter
+        # is used, otherwise it connects to MAVProxy in
+        # _initialize_the_port
+        self.mav_connection = mav_connection
         self.port_connected = False
         self.running_in_sim = False
         self.mavlink_ready = False
@@ -32,13 +49,58 @@ class MavlinkManager:
         # self.wait_for_ack = False
         self.current_mavlink_message_dict = dict()
 
+        # Startup readiness.  The timeouts come from the optional STARTUP
+        # dictionary in the agent's YAML
+        startup_config = self.config.get('STARTUP', {})
+        self._heartbeat_timeout = float(
+            startup_config.get('HEARTBEAT_TIMEOUT', 30))
+        self._interval_ack_timeout = float(
+            startup_config.get('INTERVAL_ACK_TIMEOUT', 1.0))
+        self._interval_retries = int(startup_config.get('INTERVAL_RETRIES', 3))
+        self.startup_timer = getattr(self.agent_hub, 'startup_timer', None)
+        if self.startup_timer is None:
+            self.startup_timer = StartupTimer(self.config['AGENT_ID'])
+        # Set when every MAV_CMD_SET_MESSAGE_INTERVAL has been acknowledged
+        self.intervals_acknowledged = Event()
+        # Set when the first message of every MESSAGE_INTERVALS type has
+        # built its AgentStatus object
+        self.status_ready = Event()
+        self._interval_acks = 0
+        self._interval_rejects = 0
+        self._interval_acks_needed = 0
+        self._interval_ack_event = Event()
+        # One interval negotiation at a time since they share the ACK count
+        self._interval_lock = Lock()
+        self.status_types_waiting = set(self.config['MESSAGE_INTERVALS'])
+
         self.log_timer_dict = {}
+        self._log_period_dict = {}
         self.combined_msg_intervals = {**self.config['MESSAGE_INTERVALS'],
                                        **self.config['USER_MESSAGE_INTERVALS']}
-        self.log_lock = Lock()
-        self.rotate_log = Event()
+
+        # The message types that build/update the AgentStatus object
+        self.status_message_names = frozenset(self.combined_msg_intervals)
+
+        # Named sets of message intervals (RATE_PROFILES in the YAML) that
+        # set_rate_profile() switches between.  current_intervals is what
+        # the ArduPilot was last told (usec)
+        self.rate_profiles = self.config.get('RATE_PROFILES', {})
+        self.rate_profile = 'default'
+        self.current_intervals = {
+            name: value['INTERVAL']
+            for name, value in self.combined_msg_intervals.items()}
+
+        # Set by stop() to end the message thread.  recv_match() wakes up
+        # every RECV_TIMEOUT seconds to check it
+        self._stop_event = Event()
+
+        # Watches the HEARTBEAT for the lost-link state
+        # (AgentHub.mavlink_manager.heartbeat_watchdog.state)
+        self.heartbeat_watchdog = HeartbeatWatchdog(
+            self.config, self.agent_hub, verbose=self._verbose)
 
         self.initialize_logging()
+        self._build_message_handlers()
         self._initialize_the_port()
 
         # ### Sets up the listener for the Ardupilot Heartbeat
@@ -52,72 +114,141 @@ class MavlinkManager:
             print(print_string)
 
     def run(self):
-        ''' Starts the thread that listens for messages from MavProxy '''
+        '''
+        Starts the thread that listens for messages from MavProxy and
+        requests the message intervals.  The intervals are acknowledged
+        in the message thread while the rest of the agent starts
+        '''
         self._mm_mavlink_message_thread.start()
+        self.heartbeat_watchdog.start()
+        if self.mavlink_ready:
+            self._request_message_intervals()
 
     def stop(self):
         ''' Stops the thread that listens for messages from MavProxy'''
-        self._mm_mavlink_message_thread.join()
+        self._stop_event.set()
+        self.heartbeat_watchdog.stop()
+        if self._mm_mavlink_message_thread.is_alive():
+            self._mm_mavlink_message_thread.join(self.RECV_TIMEOUT * 2)
+        self.flight_log.stop()
+
+    # ##################### Message Dispatch ######################
+    '''
+        Every message type the MavlinkManager cares about has a tuple of
+        handlers in _message_handlers.  Messages from other sysids and
+        message types without handlers are dropped without further work.
+
+        To run your own function on every message of a type, call:
+        AgentHub.mavlink_manager.add_message_handler('PARAM_VALUE', func)
+    '''
+
+    def _build_message_handlers(self):
+        self._message_handlers = {}
+
+        # AgentStatus messages build their status class on the first
+        # message and then update it in place
+        for msg_type in self.status_message_names:
+            self.add_message_handler(msg_type, self._build_status_message)
+
+        for msg_type in self.LATEST_MESSAGE_TYPES:
+            self.add_message_handler(msg_type, self._store_latest_message)
+
+        for msg_type in self.log_timer_dict:
+            self.add_message_handler(msg_type, self._log_message)
+
+        # After the AgentStatus handler so the flight_mode is already
+        # updated when the watchdog sees the link come back
+        self.add_message_handler('HEARTBEAT',
+                                 self.heartbeat_watchdog.heartbeat)
+
+    def add_message_handler(self, msg_type: str, handler):
+        '''
+        Runs handler(msg) in the message thread for every msg_type message
+        from this agent's SYS_ID.  Handlers must not block.
+        '''
+        handlers = self._message_handlers.get(msg_type, ())
+        self._message_handlers[msg_type] = handlers + (handler,)
+
+    def remove_message_handler(self, msg_type: str, handler):
+        handlers = tuple(h for h in self._message_handlers.get(msg_type, ())
+                         if h != handler)
+        if handlers:
+            self._message_handlers[msg_type] = handlers
+        else:
+            self._message_handlers.pop(msg_type, None)
+
+    def _replace_message_handler(self, msg_type: str, old, new):
+        self._message_handlers[msg_type] = tuple(
+            new if h == old else h
+            for h in self._message_handlers[msg_type])
+
+    def _build_status_message(self, msg):
+        # if the agent_status_obj does not already have a class for
+        # this message then build one, after that only update it
+        msg_type = msg.get_type()
+        if not hasattr(self.agent_status_obj, msg_type):
+            self.agent_status_obj.build_message_class(
+                msg_type, msg.to_dict())
+        else:
+            self.agent_status_obj.update_message_object(msg)
+        self._replace_message_handler(
+            msg_type, self._build_status_message,
+            self.agent_status_obj.update_message_object)
+
+        self.status_types_waiting.discard(msg_type)
+        if not self.status_types_waiting and not self.status_ready.is_set():
+            self.startup_timer.mark('status populated')
+            self.status_ready.set()
+
+    def _store_latest_message(self, msg):
+        self.current_mavlink_message_dict[msg.get_type()] = msg
 
     def _initialize_the_port(self):
         ''' Gets the port the Cube is connected to '''
 
         def _wait_for_heartbeat():
 
-            try:
-                self.vprint("waiting for initial adupilot heartbeat")
+            # Keep sending our heartbeat until the ArduPilot's comes back.
+            # A MAVProxy udpin output only sends to us after it has heard
+            # from us, so a single heartbeat sent before it was bound
+            # would leave this waiting forever
+            self.vprint("waiting for initial adupilot heartbeat")
+            deadline = time.monotonic() + self._heartbeat_timeout
+            sys_id = self.config['SYS_ID']
+            while time.monotonic() < deadline:
                 try:
                     self.mav_connection.mav.heartbeat_send(1, 1, 1, 1, 1, 1)
-                    self.mav_connection.wait_heartbeat()
+                    msg = self.mav_connection.recv_match(
+                        type='HEARTBEAT', blocking=True,
+                        timeout=self.HEARTBEAT_RESEND)
                 except OSError as e:
                     print(f"Mavlink Manager Error: {e}")
+                    time.sleep(self.HEARTBEAT_RESEND)
+                    continue
+                if msg is None or msg.get_srcSystem() != sys_id:
+                    continue
+
                 self.vprint("received intitial ardupilit heartbeat")
+                self.startup_timer.mark('first heartbeat')
                 self.mavlink_ready = True
+                self.heartbeat_watchdog.heartbeat()
                 self.vprint("Heartbeat from ardupilot: " +
                             str(self.mav_connection.target_system) +
                             " / " + str(self.mav_connection.target_component))
                 return True
-            except TypeError:
-                self.vprint("Failed to get heartbeat from ardupilot")
-                return False
 
-        def _set_message_intervals():
-
-            req_msg_interval_dict = self.config['MESSAGE_INTERVALS']
-            req_user_msg_interval_dict = self.config['USER_MESSAGE_INTERVALS']
-            req_msg_interval_dict.update(
-                req_user_msg_interval_dict)
-
-            for requested_message in req_msg_interval_dict.keys():
-
-                self.vprint(str(requested_message) +
-                            " / " +
-                            str(req_msg_interval_dict[requested_message]))
-
-                self.mav_connection.mav.command_long_send(
-                    self.mav_connection.target_system,
-                    self.mav_connection.target_component,
-                    mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
-                    0,
-                    int(req_msg_interval_dict[requested_message]['ID']),
-                    req_msg_interval_dict[requested_message]['INTERVAL'],
-                    0,
-                    0,
-                    0,
-                    0,
-                    0
-                )
-                ackmsg = self.mav_connection.recv_match(type='COMMAND_ACK',
-                                                        blocking=True)
-                self.vprint(ackmsg)
+            print(f"{self.config['AGENT_ID']}: no heartbeat from ardupilot "
+                  f"after {self._heartbeat_timeout} sec")
+            return False
 
         # No serial port connections are found so got simulation mode
-        self.vprint(f"looking for an ardupilot connection on: "
-                    # f"udpout:127.0.0.1:{14550 + self.config['SYS_ID']}")
-                    f"udpout:127.0.0.1:{14551}")
-        self.mav_connection = mavutil.mavlink_connection(
-            # f"udpout:127.0.0.1:{14550 + self.config['SYS_ID']}")
-            f"udpout:127.0.0.1:{14551}")
+        if self.mav_connection is None:
+            self.vprint(f"looking for an ardupilot connection on: "
+                        # f"udpout:127.0.0.1:{14550 + self.config['SYS_ID']}")
+                        f"udpout:127.0.0.1:{14551}")
+            self.mav_connection = mavutil.mavlink_connection(
+                # f"udpout:127.0.0.1:{14550 + self.config['SYS_ID']}")
+                f"udpout:127.0.0.1:{14551}")
         self.vprint("Connected")
         self.mav_connection.mav.srcSystem = int(self.config['SYS_ID'])
         if self.mav_connection is not None:
@@ -131,92 +262,204 @@ class MavlinkManager:
         self.mav_connection.target_system = self.config['SYS_ID']
 
         # If wait_for_heartbeat works, you are ready to start
-        # talking across the mav_connection
+        # talking across the mav_connection.  The message intervals are
+        # requested in run()
         if _wait_for_heartbeat() is True:
             self.vprint("I heard the first heartbeat from the ardupilot")
             self.mavlink_ready = True
-            _set_message_intervals()
         # else the port you've connected to is no longer valid (no heartbeat)
         # so try and reconnect to the port again
         else:
             self.port_connected = False
             self.mavlink_ready = False
 
+    # ##################### Message Intervals ######################
+    '''
+        All the MAV_CMD_SET_MESSAGE_INTERVAL commands of a set are sent at
+        once and their COMMAND_ACKs are counted in the message thread.  If
+        they are not all acknowledged within INTERVAL_ACK_TIMEOUT the whole
+        set is sent again (setting an interval twice does no harm), up to
+        INTERVAL_RETRIES times.
+
+        At startup the MESSAGE_INTERVALS and USER_MESSAGE_INTERVALS are
+        sent and intervals_acknowledged is set when done.  After that,
+        change the rates by mission phase with a rate profile:
+        AgentHub.mavlink_manager.set_rate_profile('intercept')
+    '''
+
+    def _request_message_intervals(self):
+        Thread(target=self._negotiate_startup_intervals, daemon=True).start()
+
+    def _negotiate_startup_intervals(self):
+        acknowledged, _ = self._negotiate_message_intervals(
+            dict(self.current_intervals))
+        if acknowledged:
+            self.startup_timer.mark('intervals acknowledged')
+            self.intervals_acknowledged.set()
+
+    def set_rate_profile(self, profile: str, wait: bool = True):
+        '''
+        Re-negotiates the message intervals to the named profile in
+        RATE_PROFILES.  Messages the profile does not list go back to their
+        MESSAGE_INTERVALS/USER_MESSAGE_INTERVALS rate and 'default' is all
+        of them.  Only the intervals that change are sent.  If any of them
+        is not acknowledged and accepted, the previous intervals are sent
+        again and the previous profile stays active.
+
+        Args:
+            `profile (str)`: name of the profile ('idle', 'intercept', ...)
+            `wait (bool)`: False runs the negotiation in its own thread
+                and returns None
+
+        Return:
+            `bool`: True if the ArduPilot accepted the profile
+        '''
+        if not wait:
+            Thread(target=self.set_rate_profile, args=(profile,),
+                   daemon=True).start()
+            return None
+
+        if profile != 'default' and profile not in self.rate_profiles:
+            print(f"{self.config['AGENT_ID']}: there is no rate profile "
+                  f"'{profile}'")
+            return False
+
+        target_intervals = {
+            name: value['INTERVAL']
+            for name, value in self.combined_msg_intervals.items()}
+        for name, interval in self.rate_profiles.get(profile, {}).items():
+            if name not in target_intervals:
+                print(f"{self.config['AGENT_ID']}: rate profile '{profile}' "
+                      f"has {name} which is not in the MESSAGE_INTERVALS "
+                      f"or USER_MESSAGE_INTERVALS")
+                return False
+            target_intervals[name] = interval
+
+        changed = {name: interval
+                   for name, interval in target_intervals.items()
+                   if self.current_intervals[name] != interval}
+        if not changed:
+            self.rate_profile = profile
+            return True
+
+        acknowledged, rejected = self._negotiate_message_intervals(changed)
+        if acknowledged and not rejected:
+            self.current_intervals.update(changed)
+            self._update_log_periods(changed)
+            self.vprint(f"Rate profile {self.rate_profile} -> {profile}")
+            self.rate_profile = profile
+            return True
+
+        print(f"{self.config['AGENT_ID']}: rate profile '{profile}' failed "
+              f"- restoring '{self.rate_profile}'")
+        self._negotiate_message_intervals(
+            {name: self.current_intervals[name] for name in changed})
+        return False
+
+    def _negotiate_message_intervals(self, intervals: dict):
+        '''
+        Sends every interval (message name -> usec) and waits for the ACKs
+
+        Return:
+            `(bool, int)`: whether every request was acknowledged and how
+                many of them were not accepted
+        '''
+        with self._interval_lock:
+            self._interval_acks_needed = len(intervals)
+            self.add_message_handler('COMMAND_ACK',
+                                     self._message_interval_ack)
+            try:
+                for attempt in range(self._interval_retries + 1):
+                    if attempt > 0:
+                        self.vprint("Resending the message intervals")
+                    self._interval_ack_event.clear()
+                    self._send_message_intervals(intervals)
+                    if self._interval_ack_event.wait(
+                            self._interval_ack_timeout):
+                        break
+                else:
+                    print(f"{self.config['AGENT_ID']}: only "
+                          f"{self._interval_acks} of {len(intervals)} "
+                          f"message intervals were acknowledged")
+                    return False, self._interval_rejects
+            finally:
+                self.remove_message_handler('COMMAND_ACK',
+                                            self._message_interval_ack)
+
+            if self._interval_rejects:
+                print(f"{self.config['AGENT_ID']}: "
+                      f"{self._interval_rejects} message interval "
+                      f"requests were not accepted")
+            return True, self._interval_rejects
+
+    def _send_message_intervals(self, intervals: dict):
+        self._interval_acks = 0
+        self._interval_rejects = 0
+        for requested_message, interval in intervals.items():
+
+            self.vprint(f"{requested_message} / {interval}")
+
+            self.mav_connection.mav.command_long_send(
+                self.mav_connection.target_system,
+                self.mav_connection.target_component,
+                mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
+                0,
+                int(self.combined_msg_intervals[requested_message]['ID']),
+                interval,
+                0,
+                0,
+                0,
+                0,
+                0
+            )
+
+    def _message_interval_ack(self, msg):
+        if msg.command != mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL:
+            return
+        self.vprint(msg)
+        self._interval_acks += 1
+        if msg.result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            self._interval_rejects += 1
+        if self._interval_acks >= self._interval_acks_needed:
+            self._interval_ack_event.set()
+
     def mm_message_queue(self):
 
-        while True:
-
-            # If the mav_connection is not established yet,
-            # then don't run the function
-            if self.mav_connection.fd is None:
-                return
-
-            # Get all the desired messages in the MESSAGE_INTERVALS
-            # yaml dictionary
-            message_names = list(self.config['MESSAGE_INTERVALS'].keys())
-            user_message_names = list(
-                self.config['USER_MESSAGE_INTERVALS'].keys())
-
-            msg_from_ardupilot = None
-            msg_type = None
-
-            # LISTEN for the desired messages from the ardupilot
-            msg_from_ardupilot = self.mav_connection.recv_match(blocking=True)
-            # print(f"{self.mav_connection.target_system}")
-            # if (msg_from_ardupilot.get_srcSystem() ==
-            #         self.mav_connection.target_system):
-
-            if (msg_from_ardupilot.get_srcSystem() ==
-                    self.config['SYS_ID']):
-
-
-                msg_type = msg_from_ardupilot.get_type()
-                self.current_mavlink_message_dict[msg_type] = \
-                    msg_from_ardupilot
-
-                # Lost MAVLink Logic
-                # self.check_for_lost_mavlink_connection()
-
-                # If the message is in the list of default or custom
-                # messages as defined by the YAML file
-                if (msg_type in message_names or
-                        msg_type in user_message_names):
-                    # if the agent_status_obj does not already have a class for
-                    # this message then build one
-                    if not hasattr(self.agent_status_obj, msg_type):
-                        self.agent_status_obj.build_message_class(
-                            msg_type, msg_from_ardupilot.to_dict())
-                    # else a class exists for this message.
-                    # Update that class with new message
-                    else:
-                        # if msg_type == 'HEARTBEAT':
-                        #     print(f"{msg_from_ardupilot.get_srcSystem()}: "
-                        #           f"{msg_from_ardupilot}")
-                        self.agent_status_obj.update_message_object(
-                            msg_from_ardupilot)
-
-                # elif msg_type == "COMMAND_ACK":
-                #     print(f"{self.mav_connection.target_system}: "
-                #           f"{msg_from_ardupilot}")
-
-                # log the timestamped data to the text file
-                if msg_type in self.log_timer_dict:
-                    if self.log_timer_dict[msg_type] < datetime.now():
-                        self.log_string(str(msg_from_ardupilot.to_dict()))
-                        self.log_timer_dict[msg_type] = \
-                            (datetime.now() +
-                                timedelta(
-                                microseconds=int(
-                                    self.combined_msg_intervals[msg_type]
-                                    ['LOG_INTERVAL'])))
-
-    def check_for_lost_mavlink_connection(self):
-        heartbeat_time = datetime.strptime(self.agent_status_obj.timestamp,
-                                           "%m/%d/%Y, %H:%M:%S.%f")
-        delta_time = (datetime.now() - heartbeat_time).seconds
-        if delta_time > self.config['MAVLINK_LOST_COMM_LIMIT']:
-            self.agent_status_obj.flight_mode = "NO MAVLINK"
-            print("AgentCore has lost come with MAVLink")
+        # If the mav_connection is not established yet,
+        # then don't run the function
+        if self.mav_connection.fd is None:
+            return
+
+        sys_id = self.config['SYS_ID']
+        message_handlers = self._message_handlers
+        recv_match = self.mav_connection.recv_match
+        stop_event = self._stop_event
+
+        while not stop_event.is_set():
+
+            # LISTEN for messages from the ardupilot
+            msg_from_ardupilot = recv_match(blocking=True,
+                                            timeout=self.RECV_TIMEOUT)
+            if msg_from_ardupilot is None:
+                continue
+
+            # Drop traffic from the other vehicles on the link
+            if msg_from_ardupilot.get_srcSystem() != sys_id:
+                continue
+
+            handlers = message_handlers.get(msg_from_ardupilot.get_type())
+            if handlers is None:
+                continue
+
+            # A handler that raises must not end the thread that reads
+            # every message from the ArduPilot
+            for handler in handlers:
+                try:
+                    handler(msg_from_ardupilot)
+                except Exception as e:
+                    print(f"{self.config['AGENT_ID']}: "
+                          f"{getattr(handler, '__qualname__', handler)} "
+                          f"failed on {msg_from_ardupilot.get_type()}: {e}")
 
     # ##################### Manage Logging ######################
     '''
@@ -227,77 +470,44 @@ class MavlinkManager:
 
         To start a new log file, call:
         AgentHub.MavlinkManager.rotate_log.set()
+
+        The logs are .tlog files of the raw MAVLink packets in
+        logs/ac_flight_logs.  Read them back with FlightLogReader or open
+        them in MissionPlanner/MAVExplorer.
     '''
 
     def initialize_logging(self):
 
-        def write_to_file(string_list,
-                          start_logging, log_lock,
-                          rotate_log_event, log_interval):
-
-            def rotate_log_file():
-                script_directory = os.path.dirname(os.path.realpath(__file__))
-                parent_parent_directory = \
-                    os.path.abspath(os.path.join(
-                        script_directory, os.pardir, os.pardir))
-                logs_directory = \
-                    os.path.join(
-                        parent_parent_directory, 'logs', 'ac_flight_logs')
-                os.makedirs(logs_directory, exist_ok=True)
-
-                log_filename = os.path.join(
-                    logs_directory, str(
-                            datetime.now().strftime('%Y%m%d_%H%M%S') + '.txt'))
-                return log_filename
-
-            while True:
-                if start_logging.is_set():
-                    with log_lock:
-
-                        if rotate_log_event.is_set():
-                            rotate_log_event.clear()
-                            filename = rotate_log_file()
-
-                        if string_list[0] != "":
-                            try:
-                                with open(filename, 'a') as f:
-                                    f.write(string_list[0])
-                                string_list[0] = ""
-                            except IOError as e:
-                                print(e)
-                                pass
-                else:
-                    string_list[0] = ''
-
-                time.sleep(log_interval)
-
+        # log_timer_dict holds the time.monotonic() time each message
+        # type is next logged.  The intervals are in microseconds
         for key, value in self.combined_msg_intervals.items():
             if value['LOG_INTERVAL'] != -1:
                 if value['LOG_INTERVAL'] == 0:
                     msg_log_interval = int(value['INTERVAL'])
                 else:
                     msg_log_interval = int(value['LOG_INTERVAL'])
+                self._log_period_dict[key] = msg_log_interval / 1e6
                 self.log_timer_dict[key] = \
-                    (datetime.now() + timedelta(microseconds=msg_log_interval))
-
-        self.log_str = [""]
-        self.start_logging = Event()
-        self.start_logging.clear()
-        message_log_thread = Thread(
-            target=write_to_file,
-            args=(
-                self.log_str,
-                self.start_logging, self.log_lock,
-                self.rotate_log, 1),
-            daemon=True
-            )
-        message_log_thread.start()
-
-    def log_string(self, string):
-        if self.start_logging.is_set():
-            with self.log_lock:
-                self.log_str[0] = str(
-                    self.log_str[0] +
-                    str(self.agent_status_obj.timestamp) +
-                    " --- " +
-                    str(string + "\n"))
+                    time.monotonic() + self._log_period_dict[key]
+
+        self.flight_log = FlightLogWriter(self.config)
+        self.start_logging = self.flight_log.enabled
+        self.rotate_log = self.flight_log.rotate
+
+    def _update_log_periods(self, intervals: dict):
+        # Messages with a LOG_INTERVAL of 0 are logged at their stream
+        # rate, so follow the new interval
+        for name, interval in intervals.items():
+            if self.combined_msg_intervals[name]['LOG_INTERVAL'] == 0:
+                self._log_period_dict[name] = int(interval) / 1e6
+
+    def _log_message(self, msg):
+        # queue the raw packet for the flight log
+        if not self.start_logging.is_set():
+            return
+        msg_type = msg.get_type()
+        now = time.monotonic()
+        if self.log_timer_dict[msg_type] < now:
+            self.flight_log.write(msg)
+            self.log_timer_dict[msg_type] = \
+                now + self._log_period_dict[msg_type]
@@ -0,0 +1,266 @@
+import os
+import time
+import queue
+import select
+from threading import Thread, Event, Lock
+
+import serial.tools.list_ports
+from pymavlink import mavutil
+os.environ['MAVLINK20'] = '1'
+
+
+'''
+Contains the following Classes:
+
+    - MavlinkRouter: Opens the ArduPilot (hardware port or SITL) directly
+        and routes its MAVLink traffic inside the agent's process.  It
+        takes the place of the MAVProxy instance AgentHub starts in a
+        screen session.
+    - RouterConnection: The connection the MavlinkManager reads from when
+        the router is used.  It looks like a mavutil connection but the
+        received messages come from an in-memory queue.
+'''
+
+# Descriptions of the USB ports a hardware flight controller shows up as
+FLIGHT_CONTROLLER_DESCRIPTIONS = (
+    "CubeBlack",
+    "Cube",
+    "CUBE",
+    "USB Serial Device",
+    "ArduPilot"
+)
+
+
+def find_flight_controller_port(verbose=False):
+    ''' Returns the serial port of a connected flight controller or None '''
+    ports = list(serial.tools.list_ports.comports())
+    if verbose:
+        print(ports)
+    for p in ports:
+        if verbose:
+            print(p)
+        if any(flt_ctlr in p.description
+               for flt_ctlr in FLIGHT_CONTROLLER_DESCRIPTIONS):
+            return p
+    return None
+
+
+class MavlinkRouter:
+    '''
+    An in-process replacement for the MAVProxy/screen hop.
+
+    The router opens the master connection (a USB connected flight
+    controller or else SITL_ADDRESS) and runs two threads:
+        - master thread: every packet from the master is written to each
+            UDP output and queued for the MavlinkManager
+        - output thread: every packet a ground station sends to one of the
+            UDP outputs is written to the master
+
+    The outputs are udpin:0.0.0.0:<port> for each port in MAVPROXY_OUTPUTS,
+    the same outputs MAVProxy opened, so ground stations connect the same
+    way.
+
+    Enabled by the MAVLINK_ROUTER dictionary in the agent's YAML file:
+        MAVLINK_ROUTER:
+          ENABLED: True
+          QUEUE_SIZE: 1000      # packets waiting for the MavlinkManager
+          SERIAL_BAUD: 115200
+
+    Args:
+        `config (dict)`: agent_configuration.yaml
+        `master (str)`: mavutil connection string to use instead of the
+            port search and SITL_ADDRESS
+        `verbose (bool)`: show expanded info
+    '''
+
+    # (sec) how long the threads block before checking for a stop
+    RECV_TIMEOUT = 0.5
+
+    def __init__(self, config: dict, master: str = None, verbose=False):
+
+        self.config = config
+        self._verbose = verbose
+
+        router_config = self.config.get('MAVLINK_ROUTER', {})
+        self._baud = int(router_config.get('SERIAL_BAUD', 115200))
+        self._queue = queue.Queue(
+            maxsize=int(router_config.get('QUEUE_SIZE', 1000)))
+        self.dropped_packets = 0
+
+        self.master_address = master
+        self.master = None
+        self.outputs = []
+
+        # The master is written to by the output thread and by everything
+        # that sends on the MavlinkManager's connection
+        self._master_lock = Lock()
+
+        self._stop_event = Event()
+        self._threads = []
+
+    def _vprint(self, print_string):
+        if self._verbose:
+            print(print_string)
+
+    def start(self):
+        ''' Opens the master and the outputs and starts routing '''
+
+        if self.master_address is None:
+            port = find_flight_controller_port(self._verbose)
+            if port is not None:
+                print(f"#### {self.config['AGENT_ID']} "
+                      f"Establishing Connection to Cube ####")
+                self.master_address = port.device
+            else:
+                print(f"#### {self.config['AGENT_ID']} "
+                      f"Establishing Connection to SITL ####")
+                self.master_address = self.config['SITL_ADDRESS']
+
+        self.master = mavutil.mavlink_connection(
+            self.master_address, baud=self._baud)
+
+        # Everything that is sent through master.mav goes through
+        # master.write, so serialize it with the output thread's writes
+        master_write = self.master.write
+
+        def locked_write(buf):
+            with self._master_lock:
+                master_write(buf)
+        self.master.write = locked_write
+
+        for out in self.config.get('MAVPROXY_OUTPUTS', []):
+            self.outputs.append(
+                mavutil.mavlink_connection(f"udpin:0.0.0.0:{out}"))
+        self._vprint(f"Routing {self.master_address} to "
+                     f"{self.config.get('MAVPROXY_OUTPUTS', [])}")
+
+        self._threads = [Thread(target=self._route_master, daemon=True)]
+        if self.outputs:
+            self._threads.append(
+                Thread(target=self._route_outputs, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(self.RECV_TIMEOUT * 2)
+        for connection in [self.master] + self.outputs:
+            if connection is not None:
+                connection.close()
+
+    def connection(self):
+        ''' The connection object to hand to the MavlinkManager '''
+        return RouterConnection(self)
+
+    def _route_master(self):
+
+        recv_match = self.master.recv_match
+        outputs = self.outputs
+        message_queue = self._queue
+
+        while not self._stop_event.is_set():
+            msg = recv_match(blocking=True, timeout=self.RECV_TIMEOUT)
+            if msg is None or msg.get_type() == 'BAD_DATA':
+                continue
+
+            if outputs:
+                packet = msg.get_msgbuf()
+                for output in outputs:
+                    output.write(packet)
+
+            # Keep the newest packets if the MavlinkManager falls behind
+            try:
+                message_queue.put_nowait(msg)
+            except queue.Full:
+                try:
+                    message_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                message_queue.put_nowait(msg)
+                self.dropped_packets += 1
+
+    def _route_outputs(self):
+
+        outputs_by_fd = {output.fd: output for output in self.outputs}
+
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select(
+                list(outputs_by_fd), [], [], self.RECV_TIMEOUT)
+            for fd in readable:
+                output = outputs_by_fd[fd]
+                while True:
+                    msg = output.recv_msg()
+                    if msg is None:
+                        break
+                    if msg.get_type() != 'BAD_DATA':
+                        self.master.write(msg.get_msgbuf())
+
+
+class RouterConnection:
+    '''
+    Stands in for the mavutil connection in the MavlinkManager and the
+    AgentCommandManager.  Sending goes straight to the router's master
+    (the `mav` attribute) and recv_match() reads the router's queue.
+    '''
+
+    def __init__(self, router: MavlinkRouter):
+        self._router = router
+        self._queue = router._queue
+        self.mav = router.master.mav
+        self.fd = router.master.fd
+
+    @property
+    def target_system(self):
+        return self._router.master.target_system
+
+    @target_system.setter
+    def target_system(self, value):
+        self._router.master.target_system = value
+
+    @property
+    def target_component(self):
+        return self._router.master.target_component
+
+    @target_component.setter
+    def target_component(self, value):
+        self._router.master.target_component = value
+
+    def recv_match(self, condition=None, type=None, blocking=False,
+                   timeout=None):
+        '''
+        Same arguments as mavutil's recv_match.  Messages that do not
+        match are dropped, as they are by mavutil
+        '''
+        if isinstance(type, str):
+            type = (type,)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            if not blocking:
+                wait = 0
+            elif deadline is None:
+                wait = None
+            else:
+                wait = max(deadline - time.monotonic(), 0)
+            try:
+                if wait == 0:
+                    msg = self._queue.get_nowait()
+                else:
+                    msg = self._queue.get(timeout=wait)
+            except queue.Empty:
+                return None
+
+            if type is not None and msg.get_type() not in type:
+                continue
+            if condition is not None and not mavutil.evaluate_condition(
+                    condition, {msg.get_type(): msg}):
+                continue
+            return msg
+
+    def wait_heartbeat(self, blocking=True, timeout=None):
+        return self.recv_match(type='HEARTBEAT', blocking=blocking,
+                               timeout=timeout)
+
+    def close(self):
+        self._router.stop()
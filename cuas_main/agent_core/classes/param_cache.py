@@ -0,0 +1,233 @@
+import os
+import time
+import struct
+from threading import Thread, Event, Lock
+
+from pymavlink import mavutil
+os.environ['MAVLINK20'] = '1'
+
+
+def as_float32(value) -> float:
+    ''' Rounds a value the way a REAL32 parameter stores it '''
+    return struct.unpack('<f', struct.pack('<f', float(value)))[0]
+
+
+class ParamCache:
+    '''
+    Keeps a copy of the ArduPilot's parameters.
+
+    fetch_all() sends a PARAM_REQUEST_LIST and the PARAM_VALUE handler
+    (run in the MavlinkManager's message thread) fills the cache.  Any
+    index that did not arrive is requested again by index.  After that
+    the handler keeps the cache current from every PARAM_VALUE the
+    ArduPilot sends, including the ones it sends after a set.
+
+    set() does nothing when the cached value already matches.  Otherwise
+    it sends the PARAM_SET and waits for the PARAM_VALUE readback,
+    resending up to SET_RETRIES times.
+
+    Configured by the optional PARAM_CACHE dictionary in the agent's YAML:
+        PARAM_CACHE:
+          FETCH_ON_CONNECT: True
+          FETCH_TIMEOUT: 30   # (sec) give up on the bulk fetch
+          SET_TIMEOUT: 1.0    # (sec) wait for each readback
+          SET_RETRIES: 3
+
+    Args:
+        `config (dict)`: agent_configuration.yaml
+        `agent_hub (AgentHub)`: parent agent_hub
+        `mav_connection(mavutil.mavlink_connection)`:
+            reference to the MavlinkManager's mav_connection
+        `send_lock (threading.Lock)`: lock shared with the other senders
+            on the mav_connection
+        `verbose (bool)`: show expanded info
+
+    Attr:
+        `values (dict)`: parameter name -> value
+        `fetched (threading.Event)`: set when every parameter is cached
+    '''
+
+    # (sec) no PARAM_VALUE for this long means the list has stopped
+    # and the missing indexes should be requested
+    FETCH_QUIET = 1.0
+
+    def __init__(self, config: dict, agent_hub, mav_connection,
+                 send_lock=None, verbose=False):
+
+        self.config = config
+        self._agent_hub = agent_hub
+        self._mav_connection = mav_connection
+        self._send_lock = send_lock if send_lock is not None else Lock()
+        self._verbose = verbose
+
+        cache_config = self.config.get('PARAM_CACHE', {})
+        self.fetch_on_connect = cache_config.get('FETCH_ON_CONNECT', True)
+        self._fetch_timeout = float(cache_config.get('FETCH_TIMEOUT', 30))
+        self._set_timeout = float(cache_config.get('SET_TIMEOUT', 1.0))
+        self._set_retries = int(cache_config.get('SET_RETRIES', 3))
+
+        self.values = {}
+        self.types = {}
+        self.param_count = None
+        self._received_indexes = set()
+        self._last_param_time = 0.0
+        self.fetched = Event()
+
+        # parameter name -> Event set by the next PARAM_VALUE for it
+        self._readback_events = {}
+
+        # Counts of the PARAM_SETs sent and skipped because they matched
+        self.sets_sent = 0
+        self.sets_skipped = 0
+
+    def _vprint(self, print_string):
+        if self._verbose:
+            print(print_string)
+
+    # ################# PARAM_VALUE handler ##################
+
+    def param_value(self, msg):
+        ''' PARAM_VALUE handler run in the MavlinkManager's message thread '''
+        name = msg.param_id
+        if isinstance(name, bytes):
+            name = name.decode('utf-8', errors='ignore')
+        name = name.rstrip('\x00')
+
+        self.values[name] = msg.param_value
+        self.types[name] = msg.param_type
+        self._last_param_time = time.monotonic()
+
+        # index 65535 is a PARAM_VALUE that is not part of the list
+        if msg.param_index != 65535:
+            self.param_count = msg.param_count
+            self._received_indexes.add(msg.param_index)
+            if len(self._received_indexes) >= self.param_count:
+                self.fetched.set()
+
+        event = self._readback_events.get(name)
+        if event is not None:
+            event.set()
+
+    # ################# Reads ##################
+
+    def get(self, name: str, default=None):
+        ''' The cached value of name, or default if it is not cached '''
+        return self.values.get(name, default)
+
+    def fetch_all(self, wait: bool = False) -> bool:
+        '''
+        Requests every parameter from the ArduPilot.  The cache fills in
+        the background unless wait is True.
+
+        Return:
+            `bool`: True if the cache is complete
+        '''
+        self.fetched.clear()
+        self._received_indexes.clear()
+        self._last_param_time = time.monotonic()
+        with self._send_lock:
+            self._mav_connection.mav.param_request_list_send(
+                self._mav_connection.target_system,
+                self._mav_connection.target_component)
+
+        thread = Thread(target=self._complete_fetch, daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return self.fetched.is_set()
+
+    def request(self, name: str):
+        ''' Asks the ArduPilot to send the current value of name '''
+        with self._send_lock:
+            self._mav_connection.mav.param_request_read_send(
+                self._mav_connection.target_system,
+                self._mav_connection.target_component,
+                name.encode('utf-8'), -1)
+
+    def _complete_fetch(self):
+
+        start = time.monotonic()
+        while not self.fetched.is_set():
+            if time.monotonic() - start > self._fetch_timeout:
+                print(f"{self.config['AGENT_ID']}: parameter fetch timed "
+                      f"out with {len(self._received_indexes)} of "
+                      f"{self.param_count} parameters")
+                return
+            if self.fetched.wait(self.FETCH_QUIET / 2):
+                break
+            if time.monotonic() - self._last_param_time < self.FETCH_QUIET:
+                continue
+            if self.param_count is None:
+                continue
+
+            # The list has stopped, so ask for what is missing by index
+            missing = [i for i in range(self.param_count)
+                       if i not in self._received_indexes]
+            self._vprint(f"Requesting {len(missing)} missing parameters")
+            with self._send_lock:
+                for index in missing:
+                    self._mav_connection.mav.param_request_read_send(
+                        self._mav_connection.target_system,
+                        self._mav_connection.target_component,
+                        b'', index)
+            self._last_param_time = time.monotonic()
+
+        self._vprint(f"{self.config['AGENT_ID']}: cached "
+                     f"{len(self.values)} parameters in "
+                     f"{time.monotonic() - start:.2f} sec")
+
+    # ################# Writes ##################
+
+    def matches(self, name: str, value) -> bool:
+        ''' True if the cached value of name is already value '''
+        cached = self.values.get(name)
+        if cached is None:
+            return False
+        return as_float32(cached) == as_float32(value)
+
+    def set(self, name: str, value,
+            param_type=mavutil.mavlink.MAV_PARAM_TYPE_REAL32,
+            verify: bool = True) -> bool:
+        '''
+        Sets the parameter name to value unless it is already set.
+
+        Args:
+            `name (str)`: parameter name ('DISARM_DELAY')
+            `value (float)`: new value
+            `param_type (int)`: MAV_PARAM_TYPE of the value.  The cached
+                type is used if the parameter is cached
+            `verify (bool)`: wait for the readback and resend if it
+                does not match
+
+        Return:
+            `bool`: True if the ArduPilot has the value (or verify is False)
+        '''
+        if self.matches(name, value):
+            self.sets_skipped += 1
+            return True
+
+        param_type = self.types.get(name, param_type)
+        event = Event()
+        self._readback_events[name] = event
+        try:
+            for attempt in range(self._set_retries if verify else 1):
+                event.clear()
+                with self._send_lock:
+                    self._mav_connection.mav.param_set_send(
+                        self._mav_connection.target_system,
+                        self._mav_connection.target_component,
+                        name.encode('utf-8'), float(value), param_type)
+                self.sets_sent += 1
+                if not verify:
+                    return True
+                if event.wait(self._set_timeout) and \
+                        self.matches(name, value):
+                    return True
+                self._vprint(f"{name} readback did not match "
+                             f"(attempt {attempt + 1})")
+        finally:
+            self._readback_events.pop(name, None)
+
+        print(f"{self.config['AGENT_ID']}: could not set {name} to {value} "
+              f"(ArduPilot reports {self.values.get(name)})")
+        return False
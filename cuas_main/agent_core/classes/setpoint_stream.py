@@ -0,0 +1,288 @@
+import os
+import math
+import time
+from threading import Thread, Event, Lock
+
+from pymavlink import mavutil
+os.environ['MAVLINK20'] = '1'
+
+
+class SetpointStream:
+    '''
+    Streams the latest GUIDED setpoint (position, velocity and/or yaw)
+    to the ArduPilot at a fixed rate.  Callers overwrite the target with
+    one of the update_...() methods which never block, and the stream's
+    thread resends whatever the latest target is every tick.
+
+    The stream stops itself when:
+        - the flight mode changes away from the mode it was started in
+        - no new target has been written for `timeout` seconds
+
+    Configured by the optional SETPOINT_STREAM dictionary in the agent's
+    YAML file:
+        SETPOINT_STREAM:
+          RATE: 20      # (Hz) 10 - 50
+          TIMEOUT: 1.0  # (sec) stop if the target is not refreshed
+
+    Args:
+        `config (dict)`: agent_configuration.yaml
+        `agent_hub (AgentHub)`: parent agent_hub
+        `mav_connection(mavutil.mavlink_connection)`:
+            reference to the MavlinkManager's mav_connection
+        `send_lock (threading.Lock)`: lock shared with the other senders
+            on the mav_connection
+        `verbose (bool)`: show expanded info
+    '''
+
+    MIN_RATE = 10
+    MAX_RATE = 50
+
+    # bitmap to show what to IGNORE (1 means ignore, 0 means use)
+    # 0b[yaw rate][yaw][force set][az][ay][ax][vz][vy][vx][z][y][x]
+    _IGNORE_ALL = 0b110111111111
+    _USE_POSITION = ~0b000000000111
+    _USE_VELOCITY = ~0b000000111000
+    _USE_YAW = ~0b010000000000
+    _USE_YAW_RATE = ~0b100000000000
+
+    def __init__(self, config, agent_hub, mav_connection,
+                 send_lock=None, verbose=False):
+
+        self.config = config
+        self._agent_hub = agent_hub
+        self._mav_connection = mav_connection
+        self._send_lock = send_lock if send_lock is not None else Lock()
+        self._verbose = verbose
+
+        stream_config = self.config.get('SETPOINT_STREAM', {})
+        self.rate = self._clamp_rate(stream_config.get('RATE', 20))
+        self.timeout = float(stream_config.get('TIMEOUT', 1.0))
+
+        # The latest target is a single tuple that is replaced (never
+        # mutated) so that a write is one atomic attribute assignment:
+        # (kind, x, y, z, yaw, yaw_rate, monotonic time of the write)
+        self._target = None
+
+        # Each run has its own stop event, so the thread of a stopped run
+        # exits even if the stream is restarted before the thread sees the
+        # stop, and it can never stop the new run
+        self._stop_event = Event()
+        self._stop_event.set()
+        self._state_lock = Lock()
+        self._thread = None
+        self._mode = None
+        self.stop_reason = None
+
+    def _vprint(self, print_string):
+        if self._verbose:
+            print(print_string)
+
+    def _clamp_rate(self, rate):
+        rate = float(rate)
+        if rate < self.MIN_RATE or rate > self.MAX_RATE:
+            clamped = min(max(rate, self.MIN_RATE), self.MAX_RATE)
+            print(f"Setpoint stream rate {rate} Hz is out of range - "
+                  f"using {clamped} Hz")
+            return clamped
+        return rate
+
+    @property
+    def running(self):
+        return not self._stop_event.is_set()
+
+    def wait_for_mode(self, mode: str = 'GUIDED',
+                      timeout: float = None) -> bool:
+        '''
+        Waits for the ArduPilot to report mode.  The COMMAND_ACK of a mode
+        change arrives before the HEARTBEAT that updates flight_mode, so
+        call this between the mode change and start().
+
+        Args:
+            `mode (str)`: the flight mode to wait for
+            `timeout (float)`: (sec) defaults to MAVLINK_LOST_COMM_LIMIT,
+                by which time a HEARTBEAT has to have arrived
+
+        Return:
+            `bool`: True if the ArduPilot is in mode
+        '''
+        if timeout is None:
+            timeout = float(self.config.get('MAVLINK_LOST_COMM_LIMIT', 1.5))
+        agent_status = self._agent_hub.agent_status_obj
+        in_mode = Event()
+
+        def mode_changed(record, changed_fields):
+            if record.mode == mode:
+                in_mode.set()
+
+        agent_status.subscribe('flight_mode', mode_changed)
+        try:
+            if agent_status.flight_mode.mode == mode:
+                return True
+            return in_mode.wait(timeout)
+        finally:
+            agent_status.unsubscribe('flight_mode', mode_changed)
+
+    def start(self, rate: float = None, timeout: float = None) -> bool:
+        '''
+        Starts streaming the latest target.  The stream is bound to the
+        flight mode the ArduPilot is in when it starts.
+
+        Args:
+            `rate (float)`: stream rate (Hz).  Defaults to SETPOINT_STREAM
+            `timeout (float)`: stop if the target is older than this (sec)
+
+        Return:
+            `bool`: True if the stream is running
+        '''
+        with self._state_lock:
+            if self.running:
+                return True
+            return self._start(rate, timeout)
+
+    def _start(self, rate, timeout):
+
+        if rate is not None:
+            self.rate = self._clamp_rate(rate)
+        if timeout is not None:
+            self.timeout = float(timeout)
+
+        self._mode = self._agent_hub.agent_status_obj.flight_mode.mode
+        if self._mode != 'GUIDED':
+            print(f"{self.config['AGENT_ID']}: setpoint stream needs "
+                  f"GUIDED mode (currently {self._mode})")
+            return False
+
+        self.stop_reason = None
+        self._stop_event = Event()
+        self._thread = Thread(target=self._run, args=(self._stop_event,),
+                              daemon=True)
+        self._thread.start()
+        self._vprint(f"Setpoint stream started at {self.rate} Hz")
+        return True
+
+    def stop(self, reason: str = 'stopped'):
+        ''' Stops the stream and clears the target '''
+        self._end(self._stop_event, reason)
+
+    def _end(self, stop_event, reason):
+        # Only the current run reports its reason and clears the target
+        with self._state_lock:
+            current = stop_event is self._stop_event
+            if current and not stop_event.is_set():
+                self.stop_reason = reason
+            stop_event.set()
+            if current:
+                self._target = None
+
+    # ################# Latest-value target writes ##################
+
+    def update_position(self, lat: float, lon: float, relative_alt: float,
+                        hdg: float = None, yaw_rate: float = None):
+        '''
+        Sets the target position.  Altitude is height above takeoff (m),
+        hdg in degrees and yaw_rate in deg/sec
+        '''
+        self._target = ('position',
+                        int(float(lat) * 1e7), int(float(lon) * 1e7),
+                        float(relative_alt),
+                        hdg, yaw_rate, time.monotonic())
+
+    def update_velocity(self, vx: float, vy: float, vz: float,
+                        hdg: float = None, yaw_rate: float = None):
+        '''
+        Sets the target North/East/Down velocity (m/s), hdg in degrees and
+        yaw_rate in deg/sec
+        '''
+        self._target = ('velocity', float(vx), float(vy), float(vz),
+                        hdg, yaw_rate, time.monotonic())
+
+    def update_yaw(self, hdg: float = None, yaw_rate: float = None):
+        '''
+        Replaces the yaw of the current target.  With no target, this holds
+        a zero velocity while turning to hdg (deg) or at yaw_rate (deg/sec)
+        '''
+        target = self._target
+        if target is None:
+            target = ('velocity', 0.0, 0.0, 0.0, None, None, None)
+        self._target = target[:4] + (hdg, yaw_rate, time.monotonic())
+
+    # ################# Stream thread ##################
+
+    def _build_message(self, target):
+
+        kind, x, y, z, hdg, yaw_rate, _ = target
+
+        mask = self._IGNORE_ALL
+        yaw = 0
+        rate = 0
+        if hdg is not None:
+            yaw = math.radians(hdg)
+            mask &= self._USE_YAW
+        if yaw_rate is not None:
+            rate = math.radians(yaw_rate)
+            mask &= self._USE_YAW_RATE
+
+        if kind == 'position':
+            message_function = (mavutil.mavlink.
+                                MAVLink_set_position_target_global_int_message)
+            return message_function(
+                0,
+                self._mav_connection.target_system,
+                self._mav_connection.target_component,
+                mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,
+                mask & self._USE_POSITION,
+                x, y, z,
+                0, 0, 0,
+                0, 0, 0,
+                yaw, rate)
+
+        message_function = (mavutil.mavlink.
+                            MAVLink_set_position_target_local_ned_message)
+        return message_function(
+            0,
+            self._mav_connection.target_system,
+            self._mav_connection.target_component,
+            mavutil.mavlink.MAV_FRAME_LOCAL_NED,
+            mask & self._USE_VELOCITY,
+            0, 0, 0,
+            x, y, z,
+            0, 0, 0,
+            yaw, rate)
+
+    def _run(self, stop_event):
+
+        period = 1.0 / self.rate
+        next_tick = time.monotonic()
+        started = next_tick
+        agent_status = self._agent_hub.agent_status_obj
+
+        while not stop_event.is_set():
+
+            mode = agent_status.flight_mode.mode
+            if mode != self._mode:
+                print(f"{self.config['AGENT_ID']}: setpoint stream stopped "
+                      f"- mode changed to {mode}")
+                self._end(stop_event, 'mode change')
+                break
+
+            target = self._target
+            last_write = started if target is None else target[6]
+            if time.monotonic() - last_write > self.timeout:
+                print(f"{self.config['AGENT_ID']}: setpoint stream "
+                      f"stopped - no target for {self.timeout} sec")
+                self._end(stop_event, 'stale')
+                break
+
+            if target is not None:
+                message = self._build_message(target)
+                with self._send_lock:
+                    self._mav_connection.mav.send(message)
+
+            # Schedule against the previous tick so the rate does not drift
+            # by the time it takes to build and send the message
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            stop_event.wait(delay)
@@ -0,0 +1,189 @@
+import math
+import numbers
+import threading
+
+import numpy as np
+
+
+'''
+Contains the following Classes:
+
+    - RingHistory: A fixed size numpy ring of (epoch time, field values)
+        rows for one status record
+    - TelemetryHistory: Keeps a RingHistory for each AgentStatus record
+        listed in the TELEMETRY_HISTORY dictionary of the agent's YAML
+'''
+
+
+class RingHistory:
+    '''
+    The last `depth` updates of the numeric fields of one status record.
+    The rows are kept in one preallocated (depth, 1 + fields) float array:
+    column 0 is the epoch time of the update and the rest are the field
+    values, so memory stays the same for the whole flight.  Rows are
+    written by the AgentStatus subscription's thread and read by any other,
+    so the ring is only touched holding its lock and readers get a copy.
+
+    Args:
+        `fields (list[str])`: the record fields to keep
+        `depth (int)`: the number of updates to keep
+    '''
+
+    def __init__(self, fields, depth: int = 600):
+        self.fields = tuple(fields)
+        self.depth = int(depth)
+        self._columns = {name: i + 1 for i, name in enumerate(self.fields)}
+        self._data = np.full((self.depth, len(self.fields) + 1), np.nan)
+        # Total rows ever written.  The next row goes at _written % depth
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._written, self.depth)
+
+    def append(self, timestamp: float, values):
+        ''' Adds a row.  values are in the same order as fields '''
+        with self._lock:
+            row = self._data[self._written % self.depth]
+            row[0] = timestamp
+            row[1:] = values
+            self._written += 1
+
+    def _ordered(self):
+        # A copy of the rows oldest to newest
+        with self._lock:
+            written = self._written
+            if written <= self.depth:
+                return self._data[:written].copy()
+            split = written % self.depth
+            return np.concatenate((self._data[split:], self._data[:split]))
+
+    def _column(self, field):
+        try:
+            return self._columns[field]
+        except KeyError:
+            raise KeyError(f"{field} is not kept in this history "
+                           f"({', '.join(self.fields)})") from None
+
+    def range(self, field: str, start: float = None, end: float = None):
+        '''
+        The samples of field with start <= time <= end
+
+        Return:
+            `(numpy.ndarray, numpy.ndarray)`: times and values
+        '''
+        column = self._column(field)
+        data = self._ordered()
+        times = data[:, 0]
+        first = 0 if start is None else np.searchsorted(times, start, 'left')
+        last = len(times) if end is None else \
+            np.searchsorted(times, end, 'right')
+        return times[first:last], data[first:last, column]
+
+    def at(self, field: str, timestamps):
+        '''
+        The value of field at each timestamp, linearly interpolated
+        between the samples on either side.  Times outside the history
+        are nan.
+
+        Args:
+            `timestamps (float or array)`: epoch times
+        '''
+        column = self._column(field)
+        data = self._ordered()
+        if len(data) == 0:
+            return np.full(np.shape(timestamps), np.nan) \
+                if np.ndim(timestamps) else math.nan
+        result = np.interp(timestamps, data[:, 0], data[:, column],
+                           left=np.nan, right=np.nan)
+        return float(result) if np.ndim(result) == 0 else result
+
+    def latest(self, field: str):
+        ''' (time, value) of the newest sample or None '''
+        column = self._column(field)
+        with self._lock:
+            if self._written == 0:
+                return None
+            row = self._data[(self._written - 1) % self.depth]
+            return float(row[0]), float(row[column])
+
+
+class TelemetryHistory:
+    '''
+    Records a RingHistory for each AgentStatus record in the optional
+    TELEMETRY_HISTORY dictionary of the agent's YAML file:
+
+        TELEMETRY_HISTORY:
+          DEPTH: 600                  # updates kept per record
+          RECORDS:
+            agent_position: [lat, lon, alt, relative_alt, vx, vy, vz, hdg]
+            NAV_CONTROLLER_OUTPUT: ALL   # every numeric field
+
+    A row is added each time the record changes (through the AgentStatus
+    subscriptions), stamped with the record's update time.
+
+    Example:
+        history = self.agent_hub.telemetry_history
+        times, lats = history.range('agent_position', 'lat', t0, t1)
+        lat = history.at('agent_position', 'lat', radar_time)
+
+    Args:
+        `config (dict)`: agent_configuration.yaml
+        `agent_status (AgentStatus)`: the agent's status object
+    '''
+
+    def __init__(self, config: dict, agent_status):
+
+        history_config = config.get('TELEMETRY_HISTORY', {}) or {}
+        self.depth = int(history_config.get('DEPTH', 600))
+        self._requested = dict(history_config.get('RECORDS', {}) or {})
+        self.histories = {}
+
+        for key in self._requested:
+            agent_status.subscribe(key, self._record_update)
+
+    @property
+    def enabled(self):
+        return bool(self._requested)
+
+    def _create_history(self, record):
+        key = record.message_class
+        fields = self._requested[key]
+        if fields == 'ALL':
+            fields = [name for name in record._fields
+                      if isinstance(getattr(record, name), numbers.Number)]
+        history = RingHistory(fields, self.depth)
+        self.histories[key] = history
+        return history
+
+    def _record_update(self, record, changed_fields):
+        history = self.histories.get(record.message_class)
+        if history is None:
+            history = self._create_history(record)
+        values = [getattr(record, name) for name in history.fields]
+        try:
+            history.append(record._time, values)
+        except (TypeError, ValueError):
+            # Fields that are not set yet (None) are stored as nan
+            history.append(record._time, [
+                value if isinstance(value, numbers.Number) else math.nan
+                for value in values])
+
+    def history(self, key: str) -> RingHistory:
+        return self.histories.get(key)
+
+    def range(self, key: str, field: str, start: float = None,
+              end: float = None):
+        ''' (times, values) of key.field with start <= time <= end '''
+        history = self.histories.get(key)
+        if history is None:
+            return np.empty(0), np.empty(0)
+        return history.range(field, start, end)
+
+    def at(self, key: str, field: str, timestamps):
+        ''' key.field interpolated at timestamps (nan outside the history) '''
+        history = self.histories.get(key)
+        if history is None:
+            return np.full(np.shape(timestamps), np.nan) \
+                if np.ndim(timestamps) else math.nan
+        return history.at(field, timestamps)
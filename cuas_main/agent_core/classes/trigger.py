@@ -2,10 +2,20 @@
 # import math
 import ast
 import re
+import time
+import inspect
+import numbers
 import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Mapping
 from datetime import datetime
+from types import MappingProxyType
+from operator import gt, ge, lt, le, eq, ne
 import math
 
+import numpy as np
+
 # from collections import defaultdict
 # from typing import TYPE_CHECKING
 
@@ -28,70 +38,777 @@ __delattr__(self, name): Called when an attribute is deleted.
 '''  # noqa: E501
 
 
+# The operators that test a value against the threshold
+COMPARISONS = {
+    '>': gt,
+    '>=': ge,
+    '<': lt,
+    '<=': le,
+    '==': eq,
+    '!=': ne,
+}
+
+# The transition operators as (test of the new value, test of the
+# previous value).  A transition fires when both hold, and a MsgTrigger
+# agent clears when the new value no longer passes the first test
+TRANSITIONS = {
+    '->=': (eq, ne),
+    '=->': (ne, eq),
+    'h->l': (le, gt),
+    'l->h': (ge, lt),
+}
+
+
+def compile_condition(operator, threshold):
+    '''
+    Compiles a trigger's operator and threshold into one closure,
+    condition(value, previous, entry), so nothing is looked up when the
+    trigger is evaluated.  previous is only used by the transition
+    operators and entry (the agent or dict key) by the TemporalOperators.
+    '''
+    if isinstance(operator, TemporalOperator):
+        return operator.compile(threshold)
+
+    if operator in COMPARISONS:
+        compare = COMPARISONS[operator]
+
+        def condition(value, previous, entry=None):
+            return compare(value, threshold)
+
+    elif operator in TRANSITIONS:
+        now, before = TRANSITIONS[operator]
+
+        def condition(value, previous, entry=None):
+            return now(value, threshold) and before(previous, threshold)
+
+    else:
+        raise ValueError(f"Unknown trigger operator '{operator}' "
+                         f"({', '.join(list(COMPARISONS) + list(TRANSITIONS))})")
+
+    return condition
+
+
+class TemporalOperator(ABC):
+    '''
+    Base of the operators that look further back than the previous value.
+    Each trigger compiles its own copy, which keeps a little state per
+    entry (each agent of a MsgTrigger, each key of a DictTrigger, the one
+    value of a ScalarTrigger) and updates it at each evaluation, so no
+    history is scanned.  Use one in place of the operator string:
+
+        self.triggerMgr.MsgTrigger(
+            self.triggerMgr, 'agentPos', threshold=5,
+            operator=held_for(3.0, '>'), agents='all', key='relative_alt')
+
+    The operators are evaluated when the var updates.  held_for is also
+    checked when the trigger is read, so a hold that ends between updates
+    is seen without new data.  A DictTrigger drops the state of keys that
+    leave its frame and an agents='all' MsgTrigger that of agents that
+    disconnect.
+    '''
+
+    def __init__(self, *args):
+        # The trigger_id is built from str(operator), so equal operators
+        # name the same trigger
+        self._text = f"{type(self).__name__}" \
+                     f"({', '.join(repr(arg) for arg in args)})"
+
+    def __str__(self):
+        return self._text
+
+    __repr__ = __str__
+
+    @staticmethod
+    def _comparison(operator):
+        if operator not in COMPARISONS:
+            raise ValueError(f"'{operator}' must be one of "
+                             f"{', '.join(COMPARISONS)}")
+        return operator
+
+    @abstractmethod
+    def compile(self, threshold):
+        '''
+        condition(value, previous, entry) with fresh state, and
+        condition.prune(keep) to drop the state of entries not in keep
+        '''
+
+    @staticmethod
+    def _pruner(*states):
+        def prune(keep):
+            for state in states:
+                for entry in [entry for entry in state if entry not in keep]:
+                    del state[entry]
+        return prune
+
+
+class held_for(TemporalOperator):
+    '''
+    Met once `operator` threshold has held for `seconds` without a break
+
+    Args:
+        `seconds (float)`: how long the comparison has to hold
+        `operator (str)`: one of >, >=, <, <=, ==, !=
+    '''
+
+    def __init__(self, seconds: float, operator: str):
+        super().__init__(seconds, operator)
+        self.seconds = seconds
+        self.operator = self._comparison(operator)
+
+    def compile(self, threshold):
+        compare = COMPARISONS[self.operator]
+        seconds = self.seconds
+        # entry -> the time the comparison started holding
+        since = {}
+        # entry -> when it will have held long enough, for the entries
+        # still short of it at their last evaluation
+        pending = {}
+
+        def condition(value, previous, entry=None):
+            if not compare(value, threshold):
+                since.pop(entry, None)
+                pending.pop(entry, None)
+                return False
+            now = time.time()
+            start = since.setdefault(entry, now)
+            if now - start >= seconds:
+                pending.pop(entry, None)
+                return True
+            pending[entry] = start + seconds
+            return False
+
+        def due(now):
+            ''' Takes the pending entries that have held long enough '''
+            entries = [entry for entry, deadline in pending.items()
+                       if deadline <= now]
+            for entry in entries:
+                del pending[entry]
+            return entries
+
+        condition.pending = pending
+        condition.due = due
+        condition.prune = self._pruner(since, pending)
+        return condition
+
+
+class k_of_n(TemporalOperator):
+    '''
+    Met when `operator` threshold held in at least k of the last n
+    evaluations (a debounce)
+
+    Args:
+        `k (int)`: evaluations that have to pass
+        `n (int)`: evaluations looked at
+        `operator (str)`: one of >, >=, <, <=, ==, !=
+    '''
+
+    def __init__(self, k: int, n: int, operator: str):
+        super().__init__(k, n, operator)
+        if not 0 < k <= n:
+            raise ValueError(f"k_of_n needs 0 < k <= n, not {k} of {n}")
+        self.k = k
+        self.n = n
+        self.operator = self._comparison(operator)
+
+    def compile(self, threshold):
+        compare = COMPARISONS[self.operator]
+        k, n = self.k, self.n
+        # entry -> [the last n results, how many of them passed]
+        recent = {}
+
+        def condition(value, previous, entry=None):
+            met = compare(value, threshold)
+            window = recent.get(entry)
+            if window is None:
+                window = recent[entry] = [deque(maxlen=n), 0]
+            results = window[0]
+            if len(results) == n:
+                window[1] -= results[0]
+            results.append(met)
+            window[1] += met
+            return window[1] >= k
+
+        condition.prune = self._pruner(recent)
+        return condition
+
+
+class hysteresis(TemporalOperator):
+    '''
+    Met from when the value reaches `high` until it falls to `low`.
+    The trigger's threshold is not used
+
+    Args:
+        `low (float)`: the value that turns the condition off
+        `high (float)`: the value that turns the condition on
+    '''
+
+    def __init__(self, low: float, high: float):
+        super().__init__(low, high)
+        if low > high:
+            raise ValueError(f"hysteresis needs low <= high, "
+                             f"not {low} > {high}")
+        self.low = low
+        self.high = high
+
+    def compile(self, threshold):
+        low, high = self.low, self.high
+        # entry -> whether the condition is on
+        on = {}
+
+        def condition(value, previous, entry=None):
+            if value >= high:
+                on[entry] = True
+            elif value <= low:
+                on[entry] = False
+            return on.get(entry, False)
+
+        condition.prune = self._pruner(on)
+        return condition
+
+
+class rate_exceeds(TemporalOperator):
+    '''
+    Met when the value changed faster than `rate` per second since the
+    entry's last update: rising faster for a positive rate, falling
+    faster for a negative one.  The trigger's threshold is not used
+
+    Args:
+        `rate (float)`: change per second
+    '''
+
+    def __init__(self, rate: float):
+        super().__init__(rate)
+        self.rate = rate
+
+    def compile(self, threshold):
+        rate = self.rate
+        # entry -> (time, value) of the last update
+        last = {}
+
+        def condition(value, previous, entry=None):
+            now = time.time()
+            before = last.get(entry)
+            last[entry] = (now, value)
+            if before is None or now <= before[0]:
+                return False
+            change = (value - before[1]) / (now - before[0])
+            return change > rate if rate >= 0 else change < rate
+
+        condition.prune = self._pruner(last)
+        return condition
+
+
+class ArrayFrame(Mapping):
+    '''
+    A read-only dict of numeric values kept as one numpy array in the
+    order of labels.  C3NodeDictVar.update_array() stores its frames this
+    way so DictTrigger can test every value with one array operation.
+
+    Args:
+        `labels (list[str])`: the dict keys
+        `array (numpy.ndarray)`: the value of each label
+    '''
+
+    __slots__ = ('labels', 'array', '_index')
+
+    def __init__(self, labels, array):
+        self.labels = labels
+        self.array = array
+        self._index = None
+
+    @property
+    def index(self):
+        ''' label -> position in the array '''
+        if self._index is None:
+            self._index = {label: i for i, label in enumerate(self.labels)}
+        return self._index
+
+    def __getitem__(self, key):
+        return self.array.item(self.index[key])
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def items(self):
+        return zip(self.labels, self.array.tolist())
+
+    def aligned(self, previous):
+        '''
+        previous's values in this frame's label order and a mask of the
+        labels previous has, or None if previous is not an ArrayFrame
+        '''
+        if not isinstance(previous, ArrayFrame):
+            return None
+        if previous.labels is self.labels or \
+                previous.labels == self.labels:
+            return previous.array, True
+        positions = np.fromiter(
+            (previous.index.get(label, -1) for label in self.labels),
+            dtype=np.intp, count=len(self.labels))
+        present = positions >= 0
+        return previous.array[np.maximum(positions, 0)], present
+
+
+class SnapshotMap(Mapping):
+    '''
+    A read-only dict kept as a tuple of small dicts (shards), each key in
+    the shard its hash picks.  replaced() returns a new map that copies
+    only the changed key's shard and shares the others, so
+    C3NodeMessageVar publishes a new snapshot on every update for a small
+    part of the cost of copying the whole fleet, and readers never take
+    its lock.
+
+    Args:
+        `shards (tuple[dict])`: the shards, never changed once published
+        `length (int)`: the number of keys in all the shards
+    '''
+
+    __slots__ = ('_shards', '_length')
+
+    SHARDS = 32
+
+    def __init__(self, shards: tuple = None, length: int = 0):
+        self._shards = shards if shards is not None else \
+            ({},) * self.SHARDS
+        self._length = length
+
+    def __getitem__(self, key):
+        return self._shards[hash(key) % len(self._shards)][key]
+
+    def __contains__(self, key):
+        return key in self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key, default=None):
+        return self._shards[hash(key) % len(self._shards)].get(key, default)
+
+    def __iter__(self):
+        for shard in self._shards:
+            yield from shard
+
+    def __len__(self):
+        return self._length
+
+    def items(self):
+        for shard in self._shards:
+            yield from shard.items()
+
+    def replaced(self, key, value) -> 'SnapshotMap':
+        ''' A new map with key set to value '''
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index].copy()
+        length = self._length if key in shard else self._length + 1
+        shard[key] = value
+        shards = self._shards[:index] + (shard,) + self._shards[index + 1:]
+        return SnapshotMap(shards, length)
+
+
+class NumericHistory:
+    '''
+    The last `depth` samples of one numeric value in a numpy ring.  The
+    running total is stored with each sample, so the mean and the rate of
+    change over a window are O(1).  min and max are one numpy reduction
+    over the window.  The totals are summed again from the kept values
+    each time the ring wraps, so the running total never grows beyond
+    the sum of one ring and a window's sum keeps its precision however
+    long the var runs.
+
+    A window is the last `samples` samples or the samples from the last
+    `seconds` (found by a binary search of the sample times).  With
+    neither, it is the whole history.
+
+    Args:
+        `depth (int)`: the number of samples to keep
+    '''
+
+    def __init__(self, depth: int = 5):
+        self.depth = int(depth)
+        # One extra slot keeps the running total from before the oldest
+        # sample, which a window over the whole history subtracts
+        size = self.depth + 1
+        self._times = np.zeros(size)
+        self._values = np.zeros(size)
+        self._totals = np.zeros(size)
+        self._total = 0.0
+        # Total samples ever written
+        self._written = 0
+
+    def __len__(self):
+        return min(self._written, self.depth)
+
+    def append(self, timestamp: float, value: float):
+        slot = self._written % len(self._values)
+        if slot == 0 and self._written:
+            # Slots 1 to the end hold the kept samples oldest to newest
+            np.cumsum(self._values[1:], out=self._totals[1:])
+            self._total = float(self._totals[-1])
+        self._total += value
+        self._times[slot] = timestamp
+        self._values[slot] = value
+        self._totals[slot] = self._total
+        self._written += 1
+
+    def _slot(self, back: int) -> int:
+        # The slot of the sample `back` samples before the newest
+        return (self._written - 1 - back) % len(self._values)
+
+    def _count(self, samples: int = None, seconds: float = None) -> int:
+        available = len(self)
+        if seconds is not None:
+            since = time.time() - seconds
+            low, high = 0, available
+            while low < high:
+                middle = (low + high) // 2
+                if self._times[self._slot(middle)] >= since:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+        if samples is not None:
+            return max(0, min(int(samples), available))
+        return available
+
+    def latest(self):
+        ''' (time, value) of the newest sample or None '''
+        if self._written == 0:
+            return None
+        slot = self._slot(0)
+        return float(self._times[slot]), float(self._values[slot])
+
+    def window(self, samples: int = None, seconds: float = None):
+        ''' The window's values, newest first '''
+        count = self._count(samples, seconds)
+        return self._values[(self._written - 1 - np.arange(count)) %
+                            len(self._values)]
+
+    def mean(self, samples: int = None, seconds: float = None) -> float:
+        count = self._count(samples, seconds)
+        if count == 0:
+            return math.nan
+        before = self._totals[self._slot(count)] \
+            if self._written > count else 0.0
+        return float(self._totals[self._slot(0)] - before) / count
+
+    def min(self, samples: int = None, seconds: float = None) -> float:
+        values = self.window(samples, seconds)
+        return float(values.min()) if len(values) else math.nan
+
+    def max(self, samples: int = None, seconds: float = None) -> float:
+        values = self.window(samples, seconds)
+        return float(values.max()) if len(values) else math.nan
+
+    def rate(self, samples: int = None, seconds: float = None) -> float:
+        ''' Change per second from the oldest to the newest sample '''
+        count = self._count(samples, seconds)
+        if count < 2:
+            return math.nan
+        newest, oldest = self._slot(0), self._slot(count - 1)
+        elapsed = self._times[newest] - self._times[oldest]
+        if elapsed <= 0:
+            return math.nan
+        return float(self._values[newest] - self._values[oldest]) / elapsed
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def _pushed(history: tuple, value, depth: int) -> tuple:
+    ''' history with value added as the newest of at most depth entries '''
+    return ((value,) + history)[:depth]
+
+
+class TriggerStats:
+    '''
+    The evaluation statistics of one trigger, kept by TriggerManager when
+    TRIGGER_PROFILE is enabled.  Every evaluation is counted, but only one
+    in `sample_every` is timed, and the total time is estimated from the
+    timed ones.
+
+    Args:
+        `sample_every (int)`: time one of every this many evaluations
+        `samples (int)`: the evaluation times kept for the p99
+    '''
+
+    def __init__(self, sample_every: int = 1, samples: int = 1000):
+        self.sample_every = max(1, int(sample_every))
+        self.evaluations = 0
+        self.timed = 0
+        self.timed_total = 0.0
+        self.durations = deque(maxlen=samples)
+        self.fires = 0
+        self.last_fire = None
+        self.matched = []
+
+    @property
+    def total_time(self) -> float:
+        ''' Estimated seconds spent in all the evaluations '''
+        if self.timed == 0:
+            return 0.0
+        return self.timed_total * self.evaluations / self.timed
+
+    @property
+    def p99(self) -> float:
+        if not self.durations:
+            return 0.0
+        return float(np.percentile(self.durations, 99))
+
+    def record(self, duration: float):
+        self.timed += 1
+        self.timed_total += duration
+        self.durations.append(duration)
+
+
 class TriggerManager:
 
+    # The TemporalOperators, as self.triggerMgr.held_for(3.0, '>')
+    held_for = held_for
+    k_of_n = k_of_n
+    hysteresis = hysteresis
+    rate_exceeds = rate_exceeds
+
     def __init__(self, c3Node):
         self.triggers = {}
         self.vars = {}
         self._connected_agents = c3Node.connected_clients
 
-    # ########################################################
+        # Optional TRIGGER_PROFILE dictionary of the C3Node's YAML:
+        #   TRIGGER_PROFILE:
+        #     ENABLED: True
+        #     SAMPLE_EVERY: 10  # time 1 of every 10 evaluations
+        profile_config = getattr(c3Node, '_config', {}) \
+            .get('TRIGGER_PROFILE', {}) or {}
+        self.profiling = bool(profile_config.get('ENABLED', False))
+        self._sample_every = int(profile_config.get('SAMPLE_EVERY', 1))
+
+        # message name -> the C3NodeMessageVars that take it
+        self._routes = {}
+        # (message name, sender) -> the vars that take it from that sender
+        self._route_cache = {}
+
+    def profile(self) -> list:
+        '''
+        The statistics of every trigger, most expensive (estimated total
+        evaluation time) first.  Empty unless TRIGGER_PROFILE is enabled
+        '''
+        rows = []
+        for trigger in list(self.triggers.values()):
+            stats = trigger.stats
+            if stats is None:
+                continue
+            rows.append({
+                'trigger_id': trigger.trigger_id,
+                'evaluations': stats.evaluations,
+                'total_ms': stats.total_time * 1e3,
+                'p99_us': stats.p99 * 1e6,
+                'fires': stats.fires,
+                'last_fire': stats.last_fire,
+                'matched': stats.matched,
+            })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def profile_report(self) -> str:
+        ''' profile() as a table for the terminal '''
+        if not self.profiling:
+            return "Trigger profiling is off (TRIGGER_PROFILE: ENABLED)"
+        lines = [f"{'trigger':40s} {'evals':>8s} {'total ms':>9s} "
+                 f"{'p99 us':>8s} {'fires':>6s} {'last fire':>9s}  matched"]
+        now = time.time()
+        for row in self.profile():
+            last_fire = '-' if row['last_fire'] is None else \
+                f"{now - row['last_fire']:.1f}s ago"
+            lines.append(
+                f"{row['trigger_id'][:40]:40s} {row['evaluations']:8d} "
+                f"{row['total_ms']:9.2f} {row['p99_us']:8.1f} "
+                f"{row['fires']:6d} {last_fire:>9s}  "
+                f"{', '.join(str(item) for item in row['matched'][:8])}")
+        return '\n'.join(lines)
+
+    def reset_profile(self):
+        for trigger in list(self.triggers.values()):
+            if trigger.stats is not None:
+                trigger.stats = TriggerStats(self._sample_every)
+
+    def _add_route(self, message_name: str, c3node_var):
+        self._routes.setdefault(message_name, []).append(c3node_var)
+        self._route_cache.clear()
+
+    def routes(self, message_name: str, sender) -> tuple:
+        '''
+        The C3NodeMessageVars that are updated by message_name from sender,
+        so a received message only touches the vars that want it
+        '''
+        key = (message_name, sender)
+        try:
+            return self._route_cache[key]
+        except KeyError:
+            pass
+        c3node_vars = tuple(
+            c3node_var for c3node_var in self._routes.get(message_name, ())
+            if c3node_var.group_id_restriction is None or
+            sender in c3node_var.group_id_restriction)
+        self._route_cache[key] = c3node_vars
+        return c3node_vars
 
-    class Trigger:
+    # ########################################################
 
-        def __init__(self,
-                     trigger_id,
-                     c3nodeVar,
-                     threshold: any,
-                     operator: str,
-                     repeat: bool = False,
-                     agents: str = "",
-                     key: str = None,
-                     count=None):
+    class Trigger(ABC):
+        '''
+        Base of the compiled triggers.  A trigger is declared once, usually
+        in establish_logic_objects(), and is evaluated by its C3NodeVar each
+        time the var updates, so reading the result is O(1):
+
+            self.close_pairs = self.triggerMgr.DictTrigger(
+                self.triggerMgr, 'distance', operator='<', threshold=100,
+                repeat=True)
+            ...
+            if self.close_pairs:
+                for pair, distance in self.close_pairs.dict.items():
+
+        Calling the constructor again with the same arguments (building the
+        trigger on every loop) returns the declared trigger.
+        '''
+
+        def __init_subclass__(cls, **kwargs):
+            super().__init_subclass__(**kwargs)
+            # The constructor's arguments without self, used to name
+            # the trigger the same however the arguments are passed
+            parameters = inspect.signature(cls.__init__).parameters
+            cls._signature = inspect.Signature(
+                list(parameters.values())[1:])
+
+        def __new__(cls, manager, *args, **kwargs):
+            arguments = cls._signature.bind(manager, *args, **kwargs)
+            arguments.apply_defaults()
+            trigger_id = '_'.join(
+                [cls.__name__] +
+                [str(value) for value in
+                 list(arguments.arguments.values())[1:]])
+
+            trigger = manager.triggers.get(trigger_id)
+            if trigger is None:
+                trigger = super().__new__(cls)
+                trigger.trigger_id = trigger_id
+                trigger._declared = False
+            return trigger
+
+        def _declare(self, manager, c3nodeVarName, threshold, operator,
+                     repeat):
 
-            self.trigger_id = trigger_id
-            self.c3NodeVar = c3nodeVar
+            try:
+                self.c3NodeVar = manager.vars[c3nodeVarName]
+            except KeyError:
+                raise KeyError(f"Trigger '{self.trigger_id}' needs the "
+                               f"C3NodeVar '{c3nodeVarName}' to be created "
+                               f"first") from None
+            self.manager = manager
             self.threshold = threshold
             self.operator = operator
-            self.agents = agents
             self.repeat = repeat
-            self.key = key
-            self.count = count
-
-            self.timestamp = datetime.now()
+            self.transition = operator in TRANSITIONS
+            self._condition = compile_condition(operator, threshold)
+            # Only the TemporalOperators keep state per entry to prune,
+            # and only held_for has entries to check again on read
+            self._prune = getattr(self._condition, 'prune', None)
+            self._pending = getattr(self._condition, 'pending', None)
 
+            self.response = False
             self.triggered = False
-            # self.cleared_condition = {}
-
-            self.triggered_agents = []
-
-            # collects the value of each agent's conditional result
-            # as it cycles through the for loop
-            # so the any, all, subset ouput can be evaluated
-            self.persistant_status = {}
-
-            # When using a transition conditional (l->h, h->l, ->=, =->)
-            # this checks if the value has already been read
-            self.transition_value = None
-
-            # Parse count if it includes a comparison operator
-            self.comparison_operator = None
-            self.comparison_value = None
-            if isinstance(count, str):
-                match = re.match(r"([<>]=?|==)\s*(\d+%?)", count)
-                if match:
-                    self.comparison_operator = match.group(1)
-                    self.comparison_value = match.group(2)
-                    # print(f"op: {self.comparison_operator}")
-                    # print(f"val: {self.comparison_value}")
+            # The var version the result was evaluated from
+            self.version = 0
+            # Evaluations that fired, and how many of those the reader has
+            # seen.  Only the var's thread writes _fires and only the
+            # reader writes _fires_read, so a fire is kept until it is read
+            # even if more updates arrive first
+            self._fires = 0
+            self._fires_read = 0
+
+        def _register(self):
+            if self.manager.profiling:
+                self.stats = TriggerStats(self.manager._sample_every)
+            else:
+                # The vars call _notify, which is then just _run
+                self.stats = None
+                self._notify = self._run
+            self.manager.triggers[self.trigger_id] = self
+            self.c3NodeVar.triggers.append(self)
+            self._declared = True
+
+        def _notify(self):
+            ''' _evaluate with the evaluation counted and sometimes timed '''
+            stats = self.stats
+            stats.evaluations += 1
+            fires = self._fires
+            if stats.evaluations % stats.sample_every:
+                self._run()
+            else:
+                start = time.perf_counter()
+                self._run()
+                stats.record(time.perf_counter() - start)
+            if self._fires != fires:
+                stats.fires += 1
+                stats.last_fire = time.time()
+                stats.matched = self._matched()
+
+        def _matched(self) -> list:
+            ''' The agents or keys that met the condition '''
+            return []
+
+        def _run(self):
+            ''' _evaluate, counting the fire if it fired '''
+            version = self.version
+            self._evaluate()
+            if self.response and self.version != version:
+                self._fires += 1
+
+        def _fire_pending(self) -> bool:
+            ''' Whether there is a fire the reader has not seen yet '''
+            return self._fires != self._fires_read
+
+        def _recheck(self):
+            '''
+            Evaluates again the entries whose held_for hold has lasted long
+            enough since the var last updated
+            '''
+            with self.c3NodeVar.lock:
+                due = self._condition.due(time.time())
+                if not due:
+                    return
+                self._mark(due)
+                # Evaluated as a new version so a fire is counted
+                self.version = -1
+                self._notify()
 
-        def compare_date(self, new_date) -> str:
-            if new_date > self.timestamp:
-                # print(f"New date: {self.timestamp} -> {new_date}")
-                self.timestamp = new_date
-                return new_date
+        def _mark(self, entries):
+            ''' Has the next evaluation look at entries again '''
 
-    class MsgTrigger:
+        def __bool__(self):
+            if self._pending:
+                self._recheck()
+            # True once for each fire, even if the var updated again before
+            # this read, and while a repeat trigger's condition holds
+            fires = self._fires
+            if fires != self._fires_read:
+                self._fires_read = fires
+                return True
+            return self.repeat and self.response
+
+        def _consume(self):
+            ''' Whether the var has a version this trigger has not seen '''
+            version = self.c3NodeVar.version
+            if version == self.version:
+                return False
+            self.version = version
+            return True
+
+        @abstractmethod
+        def _evaluate(self):
+            ''' Called by the C3NodeVar, holding its lock, after it updates '''
+
+    class MsgTrigger(Trigger):
 
         def __init__(self,
                      manager,
@@ -103,19 +820,54 @@ class TriggerManager:
                      key: str = None,
                      count=None):
 
-            self.manager = manager
-            self.response = False
+            if self._declared:
+                return
+
+            self._declare(manager, c3nodeVarName, threshold, operator,
+                          repeat)
+            self.agents = agents
+            self.key = key
+            self.count = count
             self.triggered_agents = []
 
-            self._create_msg_trigger(c3nodeVarName,
-                                     threshold,
-                                     operator,
-                                     repeat,
-                                     agents,
-                                     key,
-                                     count)
+            # The conditional result of each agent, {'triggered': bool,
+            # 'version': the agent's entry version when it triggered},
+            # so the any, all, subset output can be evaluated
+            self.persistant_status = {}
+
+            # A transition agent clears when its value stops passing this
+            self._holds = TRANSITIONS[operator][0] if self.transition \
+                else None
+
+            if isinstance(agents, (list, tuple)):
+                self._agent_set = {str(item) for item in agents}
+            elif agents.startswith('['):
+                self._agent_set = {str(item) for item in
+                                   ast.literal_eval(agents)}
+            else:
+                self._agent_set = None
+            self._count_met = self._compile_count(agents, count)
+
+            # The agents updated since the last evaluation, marked by the
+            # C3NodeMessageVar
+            self._dirty = set()
+            # The agents meeting the condition, kept up to date one agent
+            # at a time so the count is never recomputed over the fleet
+            self._matching = set()
+            self._connected_count = len(manager._connected_agents)
+            # The agents a repeat trigger waits on after it fires and the
+            # entry version each one fired with
+            self._waiting = {}
+
+            self._register()
+
+        def _matched(self):
+            return list(self.triggered_agents)
 
-        def __get_item__(self, index):
+        def _mark(self, entries):
+            self._dirty.update(entries)
+
+        def __getitem__(self, index):
             if index == 0:
                 return self.response
             elif index == 1:
@@ -123,270 +875,158 @@ class TriggerManager:
             else:
                 raise IndexError("Index out of range")
 
-        def __bool__(self):
-            return self.response
-
-        def _create_msg_trigger(
-                    self,
-                    c3nodeVarName: str,
-                    threshold: any,
-                    operator: str,
-                    repeat: bool = False,
-                    agents: str = "",
-                    key: str = None,
-                    count=None):
-
-            # If the c3NodeVar that the trigger is esablished around
-            # is not evaluating yet then don't run this trigger
-            if self.manager.vars[c3nodeVarName] is None:
-                return
-
-            trigger_id = f"{c3nodeVarName}_{threshold}_"\
-                         f"{operator}_{repeat}_{agents}_{key}_{count}"
-
-            # If this is the first time calling the trigger, then add
-            # it to the dictionary of triggers
-            if trigger_id not in self.manager.triggers.keys():
-                trgr = TriggerManager.Trigger(trigger_id,
-                                              self.manager.vars[c3nodeVarName],
-                                              threshold,
-                                              operator,
-                                              repeat,
-                                              agents,
-                                              key,
-                                              count)
-                self.manager.triggers[trigger_id] = trgr
-
-            # establish the trgr variable for this trigger
-            trgr: TriggerManager.Trigger = self.manager.triggers[trigger_id]
+        @staticmethod
+        def _compile_count(agents, count):
+            '''
+            count_met(matching, total): whether enough of the agents meet
+            the condition
+            '''
 
-            # If the trigger has already fired and it's not a repeat trigger
-            # Then don't run the trigger code
-            if (trgr.triggered) and (trgr.repeat is False):
-                self.response = False
-                return
+            # if any of the agents that are sending data to the C3Node meet
+            # the conditional requirement then the trigger fires
+            if agents == 'any' or agents == 'first':
+                return lambda matching, total: matching > 0
 
-            # If the trigger has already fired and it's a repeat trigger,
-            # continue to return False until all agents' date is
-            # refreshed. This is checked by looking at each agent's timestamps
-            if trgr.triggered and trgr.repeat:
+            # Parse count if it includes a comparison operator
+            match = None
+            if isinstance(count, str):
+                match = re.match(r"([<>]=?|==)\s*(\d+%?)", count)
+            if match is None:
+                return lambda matching, total: \
+                    total != 0 and matching == total
 
-                keys_to_delete = []
-                for agent in trgr.persistant_status.keys():
-                    try:
-                        if ((self.manager.vars[c3nodeVarName].
-                                msg_dict['agents'][agent]['timestamp'] !=
-                                trgr.persistant_status[agent]['timestamp']) and
-                                (trgr.persistant_status[agent]['timestamp']
-                                 is not None)):
-                            keys_to_delete.append(agent)
-                    except TypeError:
-                        pass
+            compare = COMPARISONS[match.group(1)]
+            value = match.group(2)
 
-                for agent in keys_to_delete:
+            # If we are defining a percentage of agents that have to meet
+            # the conditional criteria
+            if value.endswith('%'):
+                fraction = int(value.strip('%')) / 100
+                return lambda matching, total: \
+                    compare(matching, fraction * total)
+
+            # else we are defining a specific number of agents
+            value = int(value)
+            return lambda matching, total: compare(matching, value)
+
+        def _watches(self, agent):
+            if self._agent_set is not None:
+                return agent in self._agent_set
+            if self.agents == 'all':
+                return agent in self.manager._connected_agents
+            return True
+
+        def _total_agents(self):
+            # The matching count is compared to the total number of agents
+            # given in 'agents', whether or not they have sent the message
+            if self._agent_set is not None:
+                return len(self._agent_set)
+            if self.agents == 'all':
+                connected = self.manager._connected_agents
+                if len(connected) != self._connected_count:
+                    # Agents that disconnected no longer count
+                    self._connected_count = len(connected)
+                    self._matching.intersection_update(connected)
+                    if self._prune is not None:
+                        self._prune(connected)
+                return self._connected_count
+            return len(self.c3NodeVar._agents)
+
+        def _evaluate_agent(self, agent, current, history):
 
-                    # print(f"Here D: {agent}")
-                    del trgr.persistant_status[agent]
-                    if agents == 'any' or agents == 'first':
-                        trgr.triggered = False
-                        self.response = False
+            try:
+                value = current[self.key]
+                if self.transition:
+                    if not history:
                         return
-
-                if trgr.persistant_status != {}:
-                    self.response = False
-                    return
-                else:
-                    trgr.triggered = False
-
-            # Check if the msg_dict has been updated by external sources using the
-            # trigger's timestamp variable (this is not the agent's timestamp)
-            if trgr.c3NodeVar.msg_dict['timestamp'] is not None:
-                timestamp = trgr.c3NodeVar.msg_dict['timestamp']
-                if timestamp > trgr.timestamp:
-                    trgr.timestamp = timestamp
+                    met = self._condition(value, history[0][self.key],
+                                          agent)
                 else:
-                    self.response = False
-                    return
-            else:
-                self.response = False
+                    met = self._condition(value, None, agent)
+            except (KeyError, TypeError):
                 return
 
-            # print(f"Curr: {self.manager.vars[c3nodeVarName].msg_dict}")
-            # print(f"Prev: {self.manager.vars[c3nodeVarName].previous}")
-
-            # Get the agent keys based on the 'agents' parameter
-            if trgr.agents == 'all':
-                agent_keys = list(self.manager._connected_agents.keys())
-            elif trgr.agents == 'any':
-                agent_keys = list(self.manager.vars[c3nodeVarName].
-                                  msg_dict['agents'].keys())
-            elif trgr.agents[0] == '[':
-                agent_keys = [str(item) for item in ast.
-                              literal_eval(trgr.agents)]
-
-            # You can only look at agent_id's if they exist in the
-            # self.manager.vars[c3nodeVarName].msg_dict['agents'].keys()
-            # However, the matching count is compared to the total number
-            # of agent_ids given in 'agents'
-            valid_agent_keys = [agent for agent in agent_keys if
-                                agent in
-                                list(self.manager.vars[c3nodeVarName].
-                                     msg_dict['agents'].keys())]
-            matching_agents = []
-
-            # Process Transition Parameters
-            operators = {
-                            '>': [
-                                  lambda x, z: x > z,
-                                  ],
-                            '>=': [
-                                  lambda x, z: x >= z,
-                                  ],
-                            '<': [
-                                  lambda x, z: x < z,
-                                  ],
-                            '<=': [
-                                  lambda x, z: x <= z,
-                                  ],
-                            '==': [
-                                  lambda x, z: x == z,
-                                  ],
-                            '!=': [
-                                  lambda x, z: x != z,
-                                  ],
-                            '->=': [
-                                    lambda x, z: x == z,
-                                    lambda y, z: y != z,
-                                    lambda x, z: x != z,
-                                    ],
-                            '=->': [
-                                    lambda x, z: x != z,
-                                    lambda y, z: y == z,
-                                    lambda x, z: x == z,
-                                    ],
-                            'h->l': [
-                                     lambda x, z: x <= z,
-                                     lambda y, z: y > z,
-                                     lambda x, z: x > z,
-                                     ],
-                            'l->h': [
-                                     lambda x, z: x >= z,
-                                     lambda y, z: y < z,
-                                     lambda x, z: x < z,
-                                     ]}
-
-            def evaluate_conditions(op, a, x, y, z, p):
-
-                if len(operators[op]) == 3:
-
-                    op1 = operators[op][0]
-                    op2 = operators[op][1]
-                    op3 = operators[op][2]
-
-                    if op1(x[key], z) and op2(y, z):
-                        return {'triggered': True,
-                                'timestamp': x['timestamp']}
-                    elif op3(x[key], z):
-                        try:
-                            return {'triggered': False,
-                                    'timestamp': p['timestamp']}
-                        except (KeyError):
-                            pass
-                    else:
-                        return p[a]
-
-                elif len(operators[op]) == 1:
-                    op1 = operators[op][0]
-                    if op1(x[key], z):
-                        return {'triggered': True,
-                                'timestamp': x['timestamp']}
-                    else:
-                        return p[a]
-
-            try:
-                # print(f"Persistant Before: {trgr.persistant_status}")
-                for agent in valid_agent_keys:
-
-                    # print(f"{agent} // C: {self.manager.vars[c3nodeVarName].msg_dict['agents'][agent][key]} "
-                    #       f"P: {self.manager.vars[c3nodeVarName].previous[agent][0][key]}")
-
-                    # Ensure `trgr.persistant_status` has a default entry for each agent
-                    if agent not in trgr.persistant_status:
-                        trgr.persistant_status[agent] = {'triggered': False,
-                                                         'timestamp': None}
-
-                    trgr.persistant_status[agent] = evaluate_conditions(
-                        operator,
-                        agent,
-                        self.manager.vars[c3nodeVarName].msg_dict['agents'][agent],
-                        self.manager.vars[c3nodeVarName].previous[agent][0][key],
-                        threshold,
-                        trgr.persistant_status
-                    )
-
-                for key, value in trgr.persistant_status.items():
-                    if value and value.get('triggered'):
-                        matching_agents.append(key)
-
-                # print(f"Persistant After: {trgr.persistant_status}")
-                # print(f"Matching Agents: {matching_agents}")
-
-            except (IndexError):
-                pass
-
-            matching_count = len(matching_agents)
-            total_agents = len(agent_keys)
-
-            # If we are defining a percentage of agents that have to meet
-            # the conditional criteria
-            if trgr.comparison_value and '%' in trgr.comparison_value:
-                comparison_value = int(
-                    trgr.comparison_value.strip('%')) / 100 * total_agents
-            elif count is None:
-                comparison_value = total_agents
-            # else we are defining a specific number of agents that
-            # have to meet the conditional criteria
-            else:
-                comparison_value = int(trgr.comparison_value) if\
-                    trgr.comparison_value else 0
-
-            # Assuming the conditional response is not met - False
-            response = False
-
-            # if any of the agents that are sending data to the C3Node meet
-            # the conditional requirement (i.e. matching count > 0) then return
-            # a value of True
+            if met:
+                self.persistant_status[agent] = {
+                    'triggered': True,
+                    'version': self.c3NodeVar.versions[agent]}
+                self._matching.add(agent)
+            elif not self.transition or \
+                    not self._holds(value, self.threshold):
+                self.persistant_status[agent] = {'triggered': False,
+                                                 'version': None}
+                self._matching.discard(agent)
+
+        def _clear_agent(self, agent):
+            self.persistant_status[agent] = {'triggered': False,
+                                             'version': None}
+            self._matching.discard(agent)
+
+        def _evaluate(self):
+
+            if not self._consume():
+                return
 
-            if trgr.agents == 'any':
-                response = matching_count > 0
+            # If the trigger has already fired and it's not a repeat trigger
+            # then it stays False
+            if self.triggered and not self.repeat:
+                self.response = False
+                if not self._fire_pending():
+                    self.triggered_agents = []
+                self._dirty.clear()
+                return
 
-            # else if you are looking at all the agents connected to the C3Node
-            # or all the agents defined by the list given in 'agents'
-            else:
-                if trgr.comparison_operator:
-                    if trgr.comparison_operator == '>=':
-                        response = matching_count >= comparison_value
-                    elif trgr.comparison_operator == '<=':
-                        response = matching_count <= comparison_value
-                    elif trgr.comparison_operator == '>':
-                        response = matching_count > comparison_value
-                    elif trgr.comparison_operator == '<':
-                        response = matching_count < comparison_value
-                    elif trgr.comparison_operator == '==':
-                        response = matching_count == comparison_value
+            var = self.c3NodeVar
+            msg_agents = var._agents
+            previous = var._previous
+            versions = var.versions
+            dirty = self._dirty
+            self._dirty = set()
+
+            # Only the agents that sent new data since the last evaluation
+            # are evaluated again
+            refreshed = False
+            for agent in dirty:
+                if agent in self._waiting and \
+                        versions[agent] > self._waiting[agent]:
+                    # A repeat trigger that fired waits for new data from
+                    # the agents that fired it.  A transition has to
+                    # happen again before the agent counts
+                    del self._waiting[agent]
+                    refreshed = True
+                    if self.transition:
+                        self._clear_agent(agent)
+                if self._watches(agent):
+                    self._evaluate_agent(agent, msg_agents[agent],
+                                         previous.get(agent))
+
+            if self.triggered:
+                if self.agents == 'any' or self.agents == 'first':
+                    rearm = refreshed
                 else:
-                    if total_agents != 0:
-                        response = matching_count == total_agents
+                    rearm = not self._waiting
+                if not rearm:
+                    self.response = False
+                    if not self._fire_pending():
+                        self.triggered_agents = []
+                    return
+                self._waiting.clear()
+                self.triggered = False
+
+            response = self._count_met(len(self._matching),
+                                       self._total_agents())
 
             # Set the trigger's matched agents for external assessment
             if response:
-                self.triggered_agents = matching_agents
-
-            trgr.triggered = response
+                self.triggered_agents = list(self._matching)
+                self._waiting = {agent: versions[agent]
+                                 for agent in self._matching}
+            elif not self._fire_pending():
+                self.triggered_agents = []
+            self.triggered = response
             self.response = response
-            return
 
-    class ScalarTrigger:
+    class ScalarTrigger(Trigger):
 
         def __init__(self,
                      manager,
@@ -396,134 +1036,39 @@ class TriggerManager:
                      repeat: bool = False
                      ):
 
-            self.manager = manager
-            self.response = False
-
-            self._create_scalar_trigger(
-                            c3nodeVarName,
-                            operator,
-                            threshold,
-                            repeat)
+            if self._declared:
+                return
 
-        def __bool__(self):
-            return self.response
+            self._declare(manager, c3nodeVarName, threshold, operator,
+                          repeat)
+            self._register()
 
         def __str__(self):
             return str(self.response)
 
-        def _create_scalar_trigger(
-                        self,
-                        c3nodeVarName: str,
-                        operator: str,
-                        threshold: any,
-                        repeat: bool = False
-                        ):
-
-            # If the c3NodeVar that the trigger is esablished around
-            # is not evaluating yet then don't run this trigger
-            if self.manager.vars[c3nodeVarName] is None:
-                return
-
-            trigger_id = f"{c3nodeVarName}_{threshold}_"\
-                         f"{operator}_{repeat}"
-
-            # If this is the first time calling the trigger, then add
-            # it to the dictionary of triggers
-            if trigger_id not in self.manager.triggers.keys():
-                trgr = TriggerManager.Trigger(
-                                        trigger_id,
-                                        self.manager.vars[c3nodeVarName],
-                                        threshold,
-                                        operator,
-                                        repeat)
-                self.manager.triggers[trigger_id] = trgr
-                # print(f"trigger_id: {trigger_id}")
+        def _evaluate(self):
 
-            # evaluate the trigger
-            trgr: TriggerManager.Trigger = self.manager.triggers[trigger_id]
+            if not self._consume():
+                return
 
             # If the trigger has already fired and it's not a repeat trigger
-            if (trgr.triggered) and (trgr.repeat is False):
+            if self.triggered and not self.repeat:
                 self.response = False
                 return
 
-            # Process Transition Parameters
-            operators = {
-                         '>': [
-                                lambda x, z: x > z
-                              ],
-                         '>=': [
-                                lambda x, z: x >= z
-                              ],
-                         '<': [
-                                lambda x, z: x < z
-                              ],
-                         '<=': [
-                                lambda x, z: x <= z
-                              ],
-                         '==': [
-                                lambda x, z: x == z
-                              ],
-                         '!=': [
-                                lambda x, z: x != z
-                              ],
-                         '->=': [
-                                 lambda x, z: x == z,
-                                 lambda y, z: y != z,
-                                 ],
-                         '=->': [
-                                 lambda x, z: x != z,
-                                 lambda y, z: y == z,
-                                 ],
-                         'h->l': [
-                                  lambda x, z: x <= z,
-                                  lambda y, z: y > z,
-                                  ],
-                         'l->h': [
-                                  lambda x, z: x >= z,
-                                  lambda y, z: y < z,
-                                  ]}
-
-            def evaluate_conditions(op, x, y, z, trgr):
-
-                if len(operators[op]) == 2:
-                    op1 = operators[op][0]
-                    op2 = operators[op][1]
-                    try:
-                        if op1(x, z) and op2(y, z):
-                            if not trgr.repeat:
-                                trgr.triggered = True
-                            return True
-                    except (KeyError):
-                        pass
-                else:
-                    op1 = operators[op][0]
-                    try:
-                        if op1(x, z):
-                            if not trgr.repeat:
-                                trgr.triggered = True
-                            return True
-                    except (KeyError):
-                        pass
-
+            var = self.c3NodeVar
+            previous = var.previous[0] if var.previous else None
             try:
-                response = evaluate_conditions(
-                    operator,
-                    self.manager.vars[c3nodeVarName].var,
-                    self.manager.vars[c3nodeVarName].previous[0],
-                    threshold,
-                    trgr
-                )
-
-                if response is None:
-                    response = False
-                self.response = response
-                return
+                response = bool(self._condition(var._var, previous))
+            except TypeError:
+                # The var or its previous value is not set yet
+                response = False
 
-            except (IndexError):
-                pass
+            if response and not self.repeat:
+                self.triggered = True
+            self.response = response
 
-    class DictTrigger:
+    class DictTrigger(Trigger):
 
         def __init__(self,
                      manager,
@@ -534,184 +1079,129 @@ class TriggerManager:
                      key: str = None
                      ):
 
-            self.manager = manager
-            self.response = False
-            self.dict = {}
+            if self._declared:
+                return
 
-            self._create_dict_trigger(
-                        c3nodeVarName,
-                        operator,
-                        threshold,
-                        repeat,
-                        key)
+            self._declare(manager, c3nodeVarName, threshold, operator,
+                          repeat)
+            self.key = key
+            self.dict = {}
+            self._match = self._compile_match()
+            # Numeric frames are only tested as arrays without a key
+            self._match_array = self._compile_match_array() \
+                if key is None and isinstance(operator, str) else None
 
-        def __bool__(self):
-            return self.response
+            self._register()
 
         def __str__(self):
             return str(self.dict)
 
+        def _matched(self):
+            return list(self.dict)
+
         def __getitem__(self, key):
             return self.dict[key]
 
-        def _create_dict_trigger(
-                    self,
-                    c3nodeVarName,
-                    operator,
-                    threshold,
-                    repeat,
-                    key
-                    ):
-
-            if self.manager.vars[c3nodeVarName] is None:
-                return
+        def _compile_match(self):
+            '''
+            match(current, previous): the entries of the var's dict that
+            meet the condition
+            '''
+            condition = self._condition
+            key = self.key
+            transition = self.transition
+
+            def match(current, previous):
+                if transition and not previous:
+                    return {}
+                sub_dict = {}
+                for k, v in current.items():
+                    try:
+                        if transition:
+                            before = previous.get(k)
+                            if before is None:
+                                continue
+                            if key is not None:
+                                before = before[key]
+                        else:
+                            before = None
+                        if condition(v if key is None else v[key], before,
+                                     k):
+                            sub_dict[k] = v
+                    except (KeyError, TypeError):
+                        pass
+                return sub_dict
+
+            return match
+
+        def _compile_match_array(self):
+            '''
+            match_array(current, previous) for ArrayFrames: the same entries
+            as match() found with one array operation and a boolean mask
+            '''
+            threshold = self.threshold
+            transition = self.transition
+            match = self._match
+            if transition:
+                now, before = TRANSITIONS[self.operator]
+            else:
+                compare = COMPARISONS[self.operator]
+
+            def match_array(current, previous):
+                values = current.array
+                if transition:
+                    aligned = current.aligned(previous)
+                    if aligned is None:
+                        return match(current, previous)
+                    before_values, present = aligned
+                    mask = now(values, threshold) & \
+                        before(before_values, threshold) & present
+                else:
+                    mask = compare(values, threshold)
+                hits = np.flatnonzero(mask)
+                labels = current.labels
+                return dict(zip([labels[i] for i in hits],
+                                values[hits].tolist()))
 
-            trigger_id = f"{c3nodeVarName}_{operator}_"\
-                         f"{threshold}_{repeat}_{key}"
+            return match_array
 
-            # If this is the first time calling the trigger, then add
-            # it to the dictionary of triggers
-            if trigger_id not in self.manager.triggers.keys():
-                trgr = TriggerManager.Trigger(trigger_id,
-                                              self.manager.vars[c3nodeVarName],
-                                              threshold,
-                                              operator,
-                                              repeat)
-                self.manager.triggers[trigger_id] = trgr
+        def _evaluate(self):
 
-            # evaluate the trigger
-            trgr: TriggerManager.Trigger = self.manager.triggers[trigger_id]
+            if not self._consume():
+                return
 
             # If the trigger has already fired and it's not a repeat trigger
-            if (trgr.triggered) and (trgr.repeat is False):
+            if self.triggered and not self.repeat:
                 self.response = False
-                self.dict = {}
+                if not self._fire_pending():
+                    self.dict = {}
                 return
 
-            operators = {
-                         '>': [
-                                 lambda x, z: x > z,
-                                 ],
-                         '>=': [
-                                 lambda x, z: x >= z,
-                                 ],
-                         '<': [
-                                 lambda x, z: x < z,
-                                 ],
-                         '<=': [
-                                 lambda x, z: x <= z,
-                                 ],
-                         '==': [
-                                 lambda x, z: x == z,
-                                 ],
-                         '!=': [
-                                 lambda x, z: x != z,
-                                 ],
-                         '->=': [
-                                 lambda x, z: x == z,
-                                 lambda y, z: y != z,
-                                 ],
-                         '=->': [
-                                 lambda x, z: x != z,
-                                 lambda y, z: y == z,
-                                 ],
-                         'h->l': [
-                                  lambda x, z: x <= z,
-                                  lambda y, z: y > z,
-                                  ],
-                         'l->h': [
-                                  lambda x, z: x >= z,
-                                  lambda y, z: y < z,
-                                  ]}
-
-            def evaluate_conditions(op, x, y, z, key, trgr):
-
-                try:
-
-                    if self.manager.vars[c3nodeVarName].previous[0] is None:
-                        return False, {}
-
-                    sub_dict = {}
-
-                    if len(operators[op]) == 2:
-
-                        op1 = operators[op][0]
-                        op2 = operators[op][1]
-
-                        for k, v in x.items():
-                            if k not in y[0].keys():
-                                return False, {}
-                            else:
-                                # print(f"key: {key}, "
-                                #       f"v: {v}, "
-                                #       f"z: {z}")
-                                if (key is not None):
-                                    if v[key] is not None and y[0][k][key] is not None:
-                                        # print(f"1: {v[key]}, 2: {y[0][k][key]}")
-                                        if (op1(v[key], z) and
-                                                op2(y[0][k][key], z)):
-                                            sub_dict[k] = v
-                                else:
-                                    if op1(v, z) and op2(y[0][k], z):
-                                        sub_dict[k] = v
-
-                        if sub_dict == {}:
-                            return False, {}
-                        else:
-                            if not trgr.repeat:
-                                trgr.triggered = True
-                            return True, sub_dict
-
-                    else:
-
-                        op1 = operators[op][0]
-
-                        for k, v in x.items():
-                            if k not in y[0].keys():
-                                return False, {}
-                            else:
-                                if key is not None:
-                                    if op1(v[key], z):
-                                        sub_dict[k] = v
-                                else:
-                                    if op1(v, z):
-                                        sub_dict[k] = v
-
-                        if sub_dict == {}:
-                            return False, {}
-                        else:
-                            if not trgr.repeat:
-                                trgr.triggered = True
-                            return True, sub_dict
-
-                except (KeyError, AttributeError):
-                    pass
-
-            try:
-
-                if self.manager.vars[c3nodeVarName].dict is None:
-                    self.response = False
-                    self.dict = None
-                    return False, {}
-
-                response, dict = evaluate_conditions(
-                                operator,
-                                self.manager.vars[c3nodeVarName].dict,
-                                self.manager.vars[c3nodeVarName].previous,
-                                threshold,
-                                key,
-                                trgr)
-
-                if response is None:
-                    response = False
-                if dict is None:
-                    dict = {}
-                self.response = response
-                self.dict = dict
+            var = self.c3NodeVar
+            if var._dict is None:
+                self.response = False
+                if not self._fire_pending():
+                    self.dict = {}
                 return
 
-            except (IndexError):
-                pass
+            previous = var.previous[0] if var.previous else None
+            if self._match_array is not None and \
+                    isinstance(var._dict, ArrayFrame):
+                sub_dict = self._match_array(var._dict, previous)
+            else:
+                sub_dict = self._match(var._dict, previous)
+                if self._prune is not None:
+                    # Keys that left the frame, like the pairs of an agent
+                    # that departed, are not kept
+                    self._prune(var._dict)
+            response = sub_dict != {}
+
+            if response and not self.repeat:
+                self.triggered = True
+            if response or not self._fire_pending():
+                self.dict = sub_dict
+            self.response = response
+
     # ################## C3Node Variables ####################
 
     class C3NodeScalarVar:
@@ -719,11 +1209,26 @@ class TriggerManager:
         def __init__(self,
                      triggerMgr,
                      c3NodeScalarVar_name: str,
-                     value=None
+                     value=None,
+                     history: int = 5
                      ):
+            '''
+            Args:
+                `history (int)`: the previous values kept, and the numeric
+                    samples kept for mean(), min(), max() and rate()
+            '''
             self._var = value
-            self.previous = []
+            # The previous values newest first.  Like .var it is replaced,
+            # never changed, on update so it can be read without the lock
+            self.history = history
+            self.previous = ()
+            self.numeric = NumericHistory(history)
             self.lock = threading.Lock()
+            # The triggers evaluated after each update
+            self.triggers = []
+            # Counts the updates, so triggers can tell new data with one
+            # integer comparison
+            self.version = 0
 
             triggerMgr.vars[c3NodeScalarVar_name] = self
 
@@ -753,21 +1258,51 @@ class TriggerManager:
                 self._update(value)
 
         def _update(self, value):
-            self.previous.insert(0, self._var)
-            if len(self.previous) >= 6:
-                self.previous = self.previous[:5]
+            self.previous = _pushed(self.previous, self._var, self.history)
             self._var = value
+            if _is_number(value):
+                self.numeric.append(time.time(), value)
+            self.version += 1
+            for trigger in self.triggers:
+                trigger._notify()
+
+        # Windowed aggregates of the numeric values, over the last
+        # `samples` updates or `seconds` seconds
+        def mean(self, samples: int = None, seconds: float = None):
+            return self.numeric.mean(samples, seconds)
+
+        def min(self, samples: int = None, seconds: float = None):
+            return self.numeric.min(samples, seconds)
+
+        def max(self, samples: int = None, seconds: float = None):
+            return self.numeric.max(samples, seconds)
+
+        def rate(self, samples: int = None, seconds: float = None):
+            return self.numeric.rate(samples, seconds)
 
     class C3NodeDictVar:
 
         def __init__(self,
                      triggerMgr,
                      c3NodeDictVar_name: str,
-                     dict={}
+                     dict={},
+                     history: int = 5
                      ):
+            '''
+            Args:
+                `history (int)`: the previous frames kept
+            '''
             self._dict = dict
-            self.previous = []
+            # The previous frames newest first.  Like .dict it is replaced,
+            # never changed, on update so it can be read without the lock
+            self.history = history
+            self.previous = ()
             self.lock = threading.Lock()
+            # The triggers evaluated after each update
+            self.triggers = []
+            # Counts the updates, so triggers can tell new data with one
+            # integer comparison
+            self.version = 0
 
             triggerMgr.vars[c3NodeDictVar_name] = self
 
@@ -784,11 +1319,25 @@ class TriggerManager:
             with self.lock:
                 self._update(dict)
 
+        def update_array(self, labels, values):
+            '''
+            Updates the var with numeric values given as an array, so
+            DictTrigger evaluates them with array operations.  .dict reads
+            back as a mapping of labels to values.
+
+            Args:
+                `labels (list[str])`: the dict keys.  Passing the same list
+                    object each update lets triggers skip aligning frames
+                `values (array-like)`: the value of each label
+            '''
+            self.update(ArrayFrame(labels, np.asarray(values, dtype=float)))
+
         def _update(self, dict):
-            self.previous.insert(0, self._dict)
-            if len(self.previous) >= 6:
-                self.previous = self.previous[:5]
+            self.previous = _pushed(self.previous, self._dict, self.history)
             self._dict = dict
+            self.version += 1
+            for trigger in self.triggers:
+                trigger._notify()
 
     class C3NodeMessageVar:
 
@@ -796,55 +1345,141 @@ class TriggerManager:
                      triggerMgr,
                      c3NodeMessageVar_name: str,
                      message_name: str = None,
-                     group_ids: list[str] = None):
-
-            # Used if C3NodeVar is referencing received agent_status message
-            self.msg_dict = {'agents': {}, 'timestamp': None}
-            self.previous = {}
+                     group_ids: list[str] = None,
+                     history: int = 5,
+                     fields: list[str] = None):
+            '''
+            Args:
+                `history (int)`: the previous messages kept per agent, and
+                    the numeric samples kept per agent and field
+                `fields (list[str])`: the numeric message fields to keep
+                    samples of for mean(), min(), max() and rate()
+            '''
+
+            # Used if C3NodeVar is referencing received agent_status message.
+            # msg_dict and previous are read-only snapshots that each update
+            # replaces, copying only the updated agent's SnapshotMap shard,
+            # so readers get a consistent view without the lock:
+            #     snapshot = var.msg_dict
+            #     for agent, value in snapshot['agents'].items():
+            # The agents' latest messages and, for each agent, its previous
+            # messages newest first
+            self._agents = SnapshotMap()
+            self._previous = SnapshotMap()
+            # (msg_dict, previous, version), swapped in whole by each update
+            self._published = (
+                MappingProxyType({'agents': self._agents,
+                                  'timestamp': None}),
+                self._previous, 0)
+            self.history = history
+            self.fields = tuple(fields or ())
+            # agent -> field -> NumericHistory
+            self.numeric = {}
             # self.estimated = {}
             self.group_id_restriction = group_ids
             self.message_name = message_name
+            # The var version of each agent's latest entry
+            self.versions = {}
             self.lock = threading.Lock()
+            # The triggers evaluated after each update
+            self.triggers = []
+            # Counts the updates, so triggers can tell new data with one
+            # integer comparison
+            self.version = 0
 
             triggerMgr.vars[c3NodeMessageVar_name] = self
+            if message_name is not None:
+                triggerMgr._add_route(message_name, self)
 
         def update_c3node_var_by_c3m(self, c3node_var_key: str, c3Message):
 
+            restrict = self.group_id_restriction
+            if restrict is not None and c3Message.sender not in restrict:
+                return
+            try:
+                value = c3Message.message[self.message_name]
+            except (KeyError, TypeError):
+                return
+            self.update_entry(c3Message.sender, value)
+
+        def update_entry(self, agent, value):
+            '''
+            Stores agent's latest message_name and evaluates the triggers.
+            C3Node routes each received message to the vars that take it
+            (TriggerManager.routes()) and calls this directly
+            '''
+
             with self.lock:
-                # print(f"In lock: {c3Message.message}")
-                update = False
-                restrict = self.group_id_restriction
-                if restrict is not None:
-                    if (c3Message.sender in restrict):
-                        update = True
-                else:
-                    update = True
-
-                if update:
-                    for key, value in c3Message.message.items():
-                        if key == self.message_name:
-                            agent = c3Message.sender
-                            if agent not in self.previous.keys():
-                                self.previous[agent] = []
-                            try:
-                                # print("Here")
-                                self.previous[agent].insert(
-                                    0, self.msg_dict['agents'][agent])
-                                if len(self.previous[agent]) >= 6:
-                                    self.previous[agent] = \
-                                        self.previous[agent][:5]
-                            except KeyError:
-                                pass
-                            self.msg_dict['agents'][agent] = value
-                            # self.msg_dict['timestamp'] = c3Message.timestamp
-                            self.msg_dict['timestamp'] = \
-                                datetime.now().strftime(
-                                    "%m/%d/%Y, %H:%M:%S.%f"
-                                )
-                            # 08/19/2024, 22:01:07.235319
-                            # print(f"C3Message: {c3Message.message}")
-                    # print(f"CURR: {agent} - {self.msg_dict}")
-                    # print(f"PREV: {agent} - {self.previous}")
+                agents = self._agents
+                if agent not in self.numeric:
+                    self.numeric[agent] = {
+                        field: NumericHistory(self.history)
+                        for field in self.fields}
+                last = agents.get(agent)
+                if last is not None:
+                    self._previous = self._previous.replaced(
+                        agent, _pushed(self._previous.get(agent, ()), last,
+                                       self.history))
+                self._agents = agents.replaced(agent, value)
+                if self.fields and isinstance(value, dict):
+                    now = time.time()
+                    for field, numeric in self.numeric[agent].items():
+                        sample = value.get(field)
+                        if _is_number(sample):
+                            numeric.append(now, sample)
+                self.version += 1
+                self.versions[agent] = self.version
+                # 08/19/2024, 22:01:07.235319
+                self._published = (
+                    MappingProxyType({
+                        'agents': self._agents,
+                        'timestamp': datetime.now().strftime(
+                            "%m/%d/%Y, %H:%M:%S.%f")}),
+                    self._previous, self.version)
+                for trigger in self.triggers:
+                    trigger._dirty.add(agent)
+                    trigger._notify()
+
+        @property
+        def msg_dict(self):
+            return self._published[0]
+
+        @property
+        def previous(self):
+            return self._published[1]
+
+        def snapshot(self):
+            ''' (msg_dict, previous, version) published by one update '''
+            return self._published
+
+        def _numeric(self, agent, field) -> NumericHistory:
+            try:
+                return self.numeric[agent][field]
+            except KeyError:
+                if field not in self.fields:
+                    raise KeyError(f"{field} is not one of this var's "
+                                   f"fields ({', '.join(self.fields)})"
+                                   ) from None
+                # The agent has not sent the message yet
+                return NumericHistory(1)
+
+        # Windowed aggregates of an agent's numeric field, over the last
+        # `samples` messages or `seconds` seconds
+        def mean(self, agent, field: str, samples: int = None,
+                 seconds: float = None):
+            return self._numeric(agent, field).mean(samples, seconds)
+
+        def min(self, agent, field: str, samples: int = None,
+                seconds: float = None):
+            return self._numeric(agent, field).min(samples, seconds)
+
+        def max(self, agent, field: str, samples: int = None,
+                seconds: float = None):
+            return self._numeric(agent, field).max(samples, seconds)
+
+        def rate(self, agent, field: str, samples: int = None,
+                 seconds: float = None):
+            return self._numeric(agent, field).rate(samples, seconds)
 
     class C3NodePositionVar(C3NodeMessageVar):
 
@@ -877,15 +1512,16 @@ class TriggerManager:
 
             try:
 
+                snapshot = self.msg_dict
                 now = datetime.now()
-                current = datetime.strptime(self.msg_dict['timestamp'],
+                current = datetime.strptime(snapshot['timestamp'],
                                             "%m/%d/%Y, %H:%M:%S.%f")
                 delta = (now - current).seconds + \
                     (now - current).microseconds / 1_000_000
 
                 estimated_pos = {}
 
-                for agent, value in self.msg_dict['agents'].items():
+                for agent, value in snapshot['agents'].items():
 
                     cur_lat = value['lat']
                     cur_lon = value['lon']
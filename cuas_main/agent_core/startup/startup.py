@@ -46,10 +46,14 @@ for sim in config['ONBOARD_SIMULATIONS']:
     time.sleep(3)
 
 # Step 4: Add the agents via the startup_agents.py script
+# (or supervise_agents.py with SUPERVISOR: ENABLED)
 time.sleep(3)
 subprocess.run(['screen', '-S', session_name, '-X',
                 'screen', '-t', 'auto_agents'])
 startup_file_path = os.path.join(parent_dir, 'startup')
-command = (f'python {startup_file_path}/startup_agents.py')
+startup_script = 'supervise_agents.py' \
+    if config.get('SUPERVISOR', {}).get('ENABLED', False) \
+    else 'startup_agents.py'
+command = (f'python {startup_file_path}/{startup_script}')
 subprocess.Popen(['screen', '-S', session_name, '-p',
                   'auto_agents', '-X', 'stuff', f'{command}\n'])
@@ -0,0 +1,20 @@
+import yaml
+import os
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from classes.agent_supervisor import AgentSupervisor  # noqa: E402
+
+# Runs each agent in startup.yaml AGENTS in its own process.
+# startup_agents.py runs them all in this interpreter instead.
+
+config_file_path = os.path.join(parent_dir, 'startup/startup.yaml')
+with open(config_file_path, 'r') as file:
+    config = yaml.safe_load(file)
+
+supervisor = AgentSupervisor(config['AGENTS'] or [],
+                             config.get('SUPERVISOR', {}))
+supervisor.start()
+supervisor.wait()
@@ -0,0 +1,63 @@
+''' AgentStatus records built from pymavlink messages '''
+import os
+import sys
+import threading
+
+from pymavlink import mavutil
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from agent_status_class import AgentStatus  # noqa: E402
+
+mavlink = mavutil.mavlink
+
+
+def agent_status():
+    return AgentStatus({'AGENT_ID': '80001'})
+
+
+def vfr_hud(climb=0.0):
+    return mavlink.MAVLink_vfr_hud_message(10.0, 11.0, 90, 50, 20.0, climb)
+
+
+def add_message(status, msg):
+    ''' What the MavlinkManager does with each message type it receives '''
+    if not hasattr(status, msg.get_type()):
+        status.build_message_class(msg.get_type(), msg.to_dict())
+    status.update_message_object(msg)
+
+
+def test_subscribe_all_covers_records_built_later():
+    status = agent_status()
+    changed = []
+    status.subscribe_all(lambda record, fields: changed.append(
+        record.message_class))
+
+    add_message(status, vfr_hud())
+    add_message(status, vfr_hud(climb=1.5))
+
+    assert changed == ['VFR_HUD']
+
+
+def test_subscribe_all_while_records_are_built():
+    status = agent_status()
+    names = [f"USER_MESSAGE_{n}" for n in range(3000)]
+
+    def build():
+        for name in names:
+            status.build_message_class(name, {'value': 0})
+
+    builder = threading.Thread(target=build)
+    builder.start()
+    calls = []
+    # Each call walks the records while the builder adds more
+    while builder.is_alive():
+        calls.append(set())
+        status.subscribe_all(lambda record, fields, called=calls[-1]:
+                             called.add(record.message_class))
+    builder.join()
+
+    for name in names:
+        getattr(status, name).update_attributes({'value': 1})
+    assert all(called == set(names) for called in calls)
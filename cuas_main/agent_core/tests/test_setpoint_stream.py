@@ -0,0 +1,85 @@
+''' Starting the setpoint stream right after the GUIDED mode change '''
+import os
+import sys
+import threading
+
+from pymavlink import mavutil
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from agent_status_class import AgentStatus  # noqa: E402
+from classes.setpoint_stream import SetpointStream  # noqa: E402
+from classes.commands.default_nav_commands import \
+    DefaultNavCommands  # noqa: E402
+
+COPTER_MODES = {'LOITER': 5, 'GUIDED': 4}
+
+
+class StubConnection:
+    target_system = 1
+    target_component = 1
+
+    def __init__(self):
+        self.sent = []
+        self.mav = self
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+class StubHub:
+    def __init__(self, config):
+        self.agent_status_obj = AgentStatus(config)
+        self.setpoint_stream = SetpointStream(config, self, StubConnection())
+
+
+def heartbeat(mode):
+    return mavutil.mavlink.MAVLink_heartbeat_message(
+        mavutil.mavlink.MAV_TYPE_QUADROTOR,
+        mavutil.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+        mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
+        COPTER_MODES[mode], mavutil.mavlink.MAV_STATE_STANDBY, 3)
+
+
+class AckFirstCommands(DefaultNavCommands):
+    ''' The mode change is ACKed at once and the HEARTBEAT comes later '''
+
+    heartbeat_delay = 0.2
+
+    def cmd_sys_mode_change(self, mode_id, verify=False):
+        status = self._agent_hub.agent_status_obj
+        timer = threading.Timer(self.heartbeat_delay,
+                                status.update_message_object,
+                                (heartbeat(mode_id),))
+        timer.daemon = True
+        timer.start()
+        return True
+
+
+def commands(heartbeat_delay=0.2):
+    config = {'AGENT_ID': '80001', 'MAVLINK_LOST_COMM_LIMIT': 1.0,
+              'SETPOINT_STREAM': {'RATE': 20, 'TIMEOUT': 1.0}}
+    hub = StubHub(config)
+    status = hub.agent_status_obj
+    status.build_message_class('HEARTBEAT', heartbeat('LOITER').to_dict())
+    status.update_message_object(heartbeat('LOITER'))
+    cmds = AckFirstCommands(config, hub, hub.setpoint_stream._mav_connection)
+    cmds.heartbeat_delay = heartbeat_delay
+    return cmds, hub
+
+
+def test_stream_starts_when_the_heartbeat_follows_the_ack():
+    cmds, hub = commands()
+    assert hub.agent_status_obj.flight_mode.mode == 'LOITER'
+
+    assert cmds.cmd_nav_guided_stream_start()
+    assert hub.setpoint_stream.running
+    hub.setpoint_stream.stop()
+
+
+def test_stream_does_not_start_without_the_heartbeat():
+    cmds, hub = commands(heartbeat_delay=2.0)
+
+    assert not cmds.cmd_nav_guided_stream_start()
+    assert not hub.setpoint_stream.running
@@ -0,0 +1,138 @@
+''' Trigger results across several var updates between two reads '''
+import os
+import sys
+import time
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+
+from classes.trigger import TriggerManager, NumericHistory, held_for, \
+    k_of_n  # noqa: E402
+
+
+class StubNode:
+    connected_clients = {'1': None, '2': None}
+
+
+def manager():
+    return TriggerManager(StubNode())
+
+
+def test_msg_trigger_fire_survives_a_second_update():
+    triggerMgr = manager()
+    alt = triggerMgr.C3NodeMessageVar(triggerMgr, 'alt', 'agent_position')
+    low = triggerMgr.MsgTrigger(triggerMgr, 'alt', 10, '<',
+                                agents='any', key='alt')
+
+    alt.update_entry('1', {'alt': 5})
+    alt.update_entry('2', {'alt': 50})
+
+    assert low
+    assert low.triggered_agents == ['1']
+    # A one shot trigger fires once
+    assert not low
+    alt.update_entry('1', {'alt': 5})
+    assert not low
+
+
+def test_repeat_msg_trigger_fire_survives_a_second_update():
+    triggerMgr = manager()
+    alt = triggerMgr.C3NodeMessageVar(triggerMgr, 'alt', 'agent_position')
+    low = triggerMgr.MsgTrigger(triggerMgr, 'alt', 10, '<', repeat=True,
+                                agents='any', key='alt')
+
+    alt.update_entry('1', {'alt': 5})
+    alt.update_entry('2', {'alt': 50})
+
+    assert low
+    assert not low
+
+
+def test_scalar_trigger_fire_survives_a_second_update():
+    triggerMgr = manager()
+    value = triggerMgr.C3NodeScalarVar(triggerMgr, 'value', 0)
+    edge = triggerMgr.ScalarTrigger(triggerMgr, 'value', 'l->h', 5,
+                                    repeat=True)
+
+    value.update(6)
+    value.update(7)
+
+    assert edge
+    assert not edge
+
+
+def test_dict_trigger_keeps_the_fired_dict_until_read():
+    triggerMgr = manager()
+    distance = triggerMgr.C3NodeDictVar(triggerMgr, 'distance')
+    close = triggerMgr.DictTrigger(triggerMgr, 'distance', '<', 100)
+
+    distance.update({'1__2': 50})
+    distance.update({'1__2': 150})
+
+    assert close
+    assert close.dict == {'1__2': 50}
+    assert not close
+
+
+def test_repeat_trigger_is_true_while_the_condition_holds():
+    triggerMgr = manager()
+    value = triggerMgr.C3NodeScalarVar(triggerMgr, 'value', 0)
+    high = triggerMgr.ScalarTrigger(triggerMgr, 'value', '>', 5,
+                                    repeat=True)
+
+    value.update(6)
+    assert high
+    assert high
+    value.update(1)
+    assert not high
+
+
+def test_held_for_is_met_on_read_without_a_new_update():
+    triggerMgr = manager()
+    value = triggerMgr.C3NodeScalarVar(triggerMgr, 'value', 0)
+    high = triggerMgr.ScalarTrigger(triggerMgr, 'value',
+                                    held_for(0.05, '>'), 5)
+
+    value.update(6)
+    assert not high
+    time.sleep(0.06)
+    assert high
+    assert not high
+
+
+def test_held_for_msg_trigger_is_met_on_read():
+    triggerMgr = manager()
+    alt = triggerMgr.C3NodeMessageVar(triggerMgr, 'alt', 'agent_position')
+    low = triggerMgr.MsgTrigger(triggerMgr, 'alt', 10, held_for(0.05, '<'),
+                                agents='any', key='alt')
+
+    alt.update_entry('1', {'alt': 5})
+    assert not low
+    time.sleep(0.06)
+    assert low
+    assert low.triggered_agents == ['1']
+
+
+def test_dict_trigger_drops_the_state_of_departed_keys():
+    triggerMgr = manager()
+    distance = triggerMgr.C3NodeDictVar(triggerMgr, 'distance')
+    close = triggerMgr.DictTrigger(triggerMgr, 'distance', k_of_n(2, 3, '<'),
+                                   100, repeat=True)
+
+    distance.update({'1__2': 50, '1__3': 50})
+    distance.update({'1__2': 50})
+    assert close.dict == {'1__2': 50}
+
+    # 1__3 starts a new window when it returns, so one pass is not enough
+    distance.update({'1__2': 50, '1__3': 50})
+    assert close.dict == {'1__2': 50}
+
+
+def test_numeric_history_mean_keeps_its_precision():
+    history = NumericHistory(5)
+    for sample in range(200000):
+        history.append(sample, 1e6 + sample % 7 / 10)
+
+    newest = [1e6 + sample % 7 / 10 for sample in range(199995, 200000)]
+    assert abs(history.mean() - sum(newest) / 5) < 1e-9
+    assert abs(history.mean(samples=2) - sum(newest[-2:]) / 2) < 1e-9